@@ -4,9 +4,52 @@
 from abc import ABC, abstractmethod
 from typing import Dict, List, Any, Optional
 import logging
+import sys
 
 logger = logging.getLogger(__name__)
 
+# Try to import pyahocorasick for single-pass keyword matching, fall back to substring scans
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+class TermMatcher:
+    """
+    Case-insensitive substring matcher for a fixed list of domain terms.
+    
+    With pyahocorasick installed, the terms are compiled once into an
+    Aho-Corasick automaton so a query is scanned in a single pass.
+    """
+    
+    def __init__(self, terms: List[str]):
+        """Initialize the matcher for the given terms."""
+        self.terms = list(terms)
+        self._automaton = None
+        if AHOCORASICK_AVAILABLE and self.terms:
+            self._automaton = ahocorasick.Automaton()
+            for term in set(term.lower() for term in self.terms):
+                self._automaton.add_word(term, term)
+            self._automaton.make_automaton()
+    
+    def find(self, text: str) -> List[str]:
+        """
+        Find the terms contained in text.
+        
+        Args:
+            text: Text to scan
+            
+        Returns:
+            Matching terms, in the order they were given
+        """
+        text_lower = text.lower()
+        if self._automaton is None:
+            return [term for term in self.terms if term.lower() in text_lower]
+        
+        matched = {term for _, term in self._automaton.iter(text_lower)}
+        return [term for term in self.terms if term.lower() in matched]
+
 class BaseDomainAdapter(ABC):
     """
     Base class for domain-specific adapters in GraphMind.
@@ -29,8 +72,11 @@ class BaseDomainAdapter(ABC):
     def _initialize_domain_settings(self):
         """Initialize domain-specific settings."""
         self.settings = self.config.get('settings', {})
-        self.connectors = self.config.get('connectors', [])
-        self.optional_connectors = self.config.get('optional_connectors', [])
+        # Connector names are interned so adapters built from the same config
+        # share string objects; membership checks go through a frozenset
+        self.connectors = [sys.intern(c) for c in self.config.get('connectors', [])]
+        self.optional_connectors = [sys.intern(c) for c in self.config.get('optional_connectors', [])]
+        self._connector_set = frozenset(self.connectors) | frozenset(self.optional_connectors)
         self.metadata = self.config.get('metadata', {})
     
     @abstractmethod
@@ -72,6 +118,18 @@ class BaseDomainAdapter(ABC):
         """
         return self.optional_connectors
     
+    def has_connector(self, connector_name: str) -> bool:
+        """
+        Check whether a connector is configured for this domain.
+        
+        Args:
+            connector_name: Connector name
+            
+        Returns:
+            True if the connector is required or optional for this domain
+        """
+        return connector_name in self._connector_set
+    
     def get_domain_info(self) -> Dict[str, Any]:
         """
         Get information about this domain.
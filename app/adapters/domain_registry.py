@@ -1,7 +1,9 @@
 # GraphMind Domain Registry
 # Registry for managing domain adapters
 
+import copy
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional, Type
 from pathlib import Path
 import yaml
@@ -12,6 +14,14 @@ from .base_adapter import BaseDomainAdapter
 
 logger = logging.getLogger(__name__)
 
+# Use the libyaml C loader when PyYAML was built with it
+_YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Parsed domain configs shared across registries:
+# resolved config file path -> (st_mtime_ns, parsed config). Registries get deep
+# copies, so one registry or adapter mutating its config can't leak into others
+_CONFIG_CACHE: Dict[str, tuple] = {}
+
 class DomainRegistry:
     """
     Registry for managing domain adapters in GraphMind.
@@ -25,21 +35,42 @@ class DomainRegistry:
         self.config_dir = Path(config_dir)
         self.adapters: Dict[str, BaseDomainAdapter] = {}
         self.domain_configs: Dict[str, Dict[str, Any]] = {}
+        self._config_mtimes: Optional[Dict[Path, int]] = None
         self._load_domain_configs()
     
+    def _get_config_mtimes(self) -> Optional[Dict[Path, int]]:
+        """Return each config file's mtime, or None if the directory does not exist."""
+        if not self.config_dir.is_dir():
+            return None
+        mtimes = {}
+        for config_file in self.config_dir.glob("*.yaml"):
+            try:
+                mtimes[config_file] = config_file.stat().st_mtime_ns
+            except OSError:
+                continue
+        return mtimes
+    
     def _load_domain_configs(self):
-        """Load domain configurations from YAML files."""
+        """Load domain configurations from YAML files, reusing cached parses."""
         try:
-            if not self.config_dir.exists():
+            self._config_mtimes = self._get_config_mtimes()
+            if self._config_mtimes is None:
                 logger.warning(f"Domain config directory not found: {self.config_dir}")
                 return
             
-            for config_file in self.config_dir.glob("*.yaml"):
+            for config_file, mtime in self._config_mtimes.items():
                 domain_name = config_file.stem
                 try:
+                    cache_key = str(config_file.resolve())
+                    cached = _CONFIG_CACHE.get(cache_key)
+                    if cached and cached[0] == mtime:
+                        self.domain_configs[domain_name] = copy.deepcopy(cached[1])
+                        continue
+                    
                     with open(config_file, 'r') as f:
-                        config = yaml.safe_load(f)
-                        self.domain_configs[domain_name] = config
+                        config = yaml.load(f, Loader=_YamlLoader)
+                        _CONFIG_CACHE[cache_key] = (mtime, config)
+                        self.domain_configs[domain_name] = copy.deepcopy(config)
                         logger.info(f"Loaded domain config: {domain_name}")
                 except Exception as e:
                     logger.error(f"Failed to load domain config {config_file}: {e}")
@@ -121,6 +152,28 @@ class DomainRegistry:
             logger.error(f"Failed to create adapter for domain {domain}: {e}")
             return None
     
+    def create_all_adapters(self, max_workers: Optional[int] = None) -> Dict[str, BaseDomainAdapter]:
+        """
+        Create adapters for every configured domain concurrently.
+        
+        Adapter construction is I/O- and import-bound, so a thread pool keeps
+        startup close to the slowest adapter rather than the sum of all of them.
+        
+        Args:
+            max_workers: Maximum number of worker threads
+            
+        Returns:
+            Dictionary of domain name to created adapter
+        """
+        domains = list(self.domain_configs.keys())
+        if not domains:
+            return {}
+        
+        with ThreadPoolExecutor(max_workers=max_workers or min(8, len(domains))) as executor:
+            adapters = list(executor.map(self.create_adapter, domains))
+        
+        return {domain: adapter for domain, adapter in zip(domains, adapters) if adapter}
+    
     def _get_adapter_class(self, domain: str) -> Optional[Type[BaseDomainAdapter]]:
         """
         Get the adapter class for a domain.
@@ -164,6 +217,7 @@ class DomainRegistry:
         Returns:
             List of domain information dictionaries
         """
+        self._refresh_domain_configs()
         domains = []
         for domain, config in self.domain_configs.items():
             domains.append({
@@ -220,6 +274,11 @@ class DomainRegistry:
         self._load_domain_configs()
         logger.info("Domain configurations reloaded")
     
+    def _refresh_domain_configs(self):
+        """Reload domain configurations only if a config file was added, removed or modified."""
+        if self._get_config_mtimes() != self._config_mtimes:
+            self.reload_domain_configs()
+    
     def get_domain_statistics(self) -> Dict[str, Any]:
         """
         Get statistics about registered domains.
@@ -227,6 +286,7 @@ class DomainRegistry:
         Returns:
             Domain statistics
         """
+        self._refresh_domain_configs()
         return {
             'total_domains': len(self.adapters),
             'available_configs': len(self.domain_configs),
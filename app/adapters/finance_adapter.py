@@ -4,7 +4,7 @@
 from typing import Dict, List, Any
 import logging
 
-from .base_adapter import BaseDomainAdapter
+from .base_adapter import BaseDomainAdapter, TermMatcher
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +16,10 @@ class FinanceAdapter(BaseDomainAdapter):
     for the GraphMind RAG framework.
     """
     
+    # Appended to formatted responses that read like trading advice
+    DISCLAIMER = "\n\n**Disclaimer**: This information is for educational purposes only and should not be considered as financial advice. Always consult with a qualified financial advisor before making investment decisions."
+    ADVICE_TERMS = ('buy', 'sell', 'trade', 'investment')
+    
     def __init__(self, config: Dict[str, Any]):
         """Initialize the finance adapter."""
         super().__init__(config)
@@ -34,6 +38,8 @@ class FinanceAdapter(BaseDomainAdapter):
             'RSI', 'MACD', 'EMA', 'SMA', 'EMA', 'Bollinger', 'ATR',
             'volume', 'price', 'support', 'resistance', 'breakout'
         ]
+        
+        self._term_matcher = TermMatcher(self.trading_terms + self.financial_indicators)
     
     def get_system_prompt(self) -> str:
         """Get the finance system prompt."""
@@ -73,7 +79,7 @@ Focus on:
         domain_terms = self._extract_domain_terms(query)
         
         # Check if query contains finance-related terms
-        has_finance_terms = any(term.lower() in query.lower() for term in self.trading_terms)
+        has_finance_terms = any(term in self.trading_terms for term in domain_terms)
         
         suggestions = []
         if not has_finance_terms:
@@ -88,18 +94,7 @@ Focus on:
     
     def _extract_domain_terms(self, query: str) -> List[str]:
         """Extract finance-specific terms from query."""
-        query_lower = query.lower()
-        found_terms = []
-        
-        for term in self.trading_terms:
-            if term.lower() in query_lower:
-                found_terms.append(term)
-        
-        for indicator in self.financial_indicators:
-            if indicator.lower() in query_lower:
-                found_terms.append(indicator)
-        
-        return found_terms
+        return self._term_matcher.find(query)
     
     def enhance_query(self, query: str) -> str:
         """Enhance a finance query with domain context."""
@@ -125,8 +120,9 @@ Focus on:
         formatted_response = response
         
         # Add risk disclaimer for trading advice
-        if any(term in response.lower() for term in ['buy', 'sell', 'trade', 'investment']):
-            formatted_response += "\n\n**Disclaimer**: This information is for educational purposes only and should not be considered as financial advice. Always consult with a qualified financial advisor before making investment decisions."
+        response_lower = response.lower()
+        if any(term in response_lower for term in self.ADVICE_TERMS):
+            formatted_response += self.DISCLAIMER
         
         return formatted_response
     
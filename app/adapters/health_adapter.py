@@ -4,7 +4,7 @@
 from typing import Dict, List, Any
 import logging
 
-from .base_adapter import BaseDomainAdapter
+from .base_adapter import BaseDomainAdapter, TermMatcher
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +16,9 @@ class HealthAdapter(BaseDomainAdapter):
     for the GraphMind RAG framework.
     """
     
+    # Appended to formatted responses
+    DISCLAIMER = "\n\n**Medical Disclaimer**: This information is for educational and research purposes only and should not be considered as medical advice. Always consult with a qualified healthcare professional for medical matters."
+    
     def __init__(self, config: Dict[str, Any]):
         """Initialize the health adapter."""
         super().__init__(config)
@@ -35,6 +38,8 @@ class HealthAdapter(BaseDomainAdapter):
             'psychiatry', 'surgery', 'internal medicine', 'emergency',
             'radiology', 'pathology', 'dermatology', 'orthopedics'
         ]
+        
+        self._term_matcher = TermMatcher(self.medical_terms + self.medical_specialties)
     
     def get_system_prompt(self) -> str:
         """Get the health system prompt."""
@@ -74,7 +79,7 @@ Focus on:
         domain_terms = self._extract_domain_terms(query)
         
         # Check if query contains health-related terms
-        has_health_terms = any(term.lower() in query.lower() for term in self.medical_terms)
+        has_health_terms = any(term in self.medical_terms for term in domain_terms)
         
         suggestions = []
         if not has_health_terms:
@@ -89,18 +94,7 @@ Focus on:
     
     def _extract_domain_terms(self, query: str) -> List[str]:
         """Extract health-specific terms from query."""
-        query_lower = query.lower()
-        found_terms = []
-        
-        for term in self.medical_terms:
-            if term.lower() in query_lower:
-                found_terms.append(term)
-        
-        for specialty in self.medical_specialties:
-            if specialty.lower() in query_lower:
-                found_terms.append(specialty)
-        
-        return found_terms
+        return self._term_matcher.find(query)
     
     def enhance_query(self, query: str) -> str:
         """Enhance a health query with domain context."""
@@ -126,7 +120,7 @@ Focus on:
         formatted_response = response
         
         # Add medical disclaimer
-        formatted_response += "\n\n**Medical Disclaimer**: This information is for educational and research purposes only and should not be considered as medical advice. Always consult with a qualified healthcare professional for medical matters."
+        formatted_response += self.DISCLAIMER
         
         return formatted_response
     
@@ -4,7 +4,7 @@
 from typing import Dict, List, Any
 import logging
 
-from .base_adapter import BaseDomainAdapter
+from .base_adapter import BaseDomainAdapter, TermMatcher
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +16,9 @@ class LegalAdapter(BaseDomainAdapter):
     for the GraphMind RAG framework.
     """
     
+    # Appended to formatted responses
+    DISCLAIMER = "\n\n**Legal Disclaimer**: This information is for educational and research purposes only and should not be considered as legal advice. Always consult with a qualified attorney for legal matters."
+    
     def __init__(self, config: Dict[str, Any]):
         """Initialize the legal adapter."""
         super().__init__(config)
@@ -35,6 +38,8 @@ class LegalAdapter(BaseDomainAdapter):
             'administrative', 'corporate', 'intellectual property',
             'family', 'employment', 'real estate', 'tax'
         ]
+        
+        self._term_matcher = TermMatcher(self.legal_terms + self.legal_areas)
     
     def get_system_prompt(self) -> str:
         """Get the legal system prompt."""
@@ -74,7 +79,7 @@ Focus on:
         domain_terms = self._extract_domain_terms(query)
         
         # Check if query contains legal-related terms
-        has_legal_terms = any(term.lower() in query.lower() for term in self.legal_terms)
+        has_legal_terms = any(term in self.legal_terms for term in domain_terms)
         
         suggestions = []
         if not has_legal_terms:
@@ -89,18 +94,7 @@ Focus on:
     
     def _extract_domain_terms(self, query: str) -> List[str]:
         """Extract legal-specific terms from query."""
-        query_lower = query.lower()
-        found_terms = []
-        
-        for term in self.legal_terms:
-            if term.lower() in query_lower:
-                found_terms.append(term)
-        
-        for area in self.legal_areas:
-            if area.lower() in query_lower:
-                found_terms.append(area)
-        
-        return found_terms
+        return self._term_matcher.find(query)
     
     def enhance_query(self, query: str) -> str:
         """Enhance a legal query with domain context."""
@@ -126,7 +120,7 @@ Focus on:
         formatted_response = response
         
         # Add legal disclaimer
-        formatted_response += "\n\n**Legal Disclaimer**: This information is for educational and research purposes only and should not be considered as legal advice. Always consult with a qualified attorney for legal matters."
+        formatted_response += self.DISCLAIMER
         
         return formatted_response
     
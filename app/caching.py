@@ -1,18 +1,98 @@
 """Advanced query caching with Redis and TTL."""
 import hashlib
+import heapq
 import json
 import time
 import os
+from collections import OrderedDict
 from functools import lru_cache
 from typing import Optional, Dict, Any
 import redis
 import aioredis
 
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+try:
+    from redis.cache import CacheConfig
+    REDIS_CLIENT_CACHE_AVAILABLE = True
+except ImportError:
+    REDIS_CLIENT_CACHE_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Version byte prefixed to msgpack payloads; JSON payloads start with '{'
+_MSGPACK_MAGIC = b"\x01"
+
+# Connection pools shared by every cache instance, keyed by Redis URL and
+# whether server-assisted client-side caching is enabled
+_REDIS_POOLS: Dict[tuple, redis.ConnectionPool] = {}
+_REDIS_POOL_MAX_CONNECTIONS = 32
+_CLIENT_CACHE_MAX_SIZE = 10000
+
+
+def _get_redis_pool(redis_url: str, client_tracking: bool = False) -> redis.ConnectionPool:
+    """Get the shared connection pool for a Redis URL."""
+    pool_key = (redis_url, client_tracking)
+    pool = _REDIS_POOLS.get(pool_key)
+    if pool is None:
+        kwargs = {'max_connections': _REDIS_POOL_MAX_CONNECTIONS}
+        if client_tracking:
+            # RESP3 CLIENT TRACKING: GETs are served from a local cache that
+            # the server invalidates when a key changes
+            kwargs.update(protocol=3, cache_config=CacheConfig(max_size=_CLIENT_CACHE_MAX_SIZE))
+        pool = _REDIS_POOLS.setdefault(pool_key, redis.ConnectionPool.from_url(redis_url, **kwargs))
+    return pool
+
+
+def _hash_cache_fields(*fields: Any) -> str:
+    """Hash cache key fields in a fixed order (xxh3 when available, MD5 otherwise)."""
+    hasher = xxhash.xxh3_64() if XXHASH_AVAILABLE else hashlib.md5()
+    for field in fields:
+        # Length-prefix each field so adjacent fields can't run together
+        data = str(field).encode()
+        hasher.update(len(data).to_bytes(4, 'little'))
+        hasher.update(data)
+    return hasher.hexdigest()
+
+
+def _encode_payload(data: Dict[str, Any]) -> bytes:
+    """Serialize a cache payload (versioned msgpack when available, JSON otherwise)."""
+    if MSGPACK_AVAILABLE:
+        return _MSGPACK_MAGIC + msgpack.packb(data, use_bin_type=True)
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data).encode()
+
+
+def _decode_payload(raw: bytes) -> Dict[str, Any]:
+    """Deserialize a cache payload written by _encode_payload."""
+    if raw[:1] == _MSGPACK_MAGIC:
+        # Payloads may carry non-str keys (packed as-is), so don't reject them
+        return msgpack.unpackb(raw[1:], raw=False, strict_map_key=False)
+    if ORJSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
 class QueryCache:
     """Simple query caching with TTL."""
     
     def __init__(self, max_size: int = 1000, ttl_seconds: int = 3600):
-        self.cache = {}
+        self.cache = {}  # key -> (response, expires_ns)
+        self._exp_heap = []  # (expires_ns, key), may hold stale entries
         self.max_size = max_size
         self.ttl_seconds = ttl_seconds
         self.hits = 0
@@ -23,31 +103,42 @@ class QueryCache:
         # Normalize query
         normalized_query = query.lower().strip()
         
-        # Create hash of query + model + relevant parameters
-        cache_data = {
-            'query': normalized_query,
-            'model': model,
-            'temperature': kwargs.get('temperature', 0.1),
-            'max_tokens': kwargs.get('max_tokens', 2000)
-        }
-        
-        cache_string = json.dumps(cache_data, sort_keys=True)
-        return hashlib.md5(cache_string.encode()).hexdigest()
+        # Hash query + model + relevant parameters in a fixed field order
+        return _hash_cache_fields(
+            normalized_query,
+            model,
+            kwargs.get('temperature', 0.1),
+            kwargs.get('max_tokens', 2000)
+        )
+    
+    def _pop_heap(self) -> Optional[str]:
+        """Pop the earliest-expiring live key off the heap, skipping stale entries."""
+        while self._exp_heap:
+            expires_ns, key = heapq.heappop(self._exp_heap)
+            entry = self.cache.get(key)
+            if entry is not None and entry[1] == expires_ns:
+                return key
+        return None
+    
+    def _reap(self):
+        """Drop all expired entries in one batch."""
+        now = time.monotonic_ns()
+        while self._exp_heap and self._exp_heap[0][0] <= now:
+            expires_ns, key = heapq.heappop(self._exp_heap)
+            # Stale entries (key re-set or evicted since) are just dropped
+            entry = self.cache.get(key)
+            if entry is not None and entry[1] == expires_ns:
+                del self.cache[key]
     
     def get(self, query: str, model: str, **kwargs) -> Optional[Dict[str, Any]]:
         """Get cached response."""
         cache_key = self._get_cache_key(query, model, **kwargs)
+        self._reap()
         
-        if cache_key in self.cache:
-            cached_data = self.cache[cache_key]
-            
-            # Check TTL
-            if time.time() - cached_data['timestamp'] < self.ttl_seconds:
-                self.hits += 1
-                return cached_data['response']
-            else:
-                # Expired, remove from cache
-                del self.cache[cache_key]
+        entry = self.cache.get(cache_key)
+        if entry is not None:
+            self.hits += 1
+            return entry[0]
         
         self.misses += 1
         return None
@@ -55,17 +146,22 @@ class QueryCache:
     def set(self, query: str, model: str, response: Dict[str, Any], **kwargs):
         """Cache response."""
         cache_key = self._get_cache_key(query, model, **kwargs)
+        self._reap()
         
-        # Simple LRU: remove oldest if at max size
-        if len(self.cache) >= self.max_size:
-            oldest_key = min(self.cache.keys(), 
-                           key=lambda k: self.cache[k]['timestamp'])
-            del self.cache[oldest_key]
+        # Every entry shares one TTL, so the earliest expiry is also the oldest entry
+        if cache_key not in self.cache and len(self.cache) >= self.max_size:
+            oldest_key = self._pop_heap()
+            if oldest_key is not None:
+                del self.cache[oldest_key]
         
-        self.cache[cache_key] = {
-            'response': response,
-            'timestamp': time.time()
-        }
+        expires_ns = time.monotonic_ns() + self.ttl_seconds * 1_000_000_000
+        self.cache[cache_key] = (response, expires_ns)
+        heapq.heappush(self._exp_heap, (expires_ns, cache_key))
+        
+        # Re-setting live keys leaves stale heap entries behind; rebuild when they pile up
+        if len(self._exp_heap) > 2 * max(len(self.cache), 64):
+            self._exp_heap = [(entry[1], key) for key, entry in self.cache.items()]
+            heapq.heapify(self._exp_heap)
     
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics."""
@@ -84,54 +180,92 @@ class QueryCache:
 class RedisQueryCache:
     """Redis-based query caching with TTL and async support."""
     
-    def __init__(self, redis_url: str = None, ttl_seconds: int = 3600):
+    def __init__(self, redis_url: str = None, ttl_seconds: int = 3600, l1_max_size: int = 1024,
+                 use_client_tracking: Optional[bool] = None):
         self.redis_url = redis_url or os.getenv('REDIS_URL', 'redis://localhost:6379')
         self.ttl_seconds = ttl_seconds
+        # Client-side caching needs Redis 6+ and redis-py 5.1+, so it is opt-in
+        if use_client_tracking is None:
+            use_client_tracking = os.getenv('REDIS_CLIENT_TRACKING', 'false').lower() == 'true'
+        if use_client_tracking and not REDIS_CLIENT_CACHE_AVAILABLE:
+            print("Redis client-side caching requires redis-py 5.1+, using the in-process cache instead")
+            use_client_tracking = False
+        self.use_client_tracking = use_client_tracking
         self.hits = 0
         self.misses = 0
         self.redis_client = None
         self.async_redis_client = None
+        # In-process LRU in front of Redis: key -> (cache_data, monotonic expiry).
+        # Server-invalidated client tracking replaces it when enabled.
+        self._l1 = OrderedDict()
+        self.l1_max_size = 0 if use_client_tracking else l1_max_size
         
     def _get_cache_key(self, query: str, model: str, **kwargs) -> str:
         """Generate cache key from query and parameters."""
         # Normalize query
         normalized_query = query.lower().strip()
         
-        # Create hash of query + model + relevant parameters
-        cache_data = {
-            'query': normalized_query,
-            'model': model,
-            'temperature': kwargs.get('temperature', 0.1),
-            'max_tokens': kwargs.get('max_tokens', 2000),
-            'mode': kwargs.get('mode', 'qa')
-        }
-        
-        # Create deterministic hash
-        cache_string = json.dumps(cache_data, sort_keys=True)
-        return f"query_cache:{hashlib.md5(cache_string.encode()).hexdigest()}"
+        # Hash query + model + relevant parameters in a fixed field order
+        return "query_cache:" + _hash_cache_fields(
+            normalized_query,
+            model,
+            kwargs.get('temperature', 0.1),
+            kwargs.get('max_tokens', 2000),
+            kwargs.get('mode', 'qa')
+        )
+    
+    def _l1_get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Get an unexpired entry from the in-process L1 cache."""
+        entry = self._l1.get(cache_key)
+        if entry is None:
+            return None
+        if time.monotonic() >= entry[1]:
+            del self._l1[cache_key]
+            return None
+        self._l1.move_to_end(cache_key)
+        return entry[0]
+    
+    def _l1_put(self, cache_key: str, cache_data: Dict[str, Any]):
+        """Store an entry in the L1 cache, expiring with its Redis copy."""
+        if self.l1_max_size <= 0:
+            return
+        age = time.time() - cache_data.get('cached_at', time.time())
+        self._l1[cache_key] = (cache_data, time.monotonic() + self.ttl_seconds - age)
+        self._l1.move_to_end(cache_key)
+        if len(self._l1) > self.l1_max_size:
+            self._l1.popitem(last=False)
     
     def _get_redis_client(self):
         """Get or create Redis client."""
         if self.redis_client is None:
-            self.redis_client = redis.from_url(self.redis_url, decode_responses=True)
+            self.redis_client = redis.Redis(
+                connection_pool=_get_redis_pool(self.redis_url, self.use_client_tracking)
+            )
         return self.redis_client
     
     async def _get_async_redis_client(self):
         """Get or create async Redis client."""
         if self.async_redis_client is None:
-            self.async_redis_client = aioredis.from_url(self.redis_url, decode_responses=True)
+            self.async_redis_client = aioredis.from_url(self.redis_url, decode_responses=False)
         return self.async_redis_client
     
     def get(self, query: str, model: str, **kwargs) -> Optional[Dict[str, Any]]:
         """Get cached response."""
         try:
-            redis_client = self._get_redis_client()
             cache_key = self._get_cache_key(query, model, **kwargs)
+            cached_data = self._l1_get(cache_key)
+            if cached_data is not None:
+                self.hits += 1
+                return cached_data
+            
+            redis_client = self._get_redis_client()
             cached_data = redis_client.get(cache_key)
             
             if cached_data:
                 self.hits += 1
-                return json.loads(cached_data)
+                cached_data = _decode_payload(cached_data)
+                self._l1_put(cache_key, cached_data)
+                return cached_data
             else:
                 self.misses += 1
                 return None
@@ -144,13 +278,20 @@ class RedisQueryCache:
     async def get_async(self, query: str, model: str, **kwargs) -> Optional[Dict[str, Any]]:
         """Get cached response asynchronously."""
         try:
-            redis_client = await self._get_async_redis_client()
             cache_key = self._get_cache_key(query, model, **kwargs)
+            cached_data = self._l1_get(cache_key)
+            if cached_data is not None:
+                self.hits += 1
+                return cached_data
+            
+            redis_client = await self._get_async_redis_client()
             cached_data = await redis_client.get(cache_key)
             
             if cached_data:
                 self.hits += 1
-                return json.loads(cached_data)
+                cached_data = _decode_payload(cached_data)
+                self._l1_put(cache_key, cached_data)
+                return cached_data
             else:
                 self.misses += 1
                 return None
@@ -174,7 +315,8 @@ class RedisQueryCache:
                 'model': model
             }
             
-            redis_client.setex(cache_key, self.ttl_seconds, json.dumps(cache_data))
+            redis_client.setex(cache_key, self.ttl_seconds, _encode_payload(cache_data))
+            self._l1_put(cache_key, cache_data)
             return True
             
         except Exception as e:
@@ -195,7 +337,8 @@ class RedisQueryCache:
                 'model': model
             }
             
-            await redis_client.setex(cache_key, self.ttl_seconds, json.dumps(cache_data))
+            await redis_client.setex(cache_key, self.ttl_seconds, _encode_payload(cache_data))
+            self._l1_put(cache_key, cache_data)
             return True
             
         except Exception as e:
@@ -204,11 +347,21 @@ class RedisQueryCache:
     
     def clear(self) -> bool:
         """Clear all cached queries."""
+        self._l1.clear()
         try:
             redis_client = self._get_redis_client()
-            keys = redis_client.keys("query_cache:*")
-            if keys:
-                redis_client.delete(*keys)
+            # SCAN instead of KEYS so the server is never blocked, and batch
+            # the deletes through a pipeline instead of one round-trip each
+            pipe = redis_client.pipeline(transaction=False)
+            pending = 0
+            for key in redis_client.scan_iter(match="query_cache:*", count=500):
+                pipe.delete(key)
+                pending += 1
+                if pending >= 1000:
+                    pipe.execute()
+                    pending = 0
+            if pending:
+                pipe.execute()
             return True
         except Exception as e:
             print(f"Redis cache clear error: {e}")
@@ -218,12 +371,22 @@ class RedisQueryCache:
         """Get cache statistics."""
         try:
             redis_client = self._get_redis_client()
-            keys = redis_client.keys("query_cache:*")
+            # Count cache keys with a non-blocking SCAN instead of KEYS
+            cached_queries = sum(1 for _ in redis_client.scan_iter(match="query_cache:*", count=1000))
+            
+            # Server-wide key count and memory in one round-trip
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.dbsize()
+            pipe.memory_stats()
+            total_keys, memory_stats = pipe.execute()
+            
             return {
                 'hits': self.hits,
                 'misses': self.misses,
                 'hit_rate': self.hits / (self.hits + self.misses) if (self.hits + self.misses) > 0 else 0.0,
-                'cached_queries': len(keys),
+                'cached_queries': cached_queries,
+                'total_keys': total_keys,
+                'used_memory': memory_stats.get('total.allocated', 0),
                 'redis_connected': True
             }
         except Exception as e:
@@ -1,13 +1,91 @@
 # GraphMind Core Embeddings Service
 # Domain-agnostic embedding functionality
 
+import asyncio
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Callable
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
 logger = logging.getLogger(__name__)
 
+# Try to import simsimd for SIMD cosine kernels, fall back to NumPy if not available
+try:
+    import simsimd
+    SIMSIMD_AVAILABLE = True
+except ImportError:
+    SIMSIMD_AVAILABLE = False
+
+# Try to import FAISS for approximate nearest-neighbour search over stored documents
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+class _BatchingQueue:
+    """
+    Coalesces concurrent single-text embedding requests into batched encode calls.
+    
+    Requests that arrive within ``max_wait_ms`` of the first queued request are
+    encoded together (up to ``max_batch`` texts) in a worker thread.
+    """
+    
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], max_batch: int = 32, max_wait_ms: float = 5.0):
+        """Initialize the batching queue."""
+        self._encode = encode
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._loop = None
+        self._queue = None
+        self._worker = None
+    
+    async def submit(self, text: str) -> np.ndarray:
+        """Queue a text for embedding and wait for its vector."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = None
+        
+        future = loop.create_future()
+        self._queue.put_nowait((text, future))
+        if self._worker is None or self._worker.done():
+            self._worker = loop.create_task(self._drain())
+        return await future
+    
+    async def _drain(self):
+        """Encode queued texts in batches until the queue is empty."""
+        loop = asyncio.get_running_loop()
+        while not self._queue.empty():
+            batch = [self._queue.get_nowait()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            texts = [text for text, _ in batch]
+            try:
+                embeddings = await asyncio.to_thread(self._encode, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+
 class EmbeddingService:
     """
     Domain-agnostic embedding service for GraphMind.
@@ -22,16 +100,135 @@ class EmbeddingService:
         self.config = config or {}
         self.model = None
         self._initialize_model()
+        
+        # Exact-match LRU cache of embeddings keyed by text hash (0 disables)
+        self._cache_size = self.config.get('embedding_cache_size', 10000)
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        
+        # Row-normalized document matrix set via set_document_embeddings,
+        # optionally kept as int8 with per-row scales
+        self._doc_matrix: Optional[np.ndarray] = None
+        self._quantize = self.config.get('quantize_embeddings', False)
+        self._doc_matrix_i8: Optional[np.ndarray] = None
+        self._doc_scales: Optional[np.ndarray] = None
+        
+        # FAISS inner-product index over the stored matrix: exact for small
+        # corpora, IVF once the corpus reaches ann_min_documents
+        self._faiss_index = None
+        self._ann_min_documents = self.config.get('ann_min_documents', 10000)
+        self._ann_nprobe = self.config.get('ann_nprobe', 16)
+        
+        # Optional persistent cache of embeddings keyed by (model_name, text hash)
+        self._disk_cache: Optional[sqlite3.Connection] = None
+        self._disk_cache_lock = threading.Lock()
+        cache_path = self.config.get('embedding_cache_path')
+        if cache_path:
+            self._open_disk_cache(cache_path)
+        
+        self._query_batcher = _BatchingQueue(
+            lambda texts: self.model.encode(texts, batch_size=len(texts)),
+            max_batch=self.config.get('query_batch_size', 32),
+            max_wait_ms=self.config.get('query_batch_wait_ms', 5.0)
+        )
     
     def _initialize_model(self):
         """Initialize the embedding model."""
         try:
             self.model = SentenceTransformer(self.model_name)
+            if self.config.get('compile_model', False):
+                self._compile_model()
             logger.info(f"GraphMind embedding service initialized with model: {self.model_name}")
         except Exception as e:
             logger.error(f"Failed to initialize embedding model: {e}")
             raise
     
+    def _compile_model(self):
+        """Compile the transformer module with torch.compile, keeping eager mode on failure."""
+        try:
+            import torch
+            transformer = self.model[0]
+            transformer.auto_model = torch.compile(
+                transformer.auto_model,
+                mode=self.config.get('compile_mode', 'reduce-overhead'),
+                # Batches are padded to their longest text, so sequence length varies
+                dynamic=True
+            )
+            logger.info("Embedding model compiled with torch.compile")
+        except Exception as e:
+            logger.warning(f"torch.compile unavailable, using eager model: {e}")
+    
+    def _open_disk_cache(self, cache_path: str):
+        """Open (or create) the SQLite embedding cache at cache_path."""
+        try:
+            conn = sqlite3.connect(cache_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS emb (key BLOB PRIMARY KEY, vec BLOB)")
+            conn.commit()
+            self._disk_cache = conn
+            logger.info(f"Embedding disk cache opened at {cache_path}")
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding disk cache unavailable, continuing without it: {e}")
+    
+    def _disk_key(self, text: str) -> bytes:
+        """Build the disk cache key; includes the model name so a model change invalidates entries."""
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode()).digest()
+    
+    def _disk_cache_get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """Fetch cached embeddings for the given keys."""
+        found = {}
+        # Stay under SQLite's default bound-parameter limit
+        chunk = 900
+        with self._disk_cache_lock:
+            for start in range(0, len(keys), chunk):
+                part = keys[start:start + chunk]
+                placeholders = ",".join("?" * len(part))
+                rows = self._disk_cache.execute(
+                    f"SELECT key, vec FROM emb WHERE key IN ({placeholders})", part
+                ).fetchall()
+                for key, vec in rows:
+                    found[key] = np.frombuffer(vec, dtype=np.float32)
+        return found
+    
+    def _disk_cache_put_many(self, items: List[tuple]):
+        """Write (key, embedding) pairs to the disk cache."""
+        rows = [(key, np.asarray(vec, dtype=np.float32).tobytes()) for key, vec in items]
+        with self._disk_cache_lock:
+            self._disk_cache.executemany("INSERT OR REPLACE INTO emb (key, vec) VALUES (?, ?)", rows)
+            self._disk_cache.commit()
+    
+    def _cache_get(self, text: str) -> Optional[np.ndarray]:
+        """Return a copy of the cached embedding for text, if any."""
+        if not self._cache_size:
+            return None
+        key = hashlib.sha1(text.encode()).hexdigest()
+        with self._cache_lock:
+            embedding = self._cache.get(key)
+            if embedding is None:
+                return None
+            self._cache.move_to_end(key)
+        return embedding.copy()
+    
+    def _cache_put(self, text: str, embedding: np.ndarray):
+        """Store an embedding for text, evicting the least recently used entry."""
+        if not self._cache_size:
+            return
+        key = hashlib.sha1(text.encode()).hexdigest()
+        with self._cache_lock:
+            self._cache[key] = np.array(embedding, copy=True)
+            self._cache.move_to_end(key)
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+    
+    def _encode_cached(self, text: str) -> np.ndarray:
+        """Encode a single text, serving repeats from the LRU cache."""
+        embedding = self._cache_get(text)
+        if embedding is None:
+            embedding = self.model.encode(text)
+            self._cache_put(text, embedding)
+        return embedding
+    
     def embed_text(self, text: str) -> np.ndarray:
         """
         Generate embedding for a single text.
@@ -43,8 +240,7 @@ class EmbeddingService:
             Embedding vector
         """
         try:
-            embedding = self.model.encode(text)
-            return embedding
+            return self._encode_cached(text)
         except Exception as e:
             logger.error(f"Text embedding failed: {e}")
             raise
@@ -61,12 +257,33 @@ class EmbeddingService:
             Array of embedding vectors
         """
         try:
-            embeddings = self.model.encode(texts, batch_size=batch_size)
-            return embeddings
+            if self._disk_cache is None or not texts:
+                return self.model.encode(texts, batch_size=batch_size)
+            return self._embed_texts_disk_cached(texts, batch_size)
         except Exception as e:
             logger.error(f"Batch embedding failed: {e}")
             raise
     
+    def _embed_texts_disk_cached(self, texts: List[str], batch_size: int) -> np.ndarray:
+        """Embed texts, encoding only those missing from the disk cache."""
+        keys = [self._disk_key(text) for text in texts]
+        cached = self._disk_cache_get_many(list(set(keys)))
+        
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        
+        if missing:
+            encoded = np.asarray(
+                self.model.encode(list(missing.values()), batch_size=batch_size), dtype=np.float32
+            )
+            new_items = list(zip(missing.keys(), encoded))
+            self._disk_cache_put_many(new_items)
+            cached.update(new_items)
+        
+        return np.stack([cached[key] for key in keys])
+    
     def embed_query(self, query: str, domain: str = "generic") -> np.ndarray:
         """
         Generate embedding for a search query with domain context.
@@ -85,28 +302,151 @@ class EmbeddingService:
             else:
                 domain_query = query
             
-            embedding = self.model.encode(domain_query)
+            return self._encode_cached(domain_query)
+        except Exception as e:
+            logger.error(f"Query embedding failed: {e}")
+            raise
+    
+    async def embed_query_async(self, query: str, domain: str = "generic") -> np.ndarray:
+        """
+        Generate a query embedding, batching concurrent calls into one model call.
+        
+        Args:
+            query: Search query
+            domain: Domain context for embedding
+            
+        Returns:
+            Query embedding vector
+        """
+        try:
+            # Add domain context to query if needed
+            if domain != "generic":
+                domain_query = f"[{domain}] {query}"
+            else:
+                domain_query = query
+            
+            embedding = self._cache_get(domain_query)
+            if embedding is None:
+                embedding = await self._query_batcher.submit(domain_query)
+                self._cache_put(domain_query, embedding)
             return embedding
         except Exception as e:
             logger.error(f"Query embedding failed: {e}")
             raise
     
+    @staticmethod
+    def _quantize_int8(vecs: np.ndarray):
+        """
+        Symmetrically quantize vectors to int8 with one scale per row.
+        
+        Returns:
+            Tuple of (int8 vectors, float32 scales) such that vecs ~= q * scale
+        """
+        vecs = np.atleast_2d(np.asarray(vecs, dtype=np.float32))
+        scales = np.abs(vecs).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.clip(np.rint(vecs / scales[:, None]), -127, 127).astype(np.int8)
+        return np.ascontiguousarray(quantized), scales.astype(np.float32)
+    
+    def set_document_embeddings(self, doc_embeddings: np.ndarray):
+        """
+        Store document embeddings as a contiguous, row-normalized float32 matrix.
+        
+        Once set, ``compute_similarity`` can be called without ``doc_embeddings``
+        and reduces to a single matrix-vector product. With ``quantize_embeddings``
+        enabled, an int8 copy is kept and used for that product instead.
+        
+        Args:
+            doc_embeddings: Document embedding vectors, shape (N, d)
+        """
+        matrix = np.array(doc_embeddings, dtype=np.float32, order="C", copy=True)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+        self._doc_matrix = matrix
+        if self._quantize:
+            self._doc_matrix_i8, self._doc_scales = self._quantize_int8(matrix)
+        if FAISS_AVAILABLE:
+            self._faiss_index = self._build_faiss_index(matrix)
+    
+    def _build_faiss_index(self, matrix: np.ndarray):
+        """Build an inner-product FAISS index over a normalized document matrix."""
+        num_docs, dimension = matrix.shape
+        if num_docs < self._ann_min_documents:
+            index = faiss.IndexFlatIP(dimension)
+        else:
+            nlist = int(4 * np.sqrt(num_docs))
+            index = faiss.index_factory(dimension, f"IVF{nlist},Flat", faiss.METRIC_INNER_PRODUCT)
+            index.train(matrix)
+            index.nprobe = self._ann_nprobe
+        index.add(matrix)
+        return index
+    
+    def search_documents(self, query_embedding: np.ndarray, top_k: int = 10):
+        """
+        Find the stored documents most similar to a query.
+        
+        Uses the FAISS index when available, otherwise a full similarity scan.
+        
+        Args:
+            query_embedding: Query embedding vector
+            top_k: Number of candidates to return
+            
+        Returns:
+            Tuple of (document indices, similarity scores), best first
+        """
+        try:
+            if self._doc_matrix is None:
+                raise ValueError("No document embeddings stored")
+            top_k = min(top_k, len(self._doc_matrix))
+            
+            if self._faiss_index is not None:
+                query = np.asarray(query_embedding, dtype=np.float32).reshape(1, -1)
+                query = query / np.linalg.norm(query)
+                scores, indices = self._faiss_index.search(query, top_k)
+                found = indices[0] >= 0
+                return indices[0][found], scores[0][found]
+            
+            similarities = self.compute_similarity(query_embedding)
+            indices = np.argpartition(-similarities, top_k - 1)[:top_k]
+            indices = indices[np.argsort(-similarities[indices])]
+            return indices, similarities[indices]
+        except Exception as e:
+            logger.error(f"Document search failed: {e}")
+            raise
+    
     def compute_similarity(
         self, 
         query_embedding: np.ndarray, 
-        doc_embeddings: np.ndarray
+        doc_embeddings: Optional[np.ndarray] = None
     ) -> np.ndarray:
         """
         Compute similarity between query and document embeddings.
         
         Args:
             query_embedding: Query embedding vector
-            doc_embeddings: Document embedding vectors
+            doc_embeddings: Document embedding vectors; defaults to the matrix
+                stored with ``set_document_embeddings``
             
         Returns:
             Similarity scores
         """
         try:
+            if doc_embeddings is None:
+                if self._doc_matrix is None:
+                    raise ValueError("No document embeddings provided or stored")
+                query = np.asarray(query_embedding, dtype=np.float32)
+                query = query / np.linalg.norm(query)
+                if self._doc_matrix_i8 is not None:
+                    return self._compute_similarity_int8(query)
+                return self._doc_matrix @ query
+            
+            if SIMSIMD_AVAILABLE:
+                query = np.ascontiguousarray(query_embedding, dtype=np.float32).reshape(1, -1)
+                docs = np.ascontiguousarray(doc_embeddings, dtype=np.float32)
+                distances = np.asarray(simsimd.cdist(query, docs, metric="cosine"))
+                return 1.0 - distances.ravel()
+            
             # Normalize embeddings
             query_norm = query_embedding / np.linalg.norm(query_embedding)
             doc_norms = doc_embeddings / np.linalg.norm(doc_embeddings, axis=1, keepdims=True)
@@ -118,6 +458,15 @@ class EmbeddingService:
             logger.error(f"Similarity computation failed: {e}")
             raise
     
+    def _compute_similarity_int8(self, query: np.ndarray) -> np.ndarray:
+        """Compute similarity of a normalized query against the int8 document matrix."""
+        query_i8, query_scale = self._quantize_int8(query)
+        if SIMSIMD_AVAILABLE:
+            dots = np.asarray(simsimd.cdist(query_i8, self._doc_matrix_i8, metric="dot")).ravel()
+        else:
+            dots = self._doc_matrix_i8.astype(np.int32) @ query_i8[0].astype(np.int32)
+        return dots.astype(np.float32) * query_scale[0] * self._doc_scales
+    
     def get_model_info(self) -> Dict[str, Any]:
         """Get information about the embedding model."""
         return {
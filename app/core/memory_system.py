@@ -2,7 +2,7 @@
 # Domain-agnostic memory system for GraphMind
 
 import logging
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Union, IO
 import json
 import os
 from pathlib import Path
@@ -11,6 +11,31 @@ import asyncio
 
 logger = logging.getLogger(__name__)
 
+# Try to import orjson for faster memory file serialization, fall back to json
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+def _read_json(path: Path) -> Any:
+    """Read a JSON file."""
+    if ORJSON_AVAILABLE:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _write_json(path: Path, data: Any):
+    """Write data as indented UTF-8 JSON."""
+    # Serialize before opening so a failed dump can't truncate the existing file
+    if ORJSON_AVAILABLE:
+        payload = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    else:
+        payload = json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+    with open(path, 'wb') as f:
+        f.write(payload)
+
 class GraphMindMemorySystem:
     """
     Domain-agnostic memory system for GraphMind.
@@ -36,8 +61,7 @@ class GraphMindMemorySystem:
             
             # Load existing memory
             if self.memory_file.exists():
-                with open(self.memory_file, 'r', encoding='utf-8') as f:
-                    self.memory = json.load(f)
+                self.memory = _read_json(self.memory_file)
                 logger.info(f"Loaded memory with {len(self.memory)} entries")
             else:
                 self.memory = {}
@@ -89,6 +113,43 @@ class GraphMindMemorySystem:
             logger.error(f"Failed to add memory entry {key}: {e}")
             return False
     
+    async def add_memory_bulk(
+        self, 
+        entries: List[tuple]
+    ) -> bool:
+        """
+        Add several memory entries with a single save.
+        
+        Args:
+            entries: ``(key, value, domain, metadata)`` tuples; ``domain`` and
+                ``metadata`` may be omitted
+            
+        Returns:
+            True if added successfully, False otherwise
+        """
+        try:
+            now = datetime.now().isoformat()
+            for key, value, *rest in entries:
+                domain = rest[0] if len(rest) > 0 and rest[0] is not None else "generic"
+                metadata = rest[1] if len(rest) > 1 else None
+                self.memory[key] = {
+                    'value': value,
+                    'domain': domain,
+                    'created_at': now,
+                    'updated_at': now,
+                    'metadata': metadata or {}
+                }
+            
+            # Save to file once for the whole batch
+            await self._save_memory()
+            
+            logger.info(f"Added {len(entries)} memory entries")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Failed to add memory entries: {e}")
+            return False
+    
     async def get_memory(self, key: str) -> Optional[Any]:
         """
         Get a memory entry.
@@ -189,41 +250,64 @@ class GraphMindMemorySystem:
         Returns:
             List of matching memory entries
         """
+        results = await self.search_memory_many([query], domain=domain, limit=limit)
+        return results[0]
+    
+    async def search_memory_many(
+        self, 
+        queries: List[str], 
+        domain: Optional[str] = None,
+        limit: int = 10
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Search memory entries for several queries in one pass over memory.
+        
+        Args:
+            queries: Search queries
+            domain: Domain filter (optional)
+            limit: Maximum results per query
+            
+        Returns:
+            List of matching memory entries for each query, in query order
+        """
         try:
-            results = []
-            query_lower = query.lower()
+            results = [[] for _ in queries]
+            queries_lower = [query.lower() for query in queries]
             
             for key, entry in self.memory.items():
                 # Filter by domain if specified
                 if domain and entry.get('domain') != domain:
                     continue
                 
-                # Search in key and value
-                key_match = query_lower in key.lower()
-                value_match = False
-                
-                # Search in value if it's a string
-                if isinstance(entry.get('value'), str):
-                    value_match = query_lower in entry['value'].lower()
+                # Lowercase key and value once for all queries
+                key_lower = key.lower()
+                value = entry.get('value')
+                value_lower = value.lower() if isinstance(value, str) else None
+                match = None
                 
-                if key_match or value_match:
-                    results.append({
-                        'key': key,
-                        'value': entry['value'],
-                        'domain': entry.get('domain'),
-                        'created_at': entry.get('created_at'),
-                        'updated_at': entry.get('updated_at'),
-                        'metadata': entry.get('metadata', {})
-                    })
+                for query_results, query_lower in zip(results, queries_lower):
+                    if query_lower in key_lower or (value_lower is not None and query_lower in value_lower):
+                        if match is None:
+                            match = {
+                                'key': key,
+                                'value': entry['value'],
+                                'domain': entry.get('domain'),
+                                'created_at': entry.get('created_at'),
+                                'updated_at': entry.get('updated_at'),
+                                'metadata': entry.get('metadata', {})
+                            }
+                        # Each query gets its own dict so callers can't alias results
+                        query_results.append(dict(match))
             
             # Sort by updated_at (most recent first)
-            results.sort(key=lambda x: x.get('updated_at', ''), reverse=True)
+            for query_results in results:
+                query_results.sort(key=lambda x: x.get('updated_at', ''), reverse=True)
             
-            return results[:limit]
+            return [query_results[:limit] for query_results in results]
             
         except Exception as e:
             logger.error(f"Memory search failed: {e}")
-            return []
+            return [[] for _ in queries]
     
     async def get_domain_memory(self, domain: str) -> Dict[str, Any]:
         """
@@ -306,22 +390,26 @@ class GraphMindMemorySystem:
             logger.error(f"Failed to clear domain memory for {domain}: {e}")
             return False
     
-    async def export_memory(self, file_path: str) -> bool:
+    async def export_memory(self, file_path: Union[str, IO[str]]) -> bool:
         """
         Export memory to a file.
         
         Args:
-            file_path: Export file path
+            file_path: Export file path, or a text file-like object to write to
             
         Returns:
             True if exported successfully, False otherwise
         """
         try:
+            if hasattr(file_path, 'write'):
+                file_path.write(json.dumps(self.memory, indent=2, ensure_ascii=False))
+                logger.info("Exported memory to file object")
+                return True
+            
             export_path = Path(file_path)
             export_path.parent.mkdir(parents=True, exist_ok=True)
             
-            with open(export_path, 'w', encoding='utf-8') as f:
-                json.dump(self.memory, f, indent=2, ensure_ascii=False)
+            _write_json(export_path, self.memory)
             
             logger.info(f"Exported memory to: {file_path}")
             return True
@@ -330,24 +418,26 @@ class GraphMindMemorySystem:
             logger.error(f"Failed to export memory: {e}")
             return False
     
-    async def import_memory(self, file_path: str) -> bool:
+    async def import_memory(self, file_path: Union[str, IO[str]]) -> bool:
         """
         Import memory from a file.
         
         Args:
-            file_path: Import file path
+            file_path: Import file path, or a text file-like object to read from
             
         Returns:
             True if imported successfully, False otherwise
         """
         try:
-            import_path = Path(file_path)
-            if not import_path.exists():
-                logger.error(f"Import file not found: {file_path}")
-                return False
-            
-            with open(import_path, 'r', encoding='utf-8') as f:
-                imported_memory = json.load(f)
+            if hasattr(file_path, 'read'):
+                imported_memory = json.loads(file_path.read())
+            else:
+                import_path = Path(file_path)
+                if not import_path.exists():
+                    logger.error(f"Import file not found: {file_path}")
+                    return False
+                
+                imported_memory = _read_json(import_path)
             
             # Merge with existing memory
             self.memory.update(imported_memory)
@@ -355,7 +445,7 @@ class GraphMindMemorySystem:
             # Save to file
             await self._save_memory()
             
-            logger.info(f"Imported memory from: {file_path}")
+            logger.info(f"Imported memory from: {getattr(file_path, 'name', file_path)}")
             return True
             
         except Exception as e:
@@ -371,8 +461,7 @@ class GraphMindMemorySystem:
                 self.memory_file.rename(backup_file)
             
             # Save memory
-            with open(self.memory_file, 'w', encoding='utf-8') as f:
-                json.dump(self.memory, f, indent=2, ensure_ascii=False)
+            _write_json(self.memory_file, self.memory)
             
             # Remove backup if save successful
             backup_file = self.memory_file.with_suffix('.json.backup')
@@ -4,6 +4,7 @@
 import logging
 from typing import Dict, List, Any, Optional
 import asyncio
+import heapq
 from pathlib import Path
 
 from .retrieval import HybridRetriever
@@ -161,9 +162,10 @@ class GraphMindRAGSystem:
             
             # Rerank results
             if self.reranking_service:
+                candidates = self._select_rerank_candidates(processed_results, top_k)
                 reranked_results = self.reranking_service.rerank_documents(
                     query, 
-                    processed_results, 
+                    candidates, 
                     top_k=top_k,
                     domain=self.current_domain
                 )
@@ -176,6 +178,48 @@ class GraphMindRAGSystem:
             logger.error(f"Search failed: {e}")
             return []
     
+    def _select_rerank_candidates(
+        self, 
+        results: List[Dict[str, Any]], 
+        top_k: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Deduplicate results and keep the best first-stage candidates for reranking.
+        
+        A single pass drops repeated (doc_id, page) entries and keeps a bounded
+        min-heap of the ``rerank_candidates`` highest connector scores (default
+        ``top_k * 8``), so the cross-encoder only scores results that can still
+        reach the top k.
+        
+        Args:
+            results: Processed connector results
+            top_k: Number of final results
+            
+        Returns:
+            Candidate results, best first-stage score first
+        """
+        pool_size = self.config.get('rerank_candidates', top_k * 8)
+        heap = []
+        seen = set()
+        
+        for position, result in enumerate(results):
+            metadata = result.get('metadata', {})
+            doc_id = metadata.get('doc_id')
+            if doc_id:
+                key = (doc_id, metadata.get('page'))
+                if key in seen:
+                    continue
+                seen.add(key)
+            
+            # Position breaks score ties so earlier results win and docs are never compared
+            entry = (result.get('score', 0.0), -position, result)
+            if len(heap) < pool_size:
+                heapq.heappush(heap, entry)
+            else:
+                heapq.heappushpop(heap, entry)
+        
+        return [result for _, _, result in sorted(heap, reverse=True)]
+    
     async def get_context(
         self, 
         query: str, 
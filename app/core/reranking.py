@@ -2,13 +2,25 @@
 # Domain-agnostic reranking functionality
 
 import logging
-from typing import List, Dict, Any, Optional
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Callable
 import numpy as np
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 import torch
 
+# Let the Rust tokenizer batch-encode across threads unless the user opted out
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "true")
+
 logger = logging.getLogger(__name__)
 
+# Try to import ONNX Runtime (via optimum) for quantized CPU inference
+try:
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    ORT_AVAILABLE = True
+except ImportError:
+    ORT_AVAILABLE = False
+
 class RerankingService:
     """
     Domain-agnostic reranking service for GraphMind.
@@ -17,23 +29,65 @@ class RerankingService:
     across any domain without trading-specific terminology.
     """
     
-    def __init__(self, model_name: str = "BAAI/bge-reranker-large", config: Optional[Dict[str, Any]] = None):
-        """Initialize the reranking service."""
+    def __init__(
+        self,
+        model_name: str = "BAAI/bge-reranker-large",
+        config: Optional[Dict[str, Any]] = None,
+        scorer: Optional[Callable[[str, str], float]] = None
+    ):
+        """
+        Initialize the reranking service.
+        
+        Args:
+            model_name: Local cross-encoder model name
+            config: Service configuration
+            scorer: Optional ``(query, text) -> score`` callable (e.g. an LLM or
+                API reranker) used instead of the local cross-encoder; calls are
+                fanned out over ``max_concurrency`` threads
+        """
         self.model_name = model_name
         self.config = config or {}
+        self.scorer = scorer
+        self.max_concurrency = self.config.get('max_concurrency', 8)
         self.tokenizer = None
         self.model = None
+        self.backend = None
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self._initialize_model()
+        if self.scorer is None:
+            self._initialize_model()
     
     def _initialize_model(self):
-        """Initialize the reranking model."""
+        """
+        Initialize the reranking model.
+        
+        On CPU, an ONNX export at config ``onnx_model_path`` (see
+        scripts/export_reranker_onnx.py) is run with ONNX Runtime when
+        optimum is installed; otherwise the PyTorch model is used. On CUDA
+        the model is loaded in FP16, with config ``attn_implementation``
+        (e.g. ``"flash_attention_2"``) passed through when set.
+        """
         try:
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
-            self.model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
-            self.model.to(self.device)
-            self.model.eval()
-            logger.info(f"GraphMind reranking service initialized with model: {self.model_name}")
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name, use_fast=True)
+            onnx_model_path = self.config.get('onnx_model_path')
+            if onnx_model_path and ORT_AVAILABLE and self.device == "cpu":
+                self.model = ORTModelForSequenceClassification.from_pretrained(
+                    onnx_model_path,
+                    file_name=self.config.get('onnx_file_name', 'model_quantized.onnx'),
+                    provider="CPUExecutionProvider"
+                )
+                self.backend = "onnxruntime"
+            else:
+                model_kwargs = {}
+                if self.device == "cuda":
+                    # Half precision runs the attention/FFN matmuls on tensor cores
+                    model_kwargs['torch_dtype'] = torch.float16
+                    if self.config.get('attn_implementation'):
+                        model_kwargs['attn_implementation'] = self.config['attn_implementation']
+                self.model = AutoModelForSequenceClassification.from_pretrained(self.model_name, **model_kwargs)
+                self.model.to(self.device)
+                self.model.eval()
+                self.backend = "torch"
+            logger.info(f"GraphMind reranking service initialized with model: {self.model_name} ({self.backend})")
         except Exception as e:
             logger.error(f"Failed to initialize reranking model: {e}")
             raise
@@ -84,32 +138,74 @@ class RerankingService:
             return documents[:top_k]  # Return original order if reranking fails
     
     def _compute_rerank_scores(self, pairs: List[tuple]) -> np.ndarray:
-        """Compute reranking scores for query-document pairs."""
+        """
+        Compute reranking scores for query-document pairs.
+        
+        Pairs are sorted by document length and tokenized in one call, then
+        padded and scored in batches of ``batch_size`` so each batch pads only
+        to its own longest pair; scores are returned in the original pair order.
+        """
+        if self.scorer is not None:
+            return self._compute_scorer_scores(pairs)
+        
         try:
-            # Tokenize pairs
-            inputs = self.tokenizer(
-                pairs,
-                padding=True,
+            batch_size = self.config.get('batch_size', 32)
+            order = sorted(range(len(pairs)), key=lambda i: len(pairs[i][1]))
+            scores = np.empty(len(pairs), dtype=np.float32)
+            
+            # Tokenize all pairs at once so the fast tokenizer can parallelize
+            encodings = self.tokenizer(
+                [pairs[i] for i in order],
                 truncation=True,
-                max_length=512,
-                return_tensors="pt"
+                max_length=512
             )
             
-            # Move to device
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            for start in range(0, len(order), batch_size):
+                indices = order[start:start + batch_size]
+                
+                # Pad this batch only
+                inputs = self.tokenizer.pad(
+                    {k: v[start:start + batch_size] for k, v in encodings.items()},
+                    return_tensors="pt"
+                )
+                
+                # Move to device; pinned host memory lets the copy run asynchronously
+                if self.device == "cuda":
+                    inputs = {k: v.pin_memory().to(self.device, non_blocking=True) for k, v in inputs.items()}
+                else:
+                    inputs = {k: v.to(self.device) for k, v in inputs.items()}
+                
+                # Compute scores
+                with torch.no_grad():
+                    outputs = self.model(**inputs)
+                    batch_scores = torch.sigmoid(outputs.logits).squeeze(-1)
+                
+                scores[indices] = batch_scores.float().cpu().numpy()
             
-            # Compute scores
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                scores = torch.sigmoid(outputs.logits).squeeze(-1)
-            
-            return scores.cpu().numpy()
+            return scores
             
         except Exception as e:
             logger.error(f"Score computation failed: {e}")
             # Return uniform scores if computation fails
             return np.ones(len(pairs)) * 0.5
     
+    def _score_one(self, pair: tuple) -> float:
+        """Score a single pair with the external scorer, using 0.5 on failure."""
+        try:
+            return float(self.scorer(*pair))
+        except Exception as e:
+            logger.warning(f"Scorer failed for pair, using neutral score: {e}")
+            return 0.5
+    
+    def _compute_scorer_scores(self, pairs: List[tuple]) -> np.ndarray:
+        """Compute scores with the external scorer, concurrently when allowed."""
+        if self.max_concurrency > 1 and len(pairs) > 1:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(pairs))) as executor:
+                scores = list(executor.map(self._score_one, pairs))
+        else:
+            scores = [self._score_one(pair) for pair in pairs]
+        return np.asarray(scores, dtype=np.float32)
+    
     def rerank_with_domain_context(
         self,
         query: str,
@@ -172,5 +268,6 @@ class RerankingService:
             "model_name": self.model_name,
             "device": self.device,
             "max_length": 512,
-            "model_type": "cross_encoder"
+            "model_type": "cross_encoder" if self.scorer is None else "external_scorer",
+            "backend": self.backend
         }
@@ -112,17 +112,15 @@ class HybridRetriever:
             return []
     
     def _deduplicate_results(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Remove duplicate results based on document ID."""
-        seen_ids = set()
-        unique_results = []
+        """Remove duplicate results based on document ID, keeping the first seen."""
+        unique_results = {}
         
         for result in results:
             doc_id = result.get('metadata', {}).get('doc_id')
-            if doc_id and doc_id not in seen_ids:
-                seen_ids.add(doc_id)
-                unique_results.append(result)
+            if doc_id and doc_id not in unique_results:
+                unique_results[doc_id] = result
         
-        return unique_results
+        return list(unique_results.values())
     
     async def get_context(
         self, 
@@ -2107,3 +2107,32 @@ async def test_obsidian_connection(request: dict, current_user: dict = Depends(g
 async def health_check():
     """Health check endpoint."""
     return JSONResponse(content={"status": "healthy", "service": "tradingai-research-platform"})
+
+
+@app.get("/health/all")
+async def health_check_all():
+    """Health of the backend and its ChromaDB and Redis dependencies in one call."""
+    import asyncio
+    import aiohttp
+    import os
+    
+    async def check_chroma():
+        chroma_url = os.getenv("CHROMA_URL", "http://chromadb:8000")
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f"{chroma_url}/api/v1/heartbeat", timeout=aiohttp.ClientTimeout(total=5)) as response:
+                    return "healthy" if response.status == 200 else f"unhealthy (HTTP {response.status})"
+        except Exception as e:
+            return f"unhealthy ({e})"
+    
+    async def check_redis():
+        try:
+            redis_client = await redis_query_cache._get_async_redis_client()
+            await asyncio.wait_for(redis_client.ping(), timeout=5)
+            return "healthy"
+        except Exception as e:
+            return f"unhealthy ({e})"
+    
+    # The backend is healthy if it is answering; check its dependencies concurrently
+    chroma, redis_status = await asyncio.gather(check_chroma(), check_redis())
+    return JSONResponse(content={"backend": "healthy", "chroma": chroma, "redis": redis_status})
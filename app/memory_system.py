@@ -4,17 +4,53 @@ Stores and retrieves user-specific information across sessions
 """
 
 import json
+import os
 import time
 import logging
-from typing import Dict, List, Any, Optional
+import threading
+from typing import Dict, List, Any, Optional, Tuple
 from pathlib import Path
 from datetime import datetime, timedelta
 import hashlib
+import mmap
+from collections import OrderedDict
+
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
 class UserMemory:
-    """User memory system for storing chat context and preferences."""
+    """User memory system for storing chat context and preferences.
+    
+    Each user's memory lives in an in-memory index backed by an append-only
+    log (msgpack records when available, JSON lines otherwise): writes append
+    one operation and reads never touch disk. The log is replayed on first
+    access and compacted into a snapshot once it grows to twice the size of
+    the live data. Parsed users are kept in an LRU of MAX_CACHED_USERS.
+    User directories are sharded into 256 subdirectories by a hash of the
+    user id so no single directory grows with the user count.
+    """
+    
+    LOG_FILES = {'msgpack': 'memory.msgpack', 'jsonl': 'memory.jsonl'}
+    MAX_INSIGHTS_PER_CATEGORY = 50
+    COMPACT_MIN_LINES = 64
+    MAX_CACHED_USERS = 1024
     
     def __init__(self, storage_dir: str = "/workspace/user_memory"):
         self.storage_dir = Path(storage_dir)
@@ -29,21 +65,48 @@ class UserMemory:
             'insights': 'user_insights.json',             # Key learnings and insights about the user
             'context': 'conversation_context.json'        # Chat context and history
         }
+        
+        # user_id -> {category: data}, replayed lazily from each user's log
+        self.log_format = 'msgpack' if MSGPACK_AVAILABLE else 'jsonl'
+        self._memory: Dict[str, Dict[str, Dict[str, Any]]] = OrderedDict()
+        self._log_lines: Dict[str, int] = {}
+        self._lock = threading.RLock()
+    
+    def get_user_dir(self, user_id: str) -> Path:
+        """Get a user's storage directory, inside its hash shard."""
+        if XXHASH_AVAILABLE:
+            shard = xxhash.xxh3_64_intdigest(user_id.encode()) & 0xff
+        else:
+            shard = hashlib.md5(user_id.encode()).digest()[-1]
+        user_dir = self.storage_dir / f"{shard:02x}" / user_id
+        if not user_dir.exists():
+            user_dir.mkdir(parents=True, exist_ok=True)
+            # Move files from the unsharded layout into the shard one by one: a
+            # two-hex-char user_id's legacy directory is also a shard directory
+            # holding other users' directories, which must stay where they are
+            legacy_dir = self.storage_dir / user_id
+            if legacy_dir.is_dir():
+                for path in legacy_dir.iterdir():
+                    if path.is_file():
+                        os.replace(path, user_dir / path.name)
+                try:
+                    legacy_dir.rmdir()
+                except OSError:
+                    pass  # still a shard directory
+        return user_dir
     
     def get_user_file(self, user_id: str, category: str) -> Path:
         """Get the file path for a user's memory category."""
-        user_dir = self.storage_dir / user_id
-        user_dir.mkdir(exist_ok=True)
-        return user_dir / self.categories[category]
+        return self.get_user_dir(user_id) / self.categories[category]
+    
+    def get_user_log(self, user_id: str) -> Path:
+        """Get the path of a user's append-only memory log."""
+        return self.get_user_dir(user_id) / self.LOG_FILES[self.log_format]
     
     def store_preference(self, user_id: str, key: str, value: Any) -> bool:
         """Store a user preference."""
         try:
-            file_path = self.get_user_file(user_id, 'preferences')
-            preferences = self._load_json(file_path) or {}
-            preferences[key] = value
-            preferences['updated_at'] = time.time()
-            self._save_json(file_path, preferences)
+            self._append_ops(user_id, [self._preference_op(key, value)])
             return True
         except Exception as e:
             logger.error(f"Failed to store preference for {user_id}: {e}")
@@ -52,9 +115,7 @@ class UserMemory:
     def get_preference(self, user_id: str, key: str, default: Any = None) -> Any:
         """Get a user preference."""
         try:
-            file_path = self.get_user_file(user_id, 'preferences')
-            preferences = self._load_json(file_path) or {}
-            return preferences.get(key, default)
+            return self._get_category(user_id, 'preferences').get(key, default)
         except Exception as e:
             logger.error(f"Failed to get preference for {user_id}: {e}")
             return default
@@ -62,13 +123,7 @@ class UserMemory:
     def store_chat_context(self, user_id: str, chat_id: str, context: Dict[str, Any]) -> bool:
         """Store chat context for a user."""
         try:
-            file_path = self.get_user_file(user_id, 'context')
-            contexts = self._load_json(file_path) or {}
-            contexts[chat_id] = {
-                **context,
-                'updated_at': time.time()
-            }
-            self._save_json(file_path, contexts)
+            self._append_ops(user_id, [self._chat_context_op(chat_id, context)])
             return True
         except Exception as e:
             logger.error(f"Failed to store chat context for {user_id}: {e}")
@@ -77,9 +132,7 @@ class UserMemory:
     def get_chat_context(self, user_id: str, chat_id: str) -> Dict[str, Any]:
         """Get chat context for a user."""
         try:
-            file_path = self.get_user_file(user_id, 'context')
-            contexts = self._load_json(file_path) or {}
-            return contexts.get(chat_id, {})
+            return dict(self._get_category(user_id, 'context').get(chat_id, {}))
         except Exception as e:
             logger.error(f"Failed to get chat context for {user_id}: {e}")
             return {}
@@ -87,21 +140,7 @@ class UserMemory:
     def store_key_insight(self, user_id: str, insight: str, category: str = 'personal') -> bool:
         """Store a key insight about the user (personal info, interests, goals, etc.)."""
         try:
-            file_path = self.get_user_file(user_id, 'insights')
-            insights = self._load_json(file_path) or {}
-            
-            if category not in insights:
-                insights[category] = []
-            
-            insights[category].append({
-                'insight': insight,
-                'created_at': time.time()
-            })
-            
-            # Keep only last 50 insights per category
-            insights[category] = insights[category][-50:]
-            
-            self._save_json(file_path, insights)
+            self._append_ops(user_id, [self._insight_op(insight, category)])
             return True
         except Exception as e:
             logger.error(f"Failed to store key insight for {user_id}: {e}")
@@ -110,22 +149,45 @@ class UserMemory:
     def get_key_insights(self, user_id: str, category: str = 'personal', limit: int = 10) -> List[Dict[str, Any]]:
         """Get key insights about a user (personal info, interests, goals, etc.)."""
         try:
-            file_path = self.get_user_file(user_id, 'insights')
-            insights = self._load_json(file_path) or {}
-            return insights.get(category, [])[-limit:]
+            return self._get_category(user_id, 'insights').get(category, [])[-limit:]
         except Exception as e:
             logger.error(f"Failed to get key insights for {user_id}: {e}")
             return []
     
+    def store_many(self, user_id: str, entries: List[Tuple[str, tuple]]) -> bool:
+        """
+        Store several memory entries for a user with a single log write.
+        
+        Args:
+            user_id: User to store memory for
+            entries: (kind, args) pairs where kind is 'preference' with
+                (key, value), 'chat_context' with (chat_id, context) or
+                'insight' with (insight,) or (insight, category)
+            
+        Returns:
+            True if every entry was stored
+        """
+        builders = {
+            'preference': self._preference_op,
+            'chat_context': self._chat_context_op,
+            'insight': self._insight_op
+        }
+        try:
+            self._append_ops(user_id, [builders[kind](*args) for kind, args in entries])
+            return True
+        except Exception as e:
+            logger.error(f"Failed to store memory entries for {user_id}: {e}")
+            return False
+    
     def get_user_profile(self, user_id: str) -> Dict[str, Any]:
         """Get a comprehensive user profile."""
         try:
             profile = {
                 'user_id': user_id,
-                'preferences': self._load_json(self.get_user_file(user_id, 'preferences')) or {},
-                'interests': self._load_json(self.get_user_file(user_id, 'interests')) or {},
-                'personal': self._load_json(self.get_user_file(user_id, 'personal')) or {},
-                'profile_info': self._load_json(self.get_user_file(user_id, 'profile')) or {},
+                'preferences': dict(self._get_category(user_id, 'preferences')),
+                'interests': dict(self._get_category(user_id, 'interests')),
+                'personal': dict(self._get_category(user_id, 'personal')),
+                'profile_info': dict(self._get_category(user_id, 'profile')),
                 'recent_insights': self.get_key_insights(user_id, limit=5),
                 'created_at': self._get_oldest_file_time(user_id),
                 'updated_at': time.time()
@@ -138,12 +200,8 @@ class UserMemory:
     def clear_category(self, user_id: str, category: str) -> bool:
         """Clear all insights for a specific category."""
         try:
-            file_path = self.get_user_file(user_id, 'insights')
-            insights = self._load_json(file_path) or {}
-            
-            if category in insights:
-                insights[category] = []
-                self._save_json(file_path, insights)
+            if category in self._get_category(user_id, 'insights'):
+                self._append_ops(user_id, [{'op': 'clear', 'c': 'insights', 'k': category}])
                 logger.info(f"Cleared category {category} for user {user_id}")
                 return True
             else:
@@ -160,17 +218,17 @@ class UserMemory:
             context_parts = []
             
             # Get user profile (name, location, etc.)
-            profile = self._load_json(self.get_user_file(user_id, 'profile')) or {}
+            profile = self._get_category(user_id, 'profile')
             if profile:
                 context_parts.append(f"User Profile: {json.dumps(profile, indent=2)}")
             
             # Get user preferences
-            preferences = self._load_json(self.get_user_file(user_id, 'preferences')) or {}
+            preferences = self._get_category(user_id, 'preferences')
             if preferences:
                 context_parts.append(f"User Preferences: {json.dumps(preferences, indent=2)}")
             
             # Get user interests
-            interests = self._load_json(self.get_user_file(user_id, 'interests')) or {}
+            interests = self._get_category(user_id, 'interests')
             if interests:
                 context_parts.append(f"User Interests: {json.dumps(interests, indent=2)}")
             
@@ -187,32 +245,189 @@ class UserMemory:
             logger.error(f"Failed to get memory context for {user_id}: {e}")
             return ""
     
+    def _get_category(self, user_id: str, category: str) -> Dict[str, Any]:
+        """Get a user's in-memory data for a category."""
+        return self._get_user_memory(user_id).get(category, {})
+    
+    def _get_user_memory(self, user_id: str) -> Dict[str, Dict[str, Any]]:
+        """Get a user's in-memory index, replaying their log on first access."""
+        with self._lock:
+            memory = self._memory.get(user_id)
+            if memory is None:
+                memory = self._replay_log(user_id)
+                self._memory[user_id] = memory
+                # Evicted users are fully persisted and replay on next access
+                if len(self._memory) > self.MAX_CACHED_USERS:
+                    evicted, _ = self._memory.popitem(last=False)
+                    self._log_lines.pop(evicted, None)
+            else:
+                self._memory.move_to_end(user_id)
+            return memory
+    
+    def _replay_log(self, user_id: str) -> Dict[str, Dict[str, Any]]:
+        """Rebuild a user's memory from their log (or older storage formats)."""
+        memory: Dict[str, Dict[str, Any]] = {}
+        log_path = self.get_user_log(user_id)
+        
+        if log_path.exists():
+            ops, malformed = self._read_ops(log_path, self.log_format)
+            for op in ops:
+                try:
+                    self._apply_op(memory, op)
+                except (KeyError, TypeError, AttributeError) as e:
+                    logger.warning(f"Skipping malformed memory log entry for {user_id}: {e}")
+                    malformed = True
+            self._log_lines[user_id] = len(ops)
+            # Rewrite the log so a torn record from an interrupted write
+            # can't swallow the next append
+            if malformed:
+                self._write_snapshot(user_id, memory)
+            return memory
+        
+        # Migrate a log written in the other encoding, then the per-category
+        # JSON files used before the log existed
+        self._log_lines[user_id] = 0
+        for log_format, file_name in self.LOG_FILES.items():
+            other_path = log_path.with_name(file_name)
+            if log_format != self.log_format and other_path.exists():
+                if log_format == 'msgpack' and not MSGPACK_AVAILABLE:
+                    continue
+                for op in self._read_ops(other_path, log_format)[0]:
+                    self._apply_op(memory, op)
+                self._write_snapshot(user_id, memory)
+                other_path.unlink()
+                return memory
+        
+        for category in self.categories:
+            data = self._load_json(self.get_user_file(user_id, category))
+            if data:
+                memory[category] = data
+        if memory:
+            self._write_snapshot(user_id, memory)
+        return memory
+    
+    def _read_ops(self, log_path: Path, log_format: str) -> Tuple[List[Dict[str, Any]], bool]:
+        """Read the operations in a log, reporting whether any were malformed."""
+        ops = []
+        malformed = False
+        
+        if log_format == 'msgpack':
+            with open(log_path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return ops, malformed
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    # Non-str map keys (e.g. int context keys) are packed, so accept them back
+                    unpacker = msgpack.Unpacker(raw=False, strict_map_key=False)
+                    unpacker.feed(mm)
+                    end = 0
+                    try:
+                        for op in unpacker:
+                            ops.append(op)
+                            end = unpacker.tell()
+                    except (ValueError, msgpack.UnpackException) as e:
+                        logger.warning(f"Stopping at malformed memory log record in {log_path}: {e}")
+                    # Anything after the last complete record (e.g. a torn
+                    # final write) is dropped
+                    malformed = end != len(mm)
+            return ops, malformed
+        
+        loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+        with open(log_path, 'rb') as f:
+            for line in f:
+                try:
+                    ops.append(loads(line))
+                except ValueError as e:
+                    logger.warning(f"Skipping malformed memory log entry in {log_path}: {e}")
+                    malformed = True
+        return ops, malformed
+    
+    def _encode_op(self, op: Dict[str, Any]) -> bytes:
+        """Encode one operation as a log record."""
+        if self.log_format == 'msgpack':
+            return msgpack.packb(op, use_bin_type=True)
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(op, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+        return (json.dumps(op, ensure_ascii=False) + '\n').encode('utf-8')
+    
+    def _apply_op(self, memory: Dict[str, Dict[str, Any]], op: Dict[str, Any]):
+        """Apply one log operation to a user's in-memory data."""
+        data = memory.setdefault(op['c'], {})
+        if op['op'] == 'update':
+            data.update(op['d'])
+        elif op['op'] == 'append':
+            items = data.setdefault(op['k'], [])
+            items.append(op['v'])
+            del items[:-self.MAX_INSIGHTS_PER_CATEGORY]
+        elif op['op'] == 'clear':
+            data[op['k']] = []
+    
+    def _preference_op(self, key: str, value: Any) -> Dict[str, Any]:
+        """Build the log operation for storing a preference."""
+        return {'op': 'update', 'c': 'preferences', 'd': {key: value, 'updated_at': time.time()}}
+    
+    def _chat_context_op(self, chat_id: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the log operation for storing chat context."""
+        return {'op': 'update', 'c': 'context', 'd': {chat_id: {**context, 'updated_at': time.time()}}}
+    
+    def _insight_op(self, insight: str, category: str = 'personal') -> Dict[str, Any]:
+        """Build the log operation for storing a key insight."""
+        return {'op': 'append', 'c': 'insights', 'k': category,
+                'v': {'insight': insight, 'created_at': time.time()}}
+    
+    def _append_ops(self, user_id: str, ops: List[Dict[str, Any]]):
+        """Append operations to a user's log in one write and apply them in memory."""
+        records = b''.join(self._encode_op(op) for op in ops)
+        
+        with self._lock:
+            memory = self._get_user_memory(user_id)
+            with open(self.get_user_log(user_id), 'ab') as f:
+                f.write(records)
+            for op in ops:
+                self._apply_op(memory, op)
+            self._log_lines[user_id] = self._log_lines.get(user_id, 0) + len(ops)
+            
+            if self._log_lines[user_id] > max(2 * self._live_size(memory), self.COMPACT_MIN_LINES):
+                self._write_snapshot(user_id, memory)
+    
+    def _live_size(self, memory: Dict[str, Dict[str, Any]]) -> int:
+        """Count the live entries a compacted log would need to hold."""
+        size = 0
+        for category, data in memory.items():
+            if category == 'insights':
+                size += sum(len(items) for items in data.values())
+            else:
+                size += len(data)
+        return size
+    
+    def _write_snapshot(self, user_id: str, memory: Dict[str, Dict[str, Any]]):
+        """Compact a user's log to one update per category, swapped in atomically."""
+        log_path = self.get_user_log(user_id)
+        tmp_path = log_path.with_name(log_path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            for category, data in memory.items():
+                f.write(self._encode_op({'op': 'update', 'c': category, 'd': data}))
+        os.replace(tmp_path, log_path)
+        self._log_lines[user_id] = len(memory)
+    
     def _load_json(self, file_path: Path) -> Optional[Dict]:
         """Load JSON data from file."""
         try:
             if file_path.exists():
+                if ORJSON_AVAILABLE:
+                    with open(file_path, 'rb') as f:
+                        return orjson.loads(f.read())
                 with open(file_path, 'r', encoding='utf-8') as f:
                     return json.load(f)
         except Exception as e:
             logger.error(f"Failed to load JSON from {file_path}: {e}")
         return None
     
-    def _save_json(self, file_path: Path, data: Dict) -> bool:
-        """Save JSON data to file."""
-        try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
-            return True
-        except Exception as e:
-            logger.error(f"Failed to save JSON to {file_path}: {e}")
-            return False
-    
     def _get_oldest_file_time(self, user_id: str) -> float:
         """Get the creation time of the oldest file for a user."""
         try:
-            user_dir = self.storage_dir / user_id
+            user_dir = self.get_user_dir(user_id)
             if user_dir.exists():
-                files = list(user_dir.glob('*.json'))
+                files = list(user_dir.glob('*.json')) + list(user_dir.glob('memory.*'))
                 if files:
                     return min(f.stat().st_mtime for f in files)
         except Exception as e:
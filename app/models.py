@@ -1,5 +1,5 @@
 """Pydantic models for API."""
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 from pydantic import BaseModel, Field, model_serializer
 from dataclasses import dataclass
 
@@ -85,10 +85,13 @@ class StrategySpec(BaseModel):
 
 
 # Prompt Uplift Data Models (dataclasses for internal use)
-@dataclass
+TaskType = Literal["Q&A", "summarize", "compare", "code"]
+
+
+@dataclass(slots=True)
 class Classification:
     """Query classification result."""
-    task_type: str              # "Q&A", "summarize", "compare", "code"
+    task_type: TaskType         # "Q&A", "summarize", "compare", "code"
     required_sources: List[str] # ["RAG", "Obsidian", "Web"]
     entities: Dict[str, List[str]]  # {"tickers": ["ES"], "indicators": ["RSI"]}
     output_format: str          # "markdown", "json", "table"
@@ -4,32 +4,178 @@ Prompt Classifier for GraphMind.
 Classifies user queries to guide uplift and expansion strategies.
 """
 import re
+import sys
 import logging
 import json
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Dict, List, Optional, Tuple
+import numpy as np
 from app.models import Classification
 from app.ollama_client import OllamaClient
 
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Signal patterns, compiled once at import
+_URL_RE = re.compile(r'https?://')
+_DATE_HINT_RE = re.compile(r'today|this week|yesterday|Q[1-4]|202[0-9]|january|february|march|april|may|june|july|august|september|october|november|december')
+_VAULT_TAG_RE = re.compile(r'#\w+')
+_DOC_REF_RE = re.compile(r'pdf|report|transcript|document')
+_REALTIME_RE = re.compile(r'latest|current|now|breaking|recent')
+_COMPARISON_RE = re.compile(r'compare|versus|vs|difference between|better than')
+_SUMMARY_RE = re.compile(r'summarize|overview|summary|brief')
+_CODE_RE = re.compile(r'code|function|class|implementation|debug|script|program')
+_JSON_OBJECT_RE = re.compile(r'\{.*\}', re.DOTALL)
+
+# Match 1-5 uppercase letters (common ticker pattern)
+_TICKER_RE = re.compile(r'\b[A-Z]{1,5}\b')
+
+# Below this length a plain character scan beats the numpy conversion overhead
+_UPPER_SCAN_MIN_LEN = 256
+
+
+def _has_ascii_upper(text: str) -> bool:
+    """Check whether text contains any A-Z character (tickers need one)."""
+    if len(text) < _UPPER_SCAN_MIN_LEN:
+        return any(c.isupper() for c in text)
+    # UTF-8 continuation bytes are >= 0x80, so only real A-Z bytes match
+    data = np.frombuffer(text.encode(), dtype=np.uint8)
+    return bool(((data >= 0x41) & (data <= 0x5A)).any())
+
+# Common words (THE, AND, etc.) and trading terms that aren't tickers
+_TICKER_STOPWORDS = frozenset({
+    'THE', 'AND', 'OR', 'BUT', 'FOR', 'TO', 'OF', 'IN', 'ON', 'AT', 'BY', 'FROM', 'WITH', 'AS', 'IS', 'IT', 'ARE', 'WAS', 'WERE', 'BE', 'BEEN', 'BEING', 'HAVE', 'HAS', 'HAD', 'DO', 'DOES', 'DID', 'WILL', 'WOULD', 'SHOULD', 'COULD', 'MAY', 'MIGHT', 'CAN', 'MUST', 'SHALL',
+    'RSI', 'MACD', 'EMA', 'SMA', 'VWAP', 'ATR', 'BB', 'ADX', 'CCI', 'STOCH'
+})
+
+# Indicator keyword -> canonical indicator name
+INDICATORS = {
+    'rsi': 'RSI',
+    'macd': 'MACD',
+    'ema': 'EMA',
+    'sma': 'SMA',
+    'vwap': 'VWAP',
+    'atr': 'ATR',
+    'bollinger': 'Bollinger',
+    'stochastic': 'Stochastic',
+    'adx': 'ADX',
+    'cci': 'CCI',
+    'williams': 'Williams',
+    'moving average': 'MA',
+    'relative strength index': 'RSI',
+    'moving average convergence divergence': 'MACD'
+}
+
+# Single-pass matcher over every indicator keyword (overlapping matches included)
+_INDICATOR_AUTOMATON = None
+if AHOCORASICK_AVAILABLE:
+    _INDICATOR_AUTOMATON = ahocorasick.Automaton()
+    for _keyword in INDICATORS:
+        _INDICATOR_AUTOMATON.add_word(_keyword, _keyword)
+    _INDICATOR_AUTOMATON.make_automaton()
+
+# Task keyword -> task bit; a prompt's keywords are OR-ed into one mask
+_SUMMARIZE_BIT, _COMPARE_BIT, _CODE_BIT = 1, 2, 4
+TASK_KEYWORD_BITS = {
+    **dict.fromkeys(['summarize', 'overview', 'summary', 'brief'], _SUMMARIZE_BIT),
+    **dict.fromkeys(['compare', 'versus', 'vs', 'difference', 'contrast'], _COMPARE_BIT),
+    **dict.fromkeys(['code', 'implement', 'function', 'debug', 'script', 'program'], _CODE_BIT)
+}
+
+# Task types in priority order when several bits are set
+_TASK_PRIORITY = ((_SUMMARIZE_BIT, "summarize"), (_COMPARE_BIT, "compare"), (_CODE_BIT, "code"))
+
+_TASK_AUTOMATON = None
+if AHOCORASICK_AVAILABLE:
+    _TASK_AUTOMATON = ahocorasick.Automaton()
+    for _keyword, _bit in TASK_KEYWORD_BITS.items():
+        _TASK_AUTOMATON.add_word(_keyword, _bit)
+    _TASK_AUTOMATON.make_automaton()
+
+# Prompt for the LLM fallback (only formatted there): instructions, then the query
+LLM_PROMPT_TEMPLATE = """You are a query classifier. Analyze the user's query and return a JSON object with:
+{{
+  "task_type": "Q&A|summarize|compare|code",
+  "output_format": "markdown|json|table",
+  "confidence": 0.0-1.0
+}}
+
+Task types:
+- Q&A: Questions asking for information or explanations
+- summarize: Requests to summarize content
+- compare: Requests to compare items
+- code: Requests involving code or programming
+
+Output format:
+- markdown: General text formatting
+- json: Structured data requests
+- table: Comparison or tabular data
+
+Return ONLY valid JSON, no other text.
+
+Classify this query: {prompt}"""
+
+# Canonical (interned) copies of the small set of classification labels, so
+# labels parsed from LLM output don't allocate a new string per result
+_LABELS = {
+    label: sys.intern(label) for label in (
+        "Q&A", "summarize", "compare", "code",
+        "markdown", "json", "table",
+        "simple", "medium", "complex"
+    )
+}
+
+# Signals used when the LLM classification fails
+_LLM_DEFAULTS = {
+    "task_type": "Q&A",
+    "output_format": "markdown",
+    "confidence": 0.5
+}
+
+_DATE_RES = [
+    re.compile(pattern, re.IGNORECASE) for pattern in (
+        r'\b\d{4}\b',  # Years like 2024
+        r'\bQ[1-4]\s*\d{4}\b',  # Quarters like Q3 2024
+        r'\b(january|february|march|april|may|june|july|august|september|october|november|december)\s+\d{1,2}',  # Month dates
+        r'\btoday\b',
+        r'\byesterday\b',
+        r'\bthis week\b',
+        r'\blast week\b',
+        r'\bthis month\b',
+        r'\blast month\b'
+    )
+]
+
 
 class PromptClassifier:
     """Classify prompts to guide uplift and expansion."""
     
-    def __init__(self, model: str = "llama3.2:3b-instruct"):
+    def __init__(self, model: str = "llama3.2:3b-instruct", cache_size: int = 4096):
         """
         Initialize prompt classifier.
         
         Args:
             model: LLM model for ambiguous queries (default: llama3.2:3b-instruct)
+            cache_size: Maximum number of classifications kept in the LRU cache
         """
         self.llm = OllamaClient(default_model=model)
         self.model = model
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
         
     def classify(self, prompt: str, context: Optional[Dict] = None) -> Classification:
         """
         Classify a user prompt.
         
+        Repeated prompts are served from an LRU cache keyed by the stripped
+        prompt, so ambiguous queries only pay for the LLM call once.
+        
         Args:
             prompt: Raw user query
             context: Optional conversation context
@@ -37,14 +183,73 @@ class PromptClassifier:
         Returns:
             Classification with task type, entities, requirements, etc.
         """
+        prompt = prompt.strip()
+        cached = self._cache.get(prompt)
+        if cached is not None:
+            self._cache.move_to_end(prompt)
+            return self._copy_classification(cached)
+        
+        return self._cache_classification(prompt, *self._classify_uncached(prompt))
+    
+    def classify_batch(self, prompts: List[str]) -> List[Classification]:
+        """
+        Classify many prompts, scanning all uncached prompts for tickers at once.
+        
+        Args:
+            prompts: Raw user queries
+            
+        Returns:
+            Classifications in the same order as prompts
+        """
+        prompts = [prompt.strip() for prompt in prompts]
+        uncached = [prompt for prompt in prompts if prompt not in self._cache]
+        tickers = dict(zip(uncached, self._extract_tickers_batch(uncached)))
+        
+        results = []
+        for prompt in prompts:
+            cached = self._cache.get(prompt)
+            if cached is not None:
+                self._cache.move_to_end(prompt)
+                results.append(self._copy_classification(cached))
+            else:
+                results.append(self._cache_classification(
+                    prompt, *self._classify_uncached(prompt, tickers.get(prompt))
+                ))
+        return results
+    
+    def _cache_classification(self, prompt: str, classification: Classification,
+                              cacheable: bool) -> Classification:
+        """Store a fresh classification in the LRU cache and return a copy."""
+        if not cacheable:
+            return classification
+        self._cache[prompt] = classification
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return self._copy_classification(classification)
+    
+    def _copy_classification(self, classification: Classification) -> Classification:
+        """Copy a cached classification so callers can't mutate the cache."""
+        return replace(
+            classification,
+            required_sources=list(classification.required_sources),
+            entities={key: list(values) for key, values in classification.entities.items()}
+        )
+    
+    def _classify_uncached(self, prompt: str,
+                           tickers: Optional[List[str]] = None) -> Tuple[Classification, bool]:
+        """Classify a prompt, reporting whether the result is safe to cache."""
+        cacheable = True
+        
         # Rule-based signal extraction (fast, deterministic)
-        signals = self._extract_signals(prompt)
+        signals = self._extract_signals(prompt, tickers)
         
         # LLM-based classification for ambiguous cases
         if self._is_ambiguous(signals):
             logger.debug(f"Query is ambiguous, using LLM classification: {prompt[:50]}")
             llm_classification = self._llm_classify(prompt)
             signals.update(llm_classification)
+            # Don't pin a failed LLM call's defaults in the cache
+            cacheable = llm_classification != _LLM_DEFAULTS
         
         # Determine required sources based on signals
         required_sources = self._determine_sources(signals)
@@ -52,35 +257,40 @@ class PromptClassifier:
         # Determine output format
         output_format = self._determine_output_format(signals, prompt)
         
-        return Classification(
-            task_type=signals.get("task_type", "Q&A"),
+        task_type = signals.get("task_type", "Q&A")
+        complexity = signals.get("complexity", "medium")
+        classification = Classification(
+            task_type=_LABELS.get(task_type, task_type),
             required_sources=required_sources,
             entities={
                 "tickers": signals.get("tickers", []),
                 "indicators": signals.get("indicators", []),
                 "dates": signals.get("dates", [])
             },
-            output_format=output_format,
-            complexity=signals.get("complexity", "medium"),
+            output_format=_LABELS.get(output_format, output_format),
+            complexity=_LABELS.get(complexity, complexity),
             confidence=signals.get("confidence", 0.75)
         )
+        return classification, cacheable
     
-    def _extract_signals(self, prompt: str) -> Dict:
-        """Extract rule-based signals from prompt."""
+    def _extract_signals(self, prompt: str, tickers: Optional[List[str]] = None) -> Dict:
+        """Extract rule-based signals from prompt (tickers may be precomputed)."""
         prompt_lower = prompt.lower()
+        if tickers is None:
+            tickers = self._extract_tickers(prompt)
         
         signals = {
-            "has_urls": bool(re.search(r'https?://', prompt)),
-            "has_dates": bool(re.search(r'today|this week|yesterday|Q[1-4]|202[0-9]|january|february|march|april|may|june|july|august|september|october|november|december', prompt_lower)),
-            "has_tickers": self._extract_tickers(prompt),
-            "has_vault_tags": bool(re.search(r'#\w+', prompt)),  # Obsidian tags
-            "has_doc_refs": bool(re.search(r'pdf|report|transcript|document', prompt_lower)),
-            "is_realtime": bool(re.search(r'latest|current|now|breaking|recent', prompt_lower)),
-            "is_comparison": bool(re.search(r'compare|versus|vs|difference between|better than', prompt_lower)),
-            "is_summary": bool(re.search(r'summarize|overview|summary|brief', prompt_lower)),
-            "is_code": bool(re.search(r'code|function|class|implementation|debug|script|program', prompt_lower)),
+            "has_urls": bool(_URL_RE.search(prompt)),
+            "has_dates": bool(_DATE_HINT_RE.search(prompt_lower)),
+            "has_tickers": tickers,
+            "has_vault_tags": bool(_VAULT_TAG_RE.search(prompt)),  # Obsidian tags
+            "has_doc_refs": bool(_DOC_REF_RE.search(prompt_lower)),
+            "is_realtime": bool(_REALTIME_RE.search(prompt_lower)),
+            "is_comparison": bool(_COMPARISON_RE.search(prompt_lower)),
+            "is_summary": bool(_SUMMARY_RE.search(prompt_lower)),
+            "is_code": bool(_CODE_RE.search(prompt_lower)),
             "indicators": self._extract_indicators(prompt_lower),
-            "tickers": self._extract_tickers(prompt),
+            "tickers": tickers,
             "dates": self._extract_dates(prompt),
             "task_type": self._infer_task_type(prompt_lower),
             "complexity": self._estimate_complexity(prompt),
@@ -91,82 +301,66 @@ class PromptClassifier:
     
     def _extract_tickers(self, prompt: str) -> List[str]:
         """Extract ticker symbols (ES, NQ, AAPL, etc.)."""
-        # Match 1-5 uppercase letters (common ticker pattern)
-        matches = re.findall(r'\b[A-Z]{1,5}\b', prompt)
-        
-        # Filter out common words (THE, AND, etc.)
-        stopwords = {'THE', 'AND', 'OR', 'BUT', 'FOR', 'TO', 'OF', 'IN', 'ON', 'AT', 'BY', 'FROM', 'WITH', 'AS', 'IS', 'IT', 'ARE', 'WAS', 'WERE', 'BE', 'BEEN', 'BEING', 'HAVE', 'HAS', 'HAD', 'DO', 'DOES', 'DID', 'WILL', 'WOULD', 'SHOULD', 'COULD', 'MAY', 'MIGHT', 'CAN', 'MUST', 'SHALL'}
-        
-        # Also filter out common trading terms that aren't tickers
-        trading_words = {'RSI', 'MACD', 'EMA', 'SMA', 'VWAP', 'ATR', 'BB', 'ADX', 'CCI', 'STOCH', 'RSI', 'MACD'}
+        if not _has_ascii_upper(prompt):
+            return []
+        return list({m for m in _TICKER_RE.findall(prompt) if m not in _TICKER_STOPWORDS})
+    
+    def _extract_tickers_batch(self, prompts: List[str]) -> List[List[str]]:
+        """Extract ticker symbols for many prompts with a single regex scan."""
+        if not prompts:
+            return []
         
-        tickers = []
-        for m in matches:
-            if m not in stopwords and m not in trading_words:
-                tickers.append(m)
+        # Newlines are word boundaries, so no match can span two prompts
+        joined = "\n".join(prompts)
+        if not _has_ascii_upper(joined):
+            return [[] for _ in prompts]
+        ends = np.cumsum([len(prompt) + 1 for prompt in prompts])
         
-        return list(set(tickers))  # Remove duplicates
+        found = [set() for _ in prompts]
+        for match in _TICKER_RE.finditer(joined):
+            ticker = match.group()
+            if ticker not in _TICKER_STOPWORDS:
+                found[int(np.searchsorted(ends, match.start(), side='right'))].add(ticker)
+        return [list(tickers) for tickers in found]
     
     def _extract_indicators(self, prompt_lower: str) -> List[str]:
         """Extract technical indicators."""
-        indicators = {
-            'rsi': 'RSI',
-            'macd': 'MACD',
-            'ema': 'EMA',
-            'sma': 'SMA',
-            'vwap': 'VWAP',
-            'atr': 'ATR',
-            'bollinger': 'Bollinger',
-            'stochastic': 'Stochastic',
-            'adx': 'ADX',
-            'cci': 'CCI',
-            'williams': 'Williams',
-            'moving average': 'MA',
-            'relative strength index': 'RSI',
-            'moving average convergence divergence': 'MACD'
-        }
+        if _INDICATOR_AUTOMATON is not None:
+            matched = {keyword for _, keyword in _INDICATOR_AUTOMATON.iter(prompt_lower)}
+        else:
+            matched = {keyword for keyword in INDICATORS if keyword in prompt_lower}
         
+        # Canonical names in INDICATORS order, without duplicates
         found = []
-        for keyword, indicator_name in indicators.items():
-            if keyword in prompt_lower:
-                if indicator_name not in found:
-                    found.append(indicator_name)
+        for keyword, indicator_name in INDICATORS.items():
+            if keyword in matched and indicator_name not in found:
+                found.append(indicator_name)
         
         return found
     
     def _extract_dates(self, prompt: str) -> List[str]:
         """Extract date references."""
-        date_patterns = [
-            r'\b\d{4}\b',  # Years like 2024
-            r'\bQ[1-4]\s*\d{4}\b',  # Quarters like Q3 2024
-            r'\b(january|february|march|april|may|june|july|august|september|october|november|december)\s+\d{1,2}',  # Month dates
-            r'\btoday\b',
-            r'\byesterday\b',
-            r'\bthis week\b',
-            r'\blast week\b',
-            r'\bthis month\b',
-            r'\blast month\b'
-        ]
-        
         dates = []
-        for pattern in date_patterns:
-            matches = re.findall(pattern, prompt, re.IGNORECASE)
-            dates.extend(matches)
+        for pattern in _DATE_RES:
+            dates.extend(pattern.findall(prompt))
         
         return list(set(dates))
     
     def _infer_task_type(self, prompt_lower: str) -> str:
         """Infer task type from prompt."""
-        if any(word in prompt_lower for word in ['summarize', 'overview', 'summary', 'brief']):
-            return "summarize"
-        elif any(word in prompt_lower for word in ['compare', 'versus', 'vs', 'difference', 'contrast']):
-            return "compare"
-        elif any(word in prompt_lower for word in ['code', 'implement', 'function', 'debug', 'script', 'program']):
-            return "code"
-        elif any(word in prompt_lower for word in ['how', 'what', 'why', 'when', 'where', 'explain', 'describe']):
-            return "Q&A"
+        mask = 0
+        if _TASK_AUTOMATON is not None:
+            for _, bit in _TASK_AUTOMATON.iter(prompt_lower):
+                mask |= bit
         else:
-            return "Q&A"  # Default
+            for keyword, bit in TASK_KEYWORD_BITS.items():
+                if keyword in prompt_lower:
+                    mask |= bit
+        
+        for bit, task_type in _TASK_PRIORITY:
+            if mask & bit:
+                return task_type
+        return "Q&A"  # Default (also covers how/what/why questions)
     
     def _estimate_complexity(self, prompt: str) -> str:
         """Estimate query complexity."""
@@ -194,29 +388,9 @@ class PromptClassifier:
     
     def _llm_classify(self, prompt: str) -> Dict:
         """Use LLM to classify ambiguous prompts."""
-        system_prompt = """You are a query classifier. Analyze the user's query and return a JSON object with:
-{
-  "task_type": "Q&A|summarize|compare|code",
-  "output_format": "markdown|json|table",
-  "confidence": 0.0-1.0
-}
-
-Task types:
-- Q&A: Questions asking for information or explanations
-- summarize: Requests to summarize content
-- compare: Requests to compare items
-- code: Requests involving code or programming
-
-Output format:
-- markdown: General text formatting
-- json: Structured data requests
-- table: Comparison or tabular data
-
-Return ONLY valid JSON, no other text."""
-
         try:
             response = self.llm.generate(
-                prompt=f"Classify this query: {prompt}",
+                prompt=LLM_PROMPT_TEMPLATE.format(prompt=prompt),
                 model=self.model,
                 temperature=0.1,
                 max_tokens=100,
@@ -224,7 +398,7 @@ Return ONLY valid JSON, no other text."""
             )
             
             # Try to extract JSON from response
-            json_match = re.search(r'\{.*\}', response, re.DOTALL)
+            json_match = _JSON_OBJECT_RE.search(response)
             if json_match:
                 result = json.loads(json_match.group())
                 return {
@@ -236,11 +410,7 @@ Return ONLY valid JSON, no other text."""
             logger.warning(f"LLM classification failed: {e}, using defaults")
         
         # Fallback to defaults
-        return {
-            "task_type": "Q&A",
-            "output_format": "markdown",
-            "confidence": 0.5
-        }
+        return dict(_LLM_DEFAULTS)
     
     def _determine_sources(self, signals: Dict) -> List[str]:
         """Determine required data sources based on signals."""
@@ -33,7 +33,10 @@ class PromptUpliftPipeline:
         # Initialize components
         self.classifier = PromptClassifier(model=self.config.get("classifier_model", "llama3.2:3b-instruct"))
         self.uplifter = PromptUplifter(model=self.config.get("uplifter_model", "llama3.2:3b-instruct"))
-        self.expander = QueryExpander(model=self.config.get("expander_model", "llama3.2:3b-instruct"))
+        self.expander = QueryExpander(
+            model=self.config.get("expander_model", "llama3.2:3b-instruct"),
+            embedding_model=self.config.get("expander_embedding_model")
+        )
         
         # Initialize cache if enabled
         self.cache = None
@@ -257,6 +260,7 @@ class PromptUpliftPipeline:
             "skip_expansion_threshold": 3,  # Skip if baseline finds 3+ hits
             "uplifter_model": "llama3.2:3b-instruct",
             "expander_model": "llama3.2:3b-instruct",
+            "expander_embedding_model": None,  # e.g. all-MiniLM-L6-v2 for semantic expansion cache hits
             "classifier_model": "llama3.2:3b-instruct",
             "cache_enabled": True,
             "cache_ttl_seconds": 3600,      # 1 hour
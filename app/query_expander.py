@@ -5,25 +5,70 @@ Generates diverse query variants for maximum recall.
 """
 import logging
 import asyncio
-from typing import List, Optional
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Tuple
+import numpy as np
 from app.models import Classification
 from app.ollama_client import OllamaClient
 
+try:
+    from sentence_transformers import SentenceTransformer
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
+except ImportError:
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Expansion cache key: (normalized query, task type, max_expansions, entities);
+# semantic hits are only looked for within a key's group (everything but the query)
+_CacheKey = Tuple[str, str, int, FrozenSet[Tuple[str, str]]]
+_CacheGroup = Tuple[str, int, FrozenSet[Tuple[str, str]]]
+
+
+@lru_cache(maxsize=2048)
+def _query_tokens(query: str) -> FrozenSet[str]:
+    """Lowercased words longer than two characters (memoized; queries repeat across calls)."""
+    return frozenset(word.lower() for word in query.split() if len(word) > 2)
+
 
 class QueryExpander:
     """Generate diverse query expansions for better recall."""
     
-    def __init__(self, model: str = "llama3.2:3b-instruct"):
+    # Cosine similarity at which a cached query counts as the same query
+    SEMANTIC_CACHE_THRESHOLD = 0.87
+    
+    def __init__(self, model: str = "llama3.2:3b-instruct", cache_size: int = 256,
+                 embedding_model: Optional[str] = None):
         """
         Initialize query expander.
         
         Args:
             model: LLM model for expansion generation (default: llama3.2:3b-instruct)
+            cache_size: Number of expansion results kept in the LRU cache (0 disables it)
+            embedding_model: Sentence embedding model for semantic cache hits, e.g.
+                "sentence-transformers/all-MiniLM-L6-v2" (opt-in; None, or
+                sentence-transformers missing, limits hits to repeated queries)
         """
         self.llm = OllamaClient(default_model=model)
         self.model = model
+        self.cache_size = cache_size
+        self.embedding_model = embedding_model if SENTENCE_TRANSFORMERS_AVAILABLE else None
+        self._embedder = None  # loaded on first use
+        # (normalized query, task type, max_expansions, entities) -> expansions, in LRU order
+        self._cache: "OrderedDict[_CacheKey, List[str]]" = OrderedDict()
+        # Per (task type, max_expansions, entities): unit-norm float32 embedding rows
+        # (capacity doubles as needed), the cache key of each row, and each key's row
+        self._emb_mats: Dict[_CacheGroup, np.ndarray] = {}
+        self._emb_keys: Dict[_CacheGroup, List[_CacheKey]] = {}
+        self._emb_rows: Dict[_CacheKey, int] = {}
+    
+    def clear_cache(self):
+        """Drop all cached expansions."""
+        self._cache.clear()
+        self._emb_mats.clear()
+        self._emb_keys.clear()
+        self._emb_rows.clear()
     
     def expand(self, query: str, classification: Classification, max_expansions: int = 3) -> List[str]:
         """
@@ -37,6 +82,11 @@ class QueryExpander:
         Returns:
             List of expanded queries (up to max_expansions)
         """
+        cache_key, embedding = self._cache_key(query, classification, max_expansions)
+        cached = self._cache_lookup(cache_key, embedding)
+        if cached is not None:
+            return cached
+        
         expansions = []
         
         # Expansion 1: Paraphrase
@@ -67,9 +117,153 @@ class QueryExpander:
                 logger.warning(f"HyDE generation failed: {e}")
         
         # Ensure diversity (remove duplicates)
-        unique_expansions = self._ensure_diversity(expansions, query)
+        unique_expansions = self._ensure_diversity(expansions, query)[:max_expansions]
+        
+        self._cache_store(cache_key, embedding, unique_expansions)
+        return unique_expansions
+    
+    async def expand_async(self, query: str, classification: Classification, max_expansions: int = 3) -> List[str]:
+        """
+        Generate diverse query expansions with the LLM calls running concurrently.
+        
+        Returns the same expansions as expand(): paraphrase, aspect query and
+        HyDE are all requested at once and kept in that order.
+        
+        Args:
+            query: Improved query from uplifter
+            classification: Query classification
+            max_expansions: Maximum number of expansions (default: 3)
+            
+        Returns:
+            List of expanded queries (up to max_expansions)
+        """
+        cache_key, embedding = self._cache_key(query, classification, max_expansions)
+        cached = self._cache_lookup(cache_key, embedding)
+        if cached is not None:
+            return cached
+        
+        generators = [
+            ("Paraphrase", self._generate_paraphrase, (query,)),
+            ("Aspect query", self._generate_aspect_query, (query, classification)),
+            ("HyDE", self._generate_hyde, (query, classification))
+        ]
+        
+        # The LLM client is synchronous, so each call runs in a worker thread
+        results = await asyncio.gather(
+            *(asyncio.to_thread(generate, *args) for _, generate, args in generators),
+            return_exceptions=True
+        )
+        
+        expansions = []
+        for (name, _, _), result in zip(generators, results):
+            if isinstance(result, Exception):
+                logger.warning(f"{name} generation failed: {result}")
+            elif result and result != query:
+                expansions.append(result)
+        
+        # Ensure diversity (remove duplicates)
+        unique_expansions = self._ensure_diversity(expansions[:max_expansions], query)[:max_expansions]
         
-        return unique_expansions[:max_expansions]
+        self._cache_store(cache_key, embedding, unique_expansions)
+        return unique_expansions
+    
+    def _embed(self, query: str) -> Optional[np.ndarray]:
+        """Embed a query for semantic cache lookups (None when no embedder is available)."""
+        if not self.embedding_model:
+            return None
+        try:
+            if self._embedder is None:
+                self._embedder = SentenceTransformer(self.embedding_model)
+            embedding = np.asarray(self._embedder.encode(query), dtype=np.float32)
+            return embedding / max(float(np.linalg.norm(embedding)), 1e-12)
+        except Exception as e:
+            logger.warning(f"Query embedding failed, semantic cache limited to exact matches: {e}")
+            self.embedding_model = None
+            return None
+    
+    def _cache_key(self, query: str, classification: Classification,
+                   max_expansions: int) -> Tuple[_CacheKey, Optional[np.ndarray]]:
+        """Build the cache key and query embedding for an expansion request."""
+        # Entities (tickers, indicators) go in the key: "RSI for AAPL" and "RSI for
+        # MSFT" embed close together but must not share expansions
+        entities = frozenset(
+            (kind, value.upper())
+            for kind, values in (classification.entities or {}).items()
+            for value in values
+        )
+        key = (" ".join(query.lower().split()), classification.task_type, max_expansions, entities)
+        if not self.cache_size or key in self._cache:
+            return key, None
+        return key, self._embed(key[0])
+    
+    def _cache_lookup(self, key: _CacheKey, embedding: Optional[np.ndarray]) -> Optional[List[str]]:
+        """Return cached expansions for the same or a semantically close query."""
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return list(self._cache[key])
+        if embedding is None:
+            return None
+        
+        # Only queries with the same task type, limit and entities can share expansions
+        group = key[1:]
+        keys = self._emb_keys.get(group)
+        if not keys:
+            return None
+        
+        # Rows and query are unit-norm, so one matrix-vector product gives every cosine
+        similarities = self._emb_mats[group][:len(keys)] @ embedding
+        best = int(similarities.argmax())
+        if similarities[best] < self.SEMANTIC_CACHE_THRESHOLD:
+            return None
+        
+        self._cache.move_to_end(keys[best])
+        return list(self._cache[keys[best]])
+    
+    def _cache_store(self, key: _CacheKey, embedding: Optional[np.ndarray], expansions: List[str]):
+        """Cache a non-empty expansion result, evicting the least recently used."""
+        if not self.cache_size or not expansions:
+            return
+        self._cache[key] = list(expansions)
+        self._cache.move_to_end(key)
+        if embedding is not None:
+            self._store_embedding(key, embedding)
+        while len(self._cache) > self.cache_size:
+            evicted, _ = self._cache.popitem(last=False)
+            self._drop_embedding(evicted)
+    
+    def _store_embedding(self, key: _CacheKey, embedding: np.ndarray):
+        """Write a unit-norm embedding into its group's matrix, doubling capacity when full."""
+        group = key[1:]
+        if key in self._emb_rows:
+            self._emb_mats[group][self._emb_rows[key]] = embedding
+            return
+        
+        keys = self._emb_keys.setdefault(group, [])
+        matrix = self._emb_mats.get(group)
+        if matrix is None:
+            matrix = self._emb_mats[group] = np.empty((8, embedding.shape[0]), dtype=np.float32)
+        elif len(keys) == matrix.shape[0]:
+            grown = np.empty((matrix.shape[0] * 2, matrix.shape[1]), dtype=np.float32)
+            grown[:len(keys)] = matrix
+            matrix = self._emb_mats[group] = grown
+        
+        matrix[len(keys)] = embedding
+        self._emb_rows[key] = len(keys)
+        keys.append(key)
+    
+    def _drop_embedding(self, key: _CacheKey):
+        """Remove a key's embedding, moving its group's last row into the freed slot."""
+        row = self._emb_rows.pop(key, None)
+        if row is None:
+            return
+        group = key[1:]
+        keys = self._emb_keys[group]
+        last = len(keys) - 1
+        if row != last:
+            self._emb_mats[group][row] = self._emb_mats[group][last]
+            keys[row] = keys[last]
+            self._emb_rows[keys[row]] = row
+        keys.pop()
     
     def _generate_paraphrase(self, query: str) -> str:
         """Generate paraphrase of query."""
@@ -211,22 +405,21 @@ Do not add explanations or additional text."""
         if not expansions:
             return []
         
-        unique_expansions = []
-        
-        for expansion in expansions:
-            # Check similarity to original (basic word overlap)
-            if self._similarity(expansion, original) < 0.8:  # Allow some similarity
-                # Check similarity to existing expansions
-                is_diverse = True
-                for existing in unique_expansions:
-                    if self._similarity(expansion, existing) > 0.8:
-                        is_diverse = False
-                        break
-                
-                if is_diverse:
-                    unique_expansions.append(expansion)
+        # Row 0 is the original, row i + 1 is expansions[i]
+        similarity = self._similarity_matrix([original] + expansions)
         
-        return unique_expansions
+        kept = []
+        for i in range(1, len(expansions) + 1):
+            # Check similarity to original (basic word overlap), allowing some
+            # similarity, then to the expansions already kept
+            if similarity[i, 0] < 0.8 and not any(similarity[i, j] > 0.8 for j in kept):
+                kept.append(i)
+        
+        return [expansions[i - 1] for i in kept]
+    
+    def _tokens(self, query: str) -> FrozenSet[str]:
+        """Lowercased words longer than two characters, as used for similarity."""
+        return _query_tokens(query)
     
     def _similarity(self, query1: str, query2: str) -> float:
         """
@@ -234,8 +427,8 @@ Do not add explanations or additional text."""
         
         Uses word overlap as a simple similarity measure.
         """
-        words1 = set(word.lower() for word in query1.split() if len(word) > 2)
-        words2 = set(word.lower() for word in query2.split() if len(word) > 2)
+        words1 = self._tokens(query1)
+        words2 = self._tokens(query2)
         
         if not words1 or not words2:
             return 0.0
@@ -247,3 +440,26 @@ Do not add explanations or additional text."""
             return 0.0
         
         return intersection / union
+    
+    def _similarity_matrix(self, queries: List[str]) -> np.ndarray:
+        """
+        Calculate pairwise similarity between queries in one pass.
+        
+        Entry [i, j] equals _similarity(queries[i], queries[j]); the word
+        overlap comes from a single product of binary word-occurrence rows.
+        """
+        token_sets = [self._tokens(query) for query in queries]
+        vocab = {}
+        for tokens in token_sets:
+            for token in tokens:
+                vocab.setdefault(token, len(vocab))
+        
+        occurrences = np.zeros((len(queries), len(vocab)))
+        for row, tokens in enumerate(token_sets):
+            occurrences[row, [vocab[token] for token in tokens]] = 1.0
+        
+        intersection = occurrences @ occurrences.T
+        sizes = occurrences.sum(axis=1)
+        union = sizes[:, None] + sizes[None, :] - intersection
+        # Empty queries have no overlap with anything, so their union-0 pairs stay 0.0
+        return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
@@ -5,11 +5,18 @@ Manages user-specific customizations of system prompts
 
 import json
 import logging
-from typing import Dict, List, Optional, Any
+import os
+from typing import Dict, List, Optional, Any, Tuple
 from pathlib import Path
 from datetime import datetime
 import hashlib
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 class UserPromptManager:
@@ -18,22 +25,66 @@ class UserPromptManager:
     def __init__(self, storage_dir: str = "/workspace/user_prompts"):
         self.storage_dir = Path(storage_dir)
         self.storage_dir.mkdir(exist_ok=True)
+        # user_id -> prompts file, so each user's directory is created only once
+        self._file_cache: Dict[str, Path] = {}
+        # prompts file -> (mtime_ns, prompts) so unchanged files are not re-read
+        self._mem: Dict[Path, Tuple[int, Dict[str, Any]]] = {}
     
     def _get_user_file(self, user_id: str) -> Path:
         """Get the file path for a user's prompts."""
-        user_dir = self.storage_dir / user_id
-        user_dir.mkdir(exist_ok=True)
-        return user_dir / "custom_prompts.json"
+        user_file = self._file_cache.get(user_id)
+        if user_file is None:
+            user_dir = self.storage_dir / user_id
+            user_dir.mkdir(parents=True, exist_ok=True)
+            user_file = self._file_cache[user_id] = user_dir / "custom_prompts.json"
+        return user_file
     
-    def get_user_prompt(self, user_id: str, mode: str) -> Optional[str]:
-        """Get user's custom prompt for a mode."""
+    def _load_prompts(self, user_file: Path) -> Dict[str, Any]:
+        """Load a user's prompts, reusing the in-memory copy while the file is unchanged."""
         try:
-            user_file = self._get_user_file(user_id)
-            if not user_file.exists():
-                return None
-            
+            mtime_ns = user_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            self._mem.pop(user_file, None)
+            return {}
+        
+        cached = self._mem.get(user_file)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+        
+        if ORJSON_AVAILABLE:
+            with open(user_file, 'rb') as f:
+                user_prompts = orjson.loads(f.read())
+        else:
             with open(user_file, 'r') as f:
                 user_prompts = json.load(f)
+        self._mem[user_file] = (mtime_ns, user_prompts)
+        return user_prompts
+    
+    def _save_prompts(self, user_file: Path, user_prompts: Dict[str, Any], sync: bool = False):
+        """Atomically replace a user's prompts file, optionally forcing it to disk."""
+        if ORJSON_AVAILABLE:
+            data = orjson.dumps(user_prompts, option=orjson.OPT_INDENT_2)
+        else:
+            data = json.dumps(user_prompts, indent=2).encode()
+        
+        # Write a sibling temp file and swap it in, so readers never see a partial file
+        tmp_file = user_file.with_name(user_file.name + ".tmp")
+        try:
+            with open(tmp_file, 'wb') as f:
+                f.write(data)
+                if sync:
+                    f.flush()  # Flush Python's internal buffer
+                    os.fsync(f.fileno())  # Force OS to write to disk
+            os.replace(tmp_file, user_file)
+        except Exception:
+            self._mem.pop(user_file, None)
+            raise
+        self._mem[user_file] = (user_file.stat().st_mtime_ns, user_prompts)
+    
+    def get_user_prompt(self, user_id: str, mode: str) -> Optional[str]:
+        """Get user's custom prompt for a mode."""
+        try:
+            user_prompts = self._load_prompts(self._get_user_file(user_id))
             
             prompt_data = user_prompts.get(mode)
             if prompt_data and isinstance(prompt_data, dict):
@@ -49,54 +100,47 @@ class UserPromptManager:
     
     def set_user_prompt(self, user_id: str, mode: str, prompt: str) -> bool:
         """Set user's custom prompt for a mode."""
+        return self.set_user_prompts(user_id, {mode: prompt})
+    
+    def set_user_prompts(self, user_id: str, prompts: Dict[str, str]) -> bool:
+        """Set user's custom prompts for several modes with a single write."""
         try:
             user_file = self._get_user_file(user_id)
             
-            # Load existing prompts or create new structure
-            if user_file.exists():
-                with open(user_file, 'r') as f:
-                    user_prompts = json.load(f)
-            else:
-                user_prompts = {}
+            # Load existing prompts (empty when the user has none yet)
+            user_prompts = dict(self._load_prompts(user_file))
             
-            # Update prompt
-            user_prompts[mode] = {
-                "prompt": prompt,
-                "updated_at": datetime.now().isoformat(),
-                "hash": hashlib.md5(prompt.encode()).hexdigest()[:8]
-            }
+            # Update prompts
+            updated_at = datetime.now().isoformat()
+            for mode, prompt in prompts.items():
+                user_prompts[mode] = {
+                    "prompt": prompt,
+                    "updated_at": updated_at,
+                    "hash": hashlib.md5(prompt.encode()).hexdigest()[:8]
+                }
             
             # Save to file with explicit flush and sync
-            with open(user_file, 'w') as f:
-                json.dump(user_prompts, f, indent=2)
-                f.flush()  # Flush Python's internal buffer
-                import os
-                os.fsync(f.fileno())  # Force OS to write to disk
+            self._save_prompts(user_file, user_prompts, sync=True)
             
-            logger.info(f"Saved custom prompt for user {user_id} mode {mode}")
+            logger.info(f"Saved custom prompts for user {user_id} modes {list(prompts)}")
             return True
             
         except Exception as e:
-            logger.error(f"Failed to save user prompt for {user_id} mode {mode}: {e}")
+            logger.error(f"Failed to save user prompts for {user_id} modes {list(prompts)}: {e}")
             return False
     
     def reset_user_prompt(self, user_id: str, mode: str) -> bool:
         """Reset user's custom prompt to default."""
         try:
             user_file = self._get_user_file(user_id)
-            if not user_file.exists():
-                return True
-            
-            with open(user_file, 'r') as f:
-                user_prompts = json.load(f)
+            user_prompts = self._load_prompts(user_file)
             
             # Remove the mode
             if mode in user_prompts:
-                del user_prompts[mode]
+                user_prompts = {k: v for k, v in user_prompts.items() if k != mode}
                 
                 # Save updated prompts
-                with open(user_file, 'w') as f:
-                    json.dump(user_prompts, f, indent=2)
+                self._save_prompts(user_file, user_prompts)
             
             logger.info(f"Reset custom prompt for user {user_id} mode {mode}")
             return True
@@ -108,14 +152,8 @@ class UserPromptManager:
     def get_user_prompts(self, user_id: str) -> Dict[str, Any]:
         """Get all user's custom prompts."""
         try:
-            user_file = self._get_user_file(user_id)
-            if not user_file.exists():
-                return {}
-            
-            with open(user_file, 'r') as f:
-                user_prompts = json.load(f)
-            
-            return user_prompts
+            # Copy so callers cannot mutate the cached prompts
+            return dict(self._load_prompts(self._get_user_file(user_id)))
             
         except Exception as e:
             logger.error(f"Failed to get user prompts for {user_id}: {e}")
@@ -125,6 +163,7 @@ class UserPromptManager:
         """Clear all user's custom prompts."""
         try:
             user_file = self._get_user_file(user_id)
+            self._mem.pop(user_file, None)
             if user_file.exists():
                 user_file.unlink()
             
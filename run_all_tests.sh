@@ -31,6 +31,11 @@ echo -e "\n${YELLOW}Installing test dependencies...${NC}"
 pip install -q pytest pytest-cov pytest-asyncio pytest-xdist pytest-timeout psutil 2>/dev/null || true
 echo -e "${GREEN}✓ Dependencies installed${NC}"
 
+# Catch syntax errors before pytest spends time on collection
+echo -e "\n${YELLOW}Checking test syntax...${NC}"
+python -m compileall -q tests app
+echo -e "${GREEN}✓ Test syntax OK${NC}"
+
 # Run unit tests
 echo -e "\n${BLUE}=========================================="
 echo "Running Unit Tests"
@@ -42,7 +47,7 @@ UNIT_RESULT=$?
 echo -e "\n${BLUE}=========================================="
 echo "Running Integration Tests"
 echo -e "==========================================${NC}"
-pytest tests/integration/test_all_endpoints.py -v -m integration --tb=short
+pytest tests/integration/test_all_endpoints.py -v -m integration --run-integration --tb=short
 INTEGRATION_RESULT=$?
 
 # Run validation tests (P1 fixes)
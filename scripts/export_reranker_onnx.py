@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""Export the cross-encoder reranker to ONNX with dynamic int8 quantization."""
+import argparse
+import logging
+
+from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+from optimum.onnxruntime.configuration import AutoQuantizationConfig
+from transformers import AutoTokenizer
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Export and quantize the reranker for RerankingService's onnx_model_path."""
+    parser = argparse.ArgumentParser(description="Export the reranker to quantized ONNX")
+    parser.add_argument("--model", default="BAAI/bge-reranker-large", help="Hugging Face model name")
+    parser.add_argument("--output", default="rerankers/bge_reranker_large_onnx", help="Output directory")
+    args = parser.parse_args()
+    
+    logger.info(f"Exporting {args.model} to ONNX in {args.output}")
+    model = ORTModelForSequenceClassification.from_pretrained(args.model, export=True)
+    model.save_pretrained(args.output)
+    AutoTokenizer.from_pretrained(args.model).save_pretrained(args.output)
+    
+    # Dynamic int8 quantization needs no calibration data; targets VNNI CPUs
+    logger.info("Applying dynamic int8 quantization")
+    quantizer = ORTQuantizer.from_pretrained(model)
+    qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+    quantizer.quantize(save_dir=args.output, quantization_config=qconfig)
+    
+    logger.info(f"Done. Set onnx_model_path: {args.output} in the reranking config")
+
+
+if __name__ == "__main__":
+    main()
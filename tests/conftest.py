@@ -134,6 +134,19 @@ def sample_query():
     """Sample query for testing"""
     return "What are the best trading strategies for momentum trading?"
 
+@pytest.fixture(scope="session")
+def classification_template():
+    """Q&A classification shared across tests (use dataclasses.replace to vary it)"""
+    from app.models import Classification
+    return Classification(
+        task_type="Q&A",
+        required_sources=["RAG"],
+        entities={"tickers": [], "indicators": ["RSI"], "dates": []},
+        output_format="markdown",
+        complexity="medium",
+        confidence=0.85
+    )
+
 @pytest.fixture
 def sample_chat_messages():
     """Sample chat messages for testing"""
@@ -174,6 +187,24 @@ def pytest_configure(config):
         "markers", "obsidian: Obsidian integration tests"
     )
 
+def pytest_addoption(parser):
+    """Register command line options"""
+    parser.addoption(
+        "--run-integration",
+        action="store_true",
+        default=False,
+        help="Run tests marked integration (skipped by default)"
+    )
+
+def pytest_collection_modifyitems(config, items):
+    """Skip integration tests unless --run-integration is given"""
+    if config.getoption("--run-integration"):
+        return
+    skip_integration = pytest.mark.skip(reason="integration only (use --run-integration)")
+    for item in items:
+        if "integration" in item.keywords:
+            item.add_marker(skip_integration)
+
 # Auto-use fixtures
 @pytest.fixture(autouse=True)
 def reset_test_state():
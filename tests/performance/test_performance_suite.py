@@ -4,17 +4,41 @@ Performance Test Suite for EminiPlayer
 Tests response times, load handling, and performance metrics
 """
 
+import asyncio
 import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException, Timeout
 import json
 import time
 import statistics
 import concurrent.futures
-from dataclasses import dataclass
+from collections import defaultdict
+from dataclasses import dataclass, asdict
 from typing import List, Dict, Any
 import argparse
 import sys
 
-@dataclass
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+# Use the libuv event loop for the async concurrent path where available
+# (installed by main(), so importing this module leaves the loop policy alone)
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
+@dataclass(slots=True)
 class PerformanceMetric:
     name: str
     value: float
@@ -23,15 +47,24 @@ class PerformanceMetric:
     passed: bool
 
 class PerformanceTester:
-    def __init__(self, base_url: str = "http://localhost:3001"):
+    def __init__(self, base_url: str = "http://localhost:3001", max_connections: int = 32):
         self.base_url = base_url
         self.auth_token = None
         self.metrics = []
+        self._url_cache: Dict[str, str] = {}
+        
+        # Pooled session sized for the concurrent test so connections are not
+        # evicted between requests (urllib3 already sets TCP_NODELAY)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.max_connections = max_connections
         
     def authenticate(self) -> bool:
         """Authenticate with the system."""
         try:
-            response = requests.post(
+            response = self.session.post(
                 f"{self.base_url}/api/auth/login",
                 headers={"Content-Type": "application/x-www-form-urlencoded"},
                 data="username=admin&password=admin123",
@@ -43,9 +76,16 @@ class PerformanceTester:
                 self.auth_token = data.get("access_token")
                 return True
             return False
-        except:
+        except RequestException:
             return False
     
+    def _url(self, endpoint: str) -> str:
+        """Get the full URL for an endpoint, building it once per endpoint."""
+        url = self._url_cache.get(endpoint)
+        if url is None:
+            url = self._url_cache[endpoint] = self.base_url + endpoint
+        return url
+    
     def get_headers(self) -> Dict[str, str]:
         """Get headers with authentication."""
         headers = {"Content-Type": "application/json"}
@@ -57,8 +97,8 @@ class PerformanceTester:
         """Measure response time for an endpoint."""
         start_time = time.time()
         try:
-            response = requests.post(
-                f"{self.base_url}{endpoint}",
+            response = self.session.post(
+                self._url(endpoint),
                 headers=self.get_headers(),
                 json=payload,
                 timeout=timeout
@@ -69,9 +109,55 @@ class PerformanceTester:
                 return end_time - start_time
             else:
                 return -1  # Error
-        except:
+        except Timeout:
+            return -2  # Timed out
+        except RequestException:
             return -1  # Error
     
+    def _warmup(self) -> None:
+        """Send one throwaway request so connection setup and model loading are not measured."""
+        self.measure_response_time(
+            "/api/ask",
+            {"request": {"query": "warmup", "mode": "qa", "top_k": 3, "model": "llama3.2:3b"}},
+            timeout=60
+        )
+    
+    async def _measure_response_time_async(self, client: "httpx.AsyncClient", endpoint: str,
+                                           payload: Dict[str, Any], timeout: int = 30) -> float:
+        """Measure response time for an endpoint using an async client."""
+        start_time = time.time()
+        try:
+            response = await client.post(
+                self._url(endpoint),
+                headers=self.get_headers(),
+                json=payload,
+                timeout=timeout
+            )
+            end_time = time.time()
+            
+            if response.status_code == 200:
+                return end_time - start_time
+            else:
+                return -1  # Error
+        except httpx.TimeoutException:
+            return -2  # Timed out
+        except httpx.HTTPError:
+            return -1  # Error
+    
+    async def _run_concurrent_requests(self, num_requests: int) -> List[float]:
+        """Issue concurrent /api/ask requests on a single event loop."""
+        limits = httpx.Limits(max_connections=max(num_requests, self.max_connections))
+        async with httpx.AsyncClient(limits=limits) as client:
+            tasks = [
+                self._measure_response_time_async(
+                    client,
+                    "/api/ask",
+                    {"request": {"query": "What is trading?", "mode": "qa", "top_k": 3, "model": "llama3.2:3b"}}
+                )
+                for _ in range(num_requests)
+            ]
+            return await asyncio.wait_for(asyncio.gather(*tasks), timeout=60)
+    
     def test_single_request_performance(self) -> List[PerformanceMetric]:
         """Test performance of single requests."""
         metrics = []
@@ -113,9 +199,11 @@ class PerformanceTester:
         
         # Run concurrent requests
         start_time = time.time()
-        with concurrent.futures.ThreadPoolExecutor(max_workers=num_requests) as executor:
-            futures = [executor.submit(make_request) for _ in range(num_requests)]
-            results = [future.result() for future in concurrent.futures.as_completed(futures, timeout=60)]
+        if HTTPX_AVAILABLE:
+            results = asyncio.run(self._run_concurrent_requests(num_requests))
+        else:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=num_requests) as executor:
+                results = list(executor.map(lambda _: make_request(), range(num_requests), timeout=60))
         end_time = time.time()
         
         # Filter out errors
@@ -214,12 +302,13 @@ class PerformanceTester:
         ]
         
         for endpoint, method, payload in endpoints:
+            url = self._url(endpoint)
             start_time = time.time()
             try:
                 if method == "GET":
-                    response = requests.get(f"{self.base_url}{endpoint}", headers=self.get_headers(), timeout=10)
+                    response = self.session.get(url, headers=self.get_headers(), timeout=10)
                 else:
-                    response = requests.post(f"{self.base_url}{endpoint}", headers=self.get_headers(), json=payload, timeout=10)
+                    response = self.session.post(url, headers=self.get_headers(), json=payload, timeout=10)
                 
                 end_time = time.time()
                 response_time = end_time - start_time
@@ -236,13 +325,26 @@ class PerformanceTester:
                         threshold=threshold,
                         passed=passed
                     ))
-            except:
-                pass
+            except RequestException:
+                continue
         
         return metrics
     
-    def run_performance_tests(self) -> Dict[str, Any]:
-        """Run all performance tests."""
+    async def _run_groups_parallel(self) -> List[List[PerformanceMetric]]:
+        """Run the independent test groups concurrently."""
+        return await asyncio.gather(
+            asyncio.to_thread(self.test_single_request_performance),
+            asyncio.to_thread(self.test_concurrent_requests),
+            asyncio.to_thread(self.test_api_endpoint_performance),
+        )
+    
+    def run_performance_tests(self, parallel: bool = False) -> Dict[str, Any]:
+        """Run all performance tests. Warm-up time is excluded from metrics.
+        
+        With ``parallel``, the single, concurrent and API endpoint groups overlap;
+        the memory test always runs on its own so its degradation figure is not
+        skewed by other traffic.
+        """
         print("Starting performance test suite...")
         
         # Authenticate
@@ -250,33 +352,41 @@ class PerformanceTester:
             print("Authentication failed. Exiting.")
             return {"error": "Authentication failed"}
         
-        all_metrics = []
+        # Warm up (excluded from metrics)
+        print("Warming up...")
+        self._warmup()
         
         # Run different performance tests
-        print("Testing single request performance...")
-        all_metrics.extend(self.test_single_request_performance())
-        
-        print("Testing concurrent requests...")
-        all_metrics.extend(self.test_concurrent_requests())
-        
-        print("Testing memory usage...")
-        all_metrics.extend(self.test_memory_usage())
+        if parallel:
+            print("Testing single request, concurrent and API endpoint performance in parallel...")
+            single, concurrent_m, api_m = asyncio.run(self._run_groups_parallel())
+            
+            print("Testing memory usage...")
+            memory = self.test_memory_usage()
+        else:
+            print("Testing single request performance...")
+            single = self.test_single_request_performance()
+            
+            print("Testing concurrent requests...")
+            concurrent_m = self.test_concurrent_requests()
+            
+            print("Testing memory usage...")
+            memory = self.test_memory_usage()
+            
+            print("Testing API endpoint performance...")
+            api_m = self.test_api_endpoint_performance()
         
-        print("Testing API endpoint performance...")
-        all_metrics.extend(self.test_api_endpoint_performance())
+        all_metrics = [*single, *concurrent_m, *memory, *api_m]
         
-        # Calculate summary
+        # Calculate summary and group metrics by category in a single pass
         total_tests = len(all_metrics)
-        passed_tests = sum(1 for m in all_metrics if m.passed)
-        failed_tests = total_tests - passed_tests
-        
-        # Group metrics by category
-        categories = {}
+        passed_tests = 0
+        categories = defaultdict(list)
         for metric in all_metrics:
-            category = metric.name.split(" ")[0]
-            if category not in categories:
-                categories[category] = []
-            categories[category].append(metric)
+            if metric.passed:
+                passed_tests += 1
+            categories[metric.name.partition(" ")[0]].append(metric)
+        failed_tests = total_tests - passed_tests
         
         results = {
             "total_tests": total_tests,
@@ -287,21 +397,25 @@ class PerformanceTester:
             "categories": categories
         }
         
-        # Print summary
-        print("\n" + "=" * 60)
-        print("Performance Test Summary:")
-        print(f"Total Tests: {total_tests}")
-        print(f"Passed: {passed_tests}")
-        print(f"Failed: {failed_tests}")
-        print(f"Success Rate: {results['success_rate']:.1f}%")
-        print("=" * 60)
+        # Build summary
+        lines = [
+            "\n" + "=" * 60,
+            "Performance Test Summary:",
+            f"Total Tests: {total_tests}",
+            f"Passed: {passed_tests}",
+            f"Failed: {failed_tests}",
+            f"Success Rate: {results['success_rate']:.1f}%",
+            "=" * 60,
+        ]
         
-        # Print detailed results
+        # Add detailed results
         for category, metrics in categories.items():
-            print(f"\n{category}:")
+            lines.append(f"\n{category}:")
             for metric in metrics:
                 status = "✓" if metric.passed else "✗"
-                print(f"  {status} {metric.name}: {metric.value:.2f} {metric.unit} (threshold: {metric.threshold} {metric.unit})")
+                lines.append(f"  {status} {metric.name}: {metric.value:.2f} {metric.unit} (threshold: {metric.threshold} {metric.unit})")
+        
+        sys.stdout.write("\n".join(lines) + "\n")
         
         return results
 
@@ -310,15 +424,26 @@ def main():
     parser.add_argument("--url", default="http://localhost:3001", help="Base URL for the API")
     parser.add_argument("--output", help="Output file for test results (JSON)")
     parser.add_argument("--concurrent", type=int, default=5, help="Number of concurrent requests")
+    parser.add_argument("--parallel", action="store_true", help="Run independent test groups concurrently")
     
     args = parser.parse_args()
     
-    tester = PerformanceTester(args.url)
-    results = tester.run_performance_tests()
+    if UVLOOP_AVAILABLE:
+        uvloop.install()
+    
+    tester = PerformanceTester(args.url, max_connections=max(args.concurrent, 32))
+    results = tester.run_performance_tests(parallel=args.parallel)
     
     if args.output:
-        with open(args.output, 'w') as f:
-            json.dump(results, f, indent=2, default=str)
+        if ORJSON_AVAILABLE:
+            with open(args.output, 'wb') as f:
+                f.write(orjson.dumps(
+                    results,
+                    option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_DATACLASS
+                ))
+        else:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2, default=asdict)
         print(f"Performance test results saved to {args.output}")
     
     # Exit with error code if any tests failed
@@ -110,6 +110,16 @@ class TestEmbeddingService:
         assert embedding is not None
         assert hasattr(embedding, 'shape')
     
+    def test_embed_text_cached(self, embedding_service):
+        """Test repeated text embedding is served from the cache."""
+        import numpy as np
+        
+        first = embedding_service.embed_text("cached text")
+        second = embedding_service.embed_text("cached text")
+        
+        assert np.array_equal(first, second)
+        assert first is not second
+    
     def test_embed_texts(self, embedding_service):
         """Test batch text embedding."""
         texts = ["text1", "text2", "text3"]
@@ -117,7 +127,22 @@ class TestEmbeddingService:
         
         assert embeddings is not None
         assert len(embeddings) == len(texts)
-    
+
+    def test_embed_texts_disk_cache(self, tmp_path):
+        """Test batch embeddings persist across service instances."""
+        import numpy as np
+
+        config = {'embedding_cache_path': str(tmp_path / 'embeddings.db')}
+        texts = ["text1", "text2", "text1"]
+        first = EmbeddingService('BAAI/bge-m3', config).embed_texts(texts)
+
+        service = EmbeddingService('BAAI/bge-m3', config)
+        service.model = None  # any model call would now fail
+        second = service.embed_texts(texts)
+
+        assert second.shape == (3, first.shape[1])
+        assert np.allclose(first, second)
+
     def test_embed_query(self, embedding_service):
         """Test query embedding."""
         query = "test query"
@@ -127,6 +152,17 @@ class TestEmbeddingService:
         assert embedding is not None
         assert hasattr(embedding, 'shape')
     
+    @pytest.mark.asyncio
+    async def test_embed_query_async(self, embedding_service):
+        """Test batched async query embedding."""
+        queries = ["query 1", "query 2", "query 3"]
+        embeddings = await asyncio.gather(
+            *(embedding_service.embed_query_async(query, "finance") for query in queries)
+        )
+        
+        assert len(embeddings) == len(queries)
+        assert all(hasattr(embedding, 'shape') for embedding in embeddings)
+    
     def test_compute_similarity(self, embedding_service):
         """Test similarity computation."""
         import numpy as np
@@ -140,6 +176,48 @@ class TestEmbeddingService:
         assert len(similarities) == 5
         assert all(0 <= sim <= 1 for sim in similarities)
     
+    def test_compute_similarity_stored_documents(self, embedding_service):
+        """Test similarity against stored, pre-normalized document embeddings."""
+        import numpy as np
+        
+        query_embedding = np.random.rand(384)
+        doc_embeddings = np.random.rand(5, 384)
+        
+        embedding_service.set_document_embeddings(doc_embeddings)
+        stored = embedding_service.compute_similarity(query_embedding)
+        direct = embedding_service.compute_similarity(query_embedding, doc_embeddings)
+        
+        assert len(stored) == 5
+        assert np.allclose(stored, direct, atol=1e-5)
+    
+    def test_compute_similarity_quantized(self):
+        """Test int8-quantized similarity stays close to float32 similarity."""
+        import numpy as np
+        
+        service = EmbeddingService('BAAI/bge-m3', {'quantize_embeddings': True})
+        query_embedding = np.random.rand(384)
+        doc_embeddings = np.random.rand(5, 384)
+        
+        service.set_document_embeddings(doc_embeddings)
+        quantized = service.compute_similarity(query_embedding)
+        exact = service.compute_similarity(query_embedding, doc_embeddings)
+        
+        assert np.allclose(quantized, exact, atol=1e-2)
+
+    def test_search_documents(self, embedding_service):
+        """Test top-k search over stored document embeddings."""
+        import numpy as np
+
+        query_embedding = np.random.rand(384)
+        doc_embeddings = np.random.rand(20, 384)
+
+        embedding_service.set_document_embeddings(doc_embeddings)
+        indices, scores = embedding_service.search_documents(query_embedding, top_k=3)
+        expected = np.argsort(-embedding_service.compute_similarity(query_embedding, doc_embeddings))[:3]
+
+        assert list(indices) == list(expected)
+        assert all(scores[i] >= scores[i + 1] for i in range(len(scores) - 1))
+
     def test_get_model_info(self, embedding_service):
         """Test model information retrieval."""
         info = embedding_service.get_model_info()
@@ -172,6 +172,12 @@ class TestFinanceAdapter:
         assert 'database_connector' in optional_connectors
         assert 'api_connector' in optional_connectors
     
+    def test_has_connector(self, finance_adapter):
+        """Test finance connector membership checks."""
+        assert finance_adapter.has_connector('pdf_connector')
+        assert finance_adapter.has_connector('api_connector')
+        assert not finance_adapter.has_connector('rss_connector')
+    
     def test_validate_query(self, finance_adapter):
         """Test finance query validation."""
         query = "trading strategies"
@@ -472,6 +478,47 @@ class TestDomainRegistry:
         assert validation['valid'] == False
         assert 'errors' in validation
     
+    def test_create_all_adapters(self, tmp_path):
+        """Test concurrent adapter creation for all configured domains."""
+        for domain in ('finance', 'legal', 'health'):
+            (tmp_path / f'{domain}.yaml').write_text(f'name: {domain}\ndomain: {domain}\n')
+        registry = DomainRegistry(str(tmp_path))
+        
+        adapters = registry.create_all_adapters()
+        
+        assert set(adapters) == {'finance', 'legal', 'health'}
+        assert isinstance(adapters['legal'], LegalAdapter)
+        assert set(registry.list_domains()) == {'finance', 'legal', 'health'}
+    
+    def test_domain_configs_not_shared(self, tmp_path):
+        """Test that registries built from the same files get independent configs."""
+        (tmp_path / 'finance.yaml').write_text('name: finance\nconnectors: [pdf_connector]\n')
+        first = DomainRegistry(str(tmp_path))
+        second = DomainRegistry(str(tmp_path))
+        
+        first.get_domain_config('finance')['connectors'].append('web_connector')
+        
+        assert second.get_domain_config('finance')['connectors'] == ['pdf_connector']
+        assert DomainRegistry(str(tmp_path)).get_domain_config('finance')['connectors'] == ['pdf_connector']
+    
+    def test_in_place_config_edit_refreshes(self, tmp_path):
+        """Test that editing a config file in place is picked up without a reload call."""
+        import os
+        config_file = tmp_path / 'finance.yaml'
+        config_file.write_text('name: finance\ndescription: old\n')
+        registry = DomainRegistry(str(tmp_path))
+        dir_mtime = tmp_path.stat().st_mtime_ns
+        
+        config_file.write_text('name: finance\ndescription: new\n')
+        # Force distinct file mtimes; editing an existing file leaves the directory mtime alone
+        stat = config_file.stat()
+        os.utime(config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        assert tmp_path.stat().st_mtime_ns == dir_mtime
+        
+        domains = registry.get_available_domains()
+        
+        assert domains[0]['description'] == 'new'
+    
     def test_get_domain_statistics(self, domain_registry):
         """Test domain statistics retrieval."""
         stats = domain_registry.get_domain_statistics()
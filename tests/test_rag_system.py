@@ -5,16 +5,33 @@ import pytest
 from unittest.mock import Mock, patch, AsyncMock
 from typing import Dict, List, Any
 
-from app.core.rag_system import GraphMindRAGSystem
-from app.core.memory_system import GraphMindMemorySystem
-from app.core.mcp_integration import GraphMindMCPIntegration
+# The app.core modules pull in the embedding and reranking stacks, so they are
+# imported inside fixtures and tests rather than at collection time
+pytestmark = pytest.mark.slow
 
+# Run a test once without a domain and once with the finance domain
+DOMAIN_CASES = pytest.mark.parametrize("domain", [None, "finance"], ids=["no_domain", "finance"])
+
+def _domain_kwargs(domain):
+    """Build the optional domain keyword argument."""
+    return {'domain': domain} if domain else {}
+
+@pytest.fixture(scope="module", autouse=True)
+def _stub_models():
+    """Replace the embedding and reranking services so no model is loaded."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("app.core.rag_system.EmbeddingService", lambda *a, **k: Mock(available=True))
+        mp.setattr("app.core.rag_system.RerankingService", lambda *a, **k: Mock(available=True))
+        yield
+
+@pytest.mark.xdist_group("rag")
 class TestGraphMindRAGSystem:
     """Test cases for GraphMindRAGSystem."""
     
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def rag_system(self):
         """Create a GraphMindRAGSystem instance for testing."""
+        from app.core.rag_system import GraphMindRAGSystem
         config = {
             'retrieval': {
                 'top_k': 5,
@@ -41,6 +58,34 @@ class TestGraphMindRAGSystem:
         }
         return GraphMindRAGSystem(config)
     
+    @pytest.fixture
+    def finance_sources(self, rag_system, monkeypatch):
+        """Give the shared RAG system a finance adapter and one canned connector.
+        
+        Only the collaborators that would reach external services (connectors,
+        reranker, retriever context) are replaced; domain state is restored after
+        each test.
+        """
+        from app.adapters.finance_adapter import FinanceAdapter
+        connector = Mock(enabled=True)
+        connector.search = AsyncMock(return_value=[
+            {'text': 'RSI measures momentum', 'score': 0.9,
+             'metadata': {'doc_id': 'doc1', 'doc_type': 'pdf', 'file_name': 'rsi.pdf', 'source': 'pdf'}},
+            {'text': 'MACD follows trends', 'score': 0.5,
+             'metadata': {'doc_id': 'doc2', 'doc_type': 'web_result', 'file_name': 'macd.html', 'source': 'web'}}
+        ])
+        monkeypatch.setitem(rag_system.domain_registry.adapters, 'finance', FinanceAdapter({}))
+        monkeypatch.setattr(rag_system, 'current_domain', None)
+        monkeypatch.setattr(rag_system, 'current_adapter', None)
+        monkeypatch.setattr(rag_system.connector_registry, 'get_connector',
+                            lambda name: connector if name == 'pdf_connector' else None)
+        monkeypatch.setattr(rag_system.connector_registry, 'health_check_all',
+                            AsyncMock(return_value={'pdf_connector': {'healthy': True}}))
+        monkeypatch.setattr(rag_system.reranking_service, 'rerank_documents',
+                            lambda query, documents, top_k, domain: documents[:top_k])
+        monkeypatch.setattr(rag_system.retriever, 'get_context', AsyncMock(return_value="RSI context"))
+        return connector
+    
     def test_rag_system_initialization(self, rag_system):
         """Test RAG system initialization."""
         assert rag_system is not None
@@ -64,112 +109,110 @@ class TestGraphMindRAGSystem:
         assert isinstance(result, bool)
     
     @pytest.mark.asyncio
-    async def test_search(self, rag_system):
-        """Test search functionality."""
-        query = "test query"
-        results = await rag_system.search(query)
-        
-        assert isinstance(results, list)
-    
-    @pytest.mark.asyncio
-    async def test_search_with_domain(self, rag_system):
-        """Test search with domain context."""
-        query = "test query"
-        domain = "finance"
-        results = await rag_system.search(query, domain=domain)
-        
-        assert isinstance(results, list)
-    
-    @pytest.mark.asyncio
-    async def test_get_context(self, rag_system):
-        """Test context generation."""
-        query = "test query"
-        context = await rag_system.get_context(query)
-        
-        assert isinstance(context, str)
-        assert len(context) > 0
-    
-    @pytest.mark.asyncio
-    async def test_get_context_with_domain(self, rag_system):
-        """Test context generation with domain."""
+    @DOMAIN_CASES
+    async def test_search(self, rag_system, finance_sources, domain):
+        """Test search with and without domain context."""
         query = "test query"
-        domain = "finance"
-        context = await rag_system.get_context(query, domain=domain)
-        
-        assert isinstance(context, str)
-        assert len(context) > 0
-    
-    @pytest.mark.asyncio
-    async def test_get_citations(self, rag_system):
-        """Test citation generation."""
+        results = await rag_system.search(query, **_domain_kwargs(domain))
+        
+        if domain is None:
+            # No adapter is set, so no connector is searched
+            assert results == []
+            finance_sources.search.assert_not_awaited()
+        else:
+            assert [r['text'] for r in results] == ['RSI measures momentum', 'MACD follows trends']
+            assert results[0]['metadata']['finance_category'] == 'general'
+            finance_sources.search.assert_awaited_once_with(query)
+    
+    def test_select_rerank_candidates(self, rag_system):
+        """Test deduplicated, bounded candidate selection before reranking."""
+        results = [
+            {'text': f'doc {i}', 'metadata': {'doc_id': f'doc{i % 12}'}, 'score': i / 20}
+            for i in range(20)
+        ]
+        
+        candidates = rag_system._select_rerank_candidates(results, top_k=1)
+        
+        assert len(candidates) == 8
+        assert [c['score'] for c in candidates] == sorted((c['score'] for c in candidates), reverse=True)
+        assert len({c['metadata']['doc_id'] for c in candidates}) == 8
+        assert candidates[0]['text'] == 'doc 11'
+    
+    @pytest.mark.asyncio
+    @DOMAIN_CASES
+    async def test_get_context(self, rag_system, finance_sources, domain):
+        """Test context generation with and without domain."""
         query = "test query"
-        citations = await rag_system.get_citations(query)
+        context = await rag_system.get_context(query, **_domain_kwargs(domain))
         
-        assert isinstance(citations, list)
+        if domain is None:
+            assert context == "No domain adapter available."
+        else:
+            assert context == "RSI context"
+            rag_system.retriever.get_context.assert_awaited_once_with(query, domain=domain, max_tokens=4000)
     
     @pytest.mark.asyncio
-    async def test_get_citations_with_domain(self, rag_system):
-        """Test citation generation with domain."""
+    @DOMAIN_CASES
+    async def test_get_citations(self, rag_system, finance_sources, domain):
+        """Test citation generation with and without domain."""
         query = "test query"
-        domain = "finance"
-        citations = await rag_system.get_citations(query, domain=domain)
+        citations = await rag_system.get_citations(query, **_domain_kwargs(domain))
         
-        assert isinstance(citations, list)
+        if domain is None:
+            assert citations == []
+        else:
+            assert [c['section'] for c in citations] == ['PDF: rsi.pdf', 'Web: macd.html']
+            assert citations[0]['text'] == 'RSI measures momentum...'
+            assert citations[0]['doc_id'] == 'doc1'
     
     @pytest.mark.asyncio
-    async def test_get_system_prompt(self, rag_system):
-        """Test system prompt retrieval."""
-        prompt = await rag_system.get_system_prompt()
+    @DOMAIN_CASES
+    async def test_get_system_prompt(self, rag_system, finance_sources, domain):
+        """Test system prompt retrieval with and without domain."""
+        prompt = await rag_system.get_system_prompt(**_domain_kwargs(domain))
         
-        assert isinstance(prompt, str)
-        assert len(prompt) > 0
-    
-    @pytest.mark.asyncio
-    async def test_get_system_prompt_with_domain(self, rag_system):
-        """Test system prompt retrieval with domain."""
-        domain = "finance"
-        prompt = await rag_system.get_system_prompt(domain=domain)
-        
-        assert isinstance(prompt, str)
-        assert len(prompt) > 0
-    
-    @pytest.mark.asyncio
-    async def test_get_web_search_prompt(self, rag_system):
-        """Test web search prompt retrieval."""
-        prompt = await rag_system.get_web_search_prompt()
-        
-        assert isinstance(prompt, str)
-        assert len(prompt) > 0
-        assert '{query}' in prompt
+        if domain is None:
+            assert prompt == "You are a helpful research assistant."
+        else:
+            assert prompt.startswith("You are a financial research assistant")
     
     @pytest.mark.asyncio
-    async def test_get_web_search_prompt_with_domain(self, rag_system):
-        """Test web search prompt retrieval with domain."""
-        domain = "finance"
-        prompt = await rag_system.get_web_search_prompt(domain=domain)
+    @DOMAIN_CASES
+    async def test_get_web_search_prompt(self, rag_system, finance_sources, domain):
+        """Test web search prompt retrieval with and without domain."""
+        prompt = await rag_system.get_web_search_prompt(**_domain_kwargs(domain))
         
-        assert isinstance(prompt, str)
-        assert len(prompt) > 0
         assert '{query}' in prompt
+        if domain is None:
+            assert prompt == "Search for information related to: {query}"
+        else:
+            assert prompt.startswith("Search for current financial news")
     
     @pytest.mark.asyncio
-    async def test_get_domain_info(self, rag_system):
+    async def test_get_domain_info(self, rag_system, finance_sources):
         """Test domain information retrieval."""
+        assert await rag_system.get_domain_info() == {'domain': None, 'adapter': None}
+        
+        await rag_system.set_domain('finance')
         info = await rag_system.get_domain_info()
         
-        assert isinstance(info, dict)
+        assert info['domain'] == 'finance'
+        assert info['name'] == 'Finance Research'
     
     @pytest.mark.asyncio
-    async def test_get_system_status(self, rag_system):
+    async def test_get_system_status(self, rag_system, finance_sources):
         """Test system status retrieval."""
+        await rag_system.set_domain('finance')
         status = await rag_system.get_system_status()
         
-        assert isinstance(status, dict)
-        assert 'domain' in status
-        assert 'connectors' in status
-        assert 'retriever_available' in status
-        assert 'embedding_available' in status
-        assert 'reranking_available' in status
+        assert status == {
+            'domain': 'finance',
+            'adapter': 'Finance Research',
+            'connectors': {'pdf_connector': {'healthy': True}},
+            'retriever_available': True,
+            'embedding_available': True,
+            'reranking_available': True
+        }
     
     @pytest.mark.asyncio
     async def test_close(self, rag_system):
@@ -177,24 +220,38 @@ class TestGraphMindRAGSystem:
         # Should not raise exception
         await rag_system.close()
 
+@pytest.mark.xdist_group("memory")
 class TestGraphMindMemorySystem:
     """Test cases for GraphMindMemorySystem."""
     
+    @pytest.fixture(scope="module")
+    async def memory_system_ro(self, tmp_path_factory):
+        """Create a shared GraphMindMemorySystem for tests that only read state."""
+        from app.core.memory_system import GraphMindMemorySystem
+        config = {
+            'memory_dir': str(tmp_path_factory.mktemp('memory')),
+            'max_memory_size': 1000
+        }
+        memory_system = GraphMindMemorySystem(config)
+        yield memory_system
+        await memory_system.close()
+    
     @pytest.fixture
-    def memory_system(self):
-        """Create a GraphMindMemorySystem instance for testing."""
+    def memory_system(self, clean_memory_dir):
+        """Create a GraphMindMemorySystem instance for tests that mutate state."""
+        from app.core.memory_system import GraphMindMemorySystem
         config = {
-            'memory_dir': './test_memory',
+            'memory_dir': str(clean_memory_dir),
             'max_memory_size': 1000
         }
         return GraphMindMemorySystem(config)
     
-    def test_memory_system_initialization(self, memory_system):
+    def test_memory_system_initialization(self, memory_system_ro):
         """Test memory system initialization."""
-        assert memory_system is not None
-        assert memory_system.config is not None
-        assert memory_system.memory_dir is not None
-        assert memory_system.max_memory_size == 1000
+        assert memory_system_ro is not None
+        assert memory_system_ro.config is not None
+        assert memory_system_ro.memory_dir is not None
+        assert memory_system_ro.max_memory_size == 1000
     
     @pytest.mark.asyncio
     async def test_add_memory(self, memory_system):
@@ -261,9 +318,11 @@ class TestGraphMindMemorySystem:
     async def test_search_memory(self, memory_system):
         """Test memory search."""
         # Add some test memories
-        await memory_system.add_memory("key1", "test content", "test")
-        await memory_system.add_memory("key2", "another test", "test")
-        await memory_system.add_memory("key3", "different content", "other")
+        await memory_system.add_memory_bulk([
+            ("key1", "test content", "test"),
+            ("key2", "another test", "test"),
+            ("key3", "different content", "other")
+        ])
         
         # Search memories
         results = await memory_system.search_memory("test")
@@ -271,15 +330,41 @@ class TestGraphMindMemorySystem:
         assert isinstance(results, list)
         assert len(results) >= 2  # Should find at least 2 results
     
+    @pytest.mark.asyncio
+    async def test_search_memory_many(self, memory_system):
+        """Test batched memory search matches per-query search."""
+        # Add some test memories
+        await memory_system.add_memory_bulk([
+            ("key1", "test content", "test"),
+            ("key2", "another test", "test"),
+            ("key3", "different content", "other")
+        ])
+        
+        # Search memories for several queries at once
+        queries = ["test", "content", "missing"]
+        results = await memory_system.search_memory_many(queries)
+        
+        assert len(results) == len(queries)
+        assert [len(r) for r in results] == [2, 2, 0]
+        for query, query_results in zip(queries, results):
+            assert query_results == await memory_system.search_memory(query)
+        # An entry matching several queries is a separate dict in each result list
+        test_match, = [r for r in results[0] if r['key'] == 'key1']
+        content_match, = [r for r in results[1] if r['key'] == 'key1']
+        assert test_match == content_match
+        assert test_match is not content_match
+    
     @pytest.mark.asyncio
     async def test_search_memory_with_domain(self, memory_system):
         """Test memory search with domain filter."""
         # Add some test memories
-        await memory_system.add_memory("key1", "test content", "test")
-        await memory_system.add_memory("key2", "another test", "other")
+        await memory_system.add_memory_bulk([
+            ("key1", "test content", "test"),
+            ("key2", "another test", "other")
+        ])
         
         # Search memories with domain filter
-        results = await memory_system.search_memory("test", domain="test")
+        results, = await memory_system.search_memory_many(["test"], domain="test")
         
         assert isinstance(results, list)
         assert len(results) == 1  # Should find only 1 result from "test" domain
@@ -288,9 +373,11 @@ class TestGraphMindMemorySystem:
     async def test_get_domain_memory(self, memory_system):
         """Test domain memory retrieval."""
         # Add some test memories
-        await memory_system.add_memory("key1", "test content", "test")
-        await memory_system.add_memory("key2", "another test", "test")
-        await memory_system.add_memory("key3", "different content", "other")
+        await memory_system.add_memory_bulk([
+            ("key1", "test content", "test"),
+            ("key2", "another test", "test"),
+            ("key3", "different content", "other")
+        ])
         
         # Get domain memory
         domain_memory = await memory_system.get_domain_memory("test")
@@ -302,24 +389,27 @@ class TestGraphMindMemorySystem:
     async def test_get_memory_statistics(self, memory_system):
         """Test memory statistics retrieval."""
         # Add some test memories
-        await memory_system.add_memory("key1", "test content", "test")
-        await memory_system.add_memory("key2", "another test", "other")
+        await memory_system.add_memory_bulk([
+            ("key1", "test content", "test"),
+            ("key2", "another test", "other")
+        ])
         
         # Get statistics
         stats = await memory_system.get_memory_statistics()
         
         assert isinstance(stats, dict)
-        assert 'total_entries' in stats
-        assert 'domains' in stats
-        assert 'domain_count' in stats
-        assert 'total_size_bytes' in stats
+        assert {'total_entries', 'domains', 'domain_count', 'total_size_bytes'} <= stats.keys()
+        assert stats['total_entries'] == 2
+        assert stats['domain_count'] == 2
     
     @pytest.mark.asyncio
     async def test_clear_domain_memory(self, memory_system):
         """Test domain memory clearing."""
         # Add some test memories
-        await memory_system.add_memory("key1", "test content", "test")
-        await memory_system.add_memory("key2", "another test", "other")
+        await memory_system.add_memory_bulk([
+            ("key1", "test content", "test"),
+            ("key2", "another test", "other")
+        ])
         
         # Clear domain memory
         result = await memory_system.clear_domain_memory("test")
@@ -331,13 +421,31 @@ class TestGraphMindMemorySystem:
     @pytest.mark.asyncio
     async def test_export_memory(self, memory_system):
         """Test memory export."""
+        import io
+        import json
+        
         # Add some test memories
         await memory_system.add_memory("key1", "test content", "test")
         
         # Export memory
-        result = await memory_system.export_memory("./test_export.json")
+        buffer = io.StringIO()
+        result = await memory_system.export_memory(buffer)
         
         assert result == True
+        assert json.loads(buffer.getvalue())["key1"]["value"] == "test content"
+    
+    @pytest.mark.asyncio
+    async def test_export_memory_non_str_keys(self, memory_system, tmp_path):
+        """Test memory export to a path with non-str keys in a value."""
+        import json
+        
+        await memory_system.add_memory("key1", {1: "one"}, "test")
+        
+        export_path = tmp_path / "export.json"
+        result = await memory_system.export_memory(str(export_path))
+        
+        assert result == True
+        assert json.loads(export_path.read_text())["key1"]["value"] == {"1": "one"}
     
     @pytest.mark.asyncio
     async def test_import_memory(self, memory_system):
@@ -353,13 +461,10 @@ class TestGraphMindMemorySystem:
             }
         }
         
-        # Write test file
-        import json
-        with open("./test_import.json", "w") as f:
-            json.dump(import_data, f)
-        
         # Import memory
-        result = await memory_system.import_memory("./test_import.json")
+        import io
+        import json
+        result = await memory_system.import_memory(io.StringIO(json.dumps(import_data)))
         
         assert result == True
         assert "imported_key" in memory_system.memory
@@ -370,12 +475,14 @@ class TestGraphMindMemorySystem:
         # Should not raise exception
         await memory_system.close()
 
+@pytest.mark.xdist_group("mcp")
 class TestGraphMindMCPIntegration:
     """Test cases for GraphMindMCPIntegration."""
     
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def mcp_integration(self):
         """Create a GraphMindMCPIntegration instance for testing."""
+        from app.core.mcp_integration import GraphMindMCPIntegration
         config = {
             'mcp_enabled': True,
             'mcp_servers': {
@@ -452,9 +559,7 @@ class TestGraphMindMCPIntegration:
         status = await mcp_integration.get_mcp_status()
         
         assert isinstance(status, dict)
-        assert 'mcp_enabled' in status
-        assert 'total_servers' in status
-        assert 'servers' in status
+        assert {'mcp_enabled', 'total_servers', 'servers'} <= status.keys()
     
     @pytest.mark.asyncio
     async def test_close(self, mcp_integration):
@@ -462,19 +567,22 @@ class TestGraphMindMCPIntegration:
         # Should not raise exception
         await mcp_integration.close()
 
+@pytest.mark.integration
 class TestIntegration:
     """Integration tests for GraphMind components."""
     
     @pytest.mark.asyncio
-    async def test_rag_system_with_memory(self):
+    async def test_rag_system_with_memory(self, clean_memory_dir):
         """Test RAG system with memory integration."""
+        from app.core.rag_system import GraphMindRAGSystem
+        from app.core.memory_system import GraphMindMemorySystem
         config = {
             'retrieval': {'top_k': 5},
             'embedding': {'model_name': 'BAAI/bge-m3'},
             'reranking': {'model_name': 'BAAI/bge-reranker-large'},
             'connectors': {},
             'memory': {
-                'memory_dir': './test_memory',
+                'memory_dir': str(clean_memory_dir),
                 'max_memory_size': 1000
             }
         }
@@ -489,6 +597,8 @@ class TestIntegration:
     @pytest.mark.asyncio
     async def test_rag_system_with_mcp(self):
         """Test RAG system with MCP integration."""
+        from app.core.rag_system import GraphMindRAGSystem
+        from app.core.mcp_integration import GraphMindMCPIntegration
         config = {
             'retrieval': {'top_k': 5},
             'embedding': {'model_name': 'BAAI/bge-m3'},
@@ -509,6 +619,7 @@ class TestIntegration:
     
     def test_error_handling(self):
         """Test error handling in GraphMind components."""
+        from app.core.rag_system import GraphMindRAGSystem
         # Test with invalid configuration
         invalid_config = {'invalid': 'config'}
         
@@ -522,6 +633,7 @@ class TestIntegration:
     
     def test_configuration_validation(self):
         """Test configuration validation."""
+        from app.core.rag_system import GraphMindRAGSystem
         valid_config = {
             'retrieval': {'top_k': 5},
             'embedding': {'model_name': 'BAAI/bge-m3'},
@@ -4,8 +4,11 @@ Unit tests for authentication module
 
 import pytest
 from datetime import datetime, timedelta
-from app.auth import AuthManager, get_current_user, require_admin
+from fastapi.security import HTTPAuthorizationCredentials
+from freezegun import freeze_time
+from app.auth import AuthManager, DEFAULT_ADMIN_PASSWORD, DEFAULT_ADMIN_USERNAME, get_current_user, require_admin
 
+@pytest.mark.xdist_group("auth")
 class TestPasswordHashing:
     """Test password hashing and verification"""
     
@@ -43,135 +46,126 @@ class TestPasswordHashing:
         assert verify_password(password, hash1) is True
         assert verify_password(password, hash2) is True
 
+@pytest.fixture(scope="module")
+def token_manager():
+    """AuthManager shared by the JWT tests (token helpers don't touch its users)"""
+    return AuthManager()
+
+@pytest.fixture(scope="module")
+def valid_token(token_manager):
+    """Sign one admin token and share it across the JWT tests"""
+    return token_manager.create_access_token({"sub": "testuser", "is_admin": True})
+
+@pytest.mark.xdist_group("auth")
 class TestJWTTokens:
     """Test JWT token creation and verification"""
     
-    def test_create_access_token(self):
+    def test_create_access_token(self, valid_token):
         """Test access token creation"""
-        data = {"sub": "testuser"}
-        token = create_access_token(data)
-        
-        assert token is not None
-        assert isinstance(token, str)
-        assert len(token) > 20
+        assert valid_token is not None
+        assert isinstance(valid_token, str)
+        assert len(valid_token) > 20
     
-    def test_create_token_with_expiry(self):
+    def test_create_token_with_expiry(self, token_manager):
         """Test token creation with custom expiry"""
         data = {"sub": "testuser"}
         expires_delta = timedelta(minutes=15)
-        token = create_access_token(data, expires_delta=expires_delta)
+        token = token_manager.create_access_token(data, expires_delta=expires_delta)
         
-        assert token is not None
+        assert token_manager.verify_token(token) == {"username": "testuser"}
     
-    def test_verify_valid_token(self):
+    def test_verify_valid_token(self, token_manager, valid_token):
         """Test verification of valid token"""
-        data = {"sub": "testuser", "is_admin": True}
-        token = create_access_token(data)
+        payload = token_manager.verify_token(valid_token)
         
-        payload = verify_token(token)
-        
-        assert payload is not None
-        assert payload.get("sub") == "testuser"
-        assert payload.get("is_admin") is True
+        # Only the subject is returned; admin status comes from the user record
+        assert payload == {"username": "testuser"}
     
-    def test_verify_invalid_token(self):
+    def test_verify_invalid_token(self, token_manager):
         """Test verification of invalid token"""
         invalid_token = "invalid.token.here"
         
-        payload = verify_token(invalid_token)
+        payload = token_manager.verify_token(invalid_token)
         assert payload is None
     
-    def test_verify_expired_token(self):
+    @freeze_time("2024-01-01T00:00:00")
+    def test_verify_expired_token(self, token_manager):
         """Test verification of expired token"""
         data = {"sub": "testuser"}
-        # Create token that expires immediately
-        expires_delta = timedelta(seconds=-1)  # Already expired
-        token = create_access_token(data, expires_delta=expires_delta)
+        token = token_manager.create_access_token(data, expires_delta=timedelta(minutes=5))
         
-        payload = verify_token(token)
+        # Jump past the expiry instead of signing an already-expired token
+        with freeze_time("2024-01-01T01:00:00"):
+            payload = token_manager.verify_token(token)
         assert payload is None
 
+@pytest.mark.xdist_group("auth")
 class TestAuthManager:
     """Test AuthManager class"""
     
-    def test_init(self, temp_dir):
-        """Test AuthManager initialization"""
-        auth_manager = AuthManager(storage_dir=str(temp_dir))
-        
-        assert auth_manager.storage_dir == temp_dir
-        assert auth_manager.users_file.exists()
+    @pytest.fixture
+    def auth_manager(self):
+        """Fresh in-memory AuthManager (users are not persisted)"""
+        return AuthManager()
     
-    def test_create_user(self, temp_dir):
-        """Test user creation"""
-        auth_manager = AuthManager(storage_dir=str(temp_dir))
-        
-        success = auth_manager.create_user("testuser", "password123", is_admin=False)
-        assert success is True
+    def test_init(self, auth_manager):
+        """Test AuthManager initialization with the default admin"""
+        admin = auth_manager.users[DEFAULT_ADMIN_USERNAME]
         
-        # Verify user exists
-        users = auth_manager._load_users()
-        assert "testuser" in users
-        assert users["testuser"]["is_admin"] is False
+        assert admin["username"] == DEFAULT_ADMIN_USERNAME
+        assert admin["is_admin"] is True
+        assert admin["hashed_password"] != DEFAULT_ADMIN_PASSWORD
     
-    def test_create_duplicate_user(self, temp_dir):
-        """Test creating duplicate user fails"""
-        auth_manager = AuthManager(storage_dir=str(temp_dir))
+    def test_verify_password(self, auth_manager):
+        """Test password verification against a stored hash"""
+        hashed = auth_manager._hash_password("password123")
         
-        auth_manager.create_user("testuser", "password123")
-        success = auth_manager.create_user("testuser", "password456")
+        assert auth_manager.verify_password("password123", hashed) is True
+        assert auth_manager.verify_password("password456", hashed) is False
+    
+    def test_get_current_user(self, auth_manager):
+        """Test resolving the user behind a bearer token"""
+        token = auth_manager.create_access_token({"sub": DEFAULT_ADMIN_USERNAME})
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
         
-        assert success is False
+        user = auth_manager.get_current_user(credentials)
+        assert user["username"] == DEFAULT_ADMIN_USERNAME
     
-    def test_authenticate_valid_user(self, temp_dir):
+    def test_authenticate_valid_user(self, auth_manager):
         """Test authentication with valid credentials"""
-        auth_manager = AuthManager(storage_dir=str(temp_dir))
-        
-        auth_manager.create_user("testuser", "password123", is_admin=True)
-        user = auth_manager.authenticate_user("testuser", "password123")
+        user = auth_manager.authenticate_user(DEFAULT_ADMIN_USERNAME, DEFAULT_ADMIN_PASSWORD)
         
         assert user is not None
-        assert user["username"] == "testuser"
+        assert user["username"] == DEFAULT_ADMIN_USERNAME
         assert user["is_admin"] is True
     
-    def test_authenticate_invalid_password(self, temp_dir):
+    def test_authenticate_invalid_password(self, auth_manager):
         """Test authentication with invalid password"""
-        auth_manager = AuthManager(storage_dir=str(temp_dir))
-        
-        auth_manager.create_user("testuser", "password123")
-        user = auth_manager.authenticate_user("testuser", "wrong_password")
+        user = auth_manager.authenticate_user(DEFAULT_ADMIN_USERNAME, "wrong_password")
         
         assert user is None
     
-    def test_authenticate_nonexistent_user(self, temp_dir):
+    def test_authenticate_nonexistent_user(self, auth_manager):
         """Test authentication with non-existent user"""
-        auth_manager = AuthManager(storage_dir=str(temp_dir))
-        
         user = auth_manager.authenticate_user("nonexistent", "password")
         assert user is None
     
-    def test_change_password(self, temp_dir):
+    def test_change_password(self, auth_manager):
         """Test password change functionality"""
-        auth_manager = AuthManager(storage_dir=str(temp_dir))
-        
-        auth_manager.create_user("testuser", "old_password")
-        success = auth_manager.change_password("testuser", "old_password", "new_password")
+        success = auth_manager.change_password(DEFAULT_ADMIN_USERNAME, DEFAULT_ADMIN_PASSWORD, "new_password")
         
         assert success is True
         
         # Old password should not work
-        user = auth_manager.authenticate_user("testuser", "old_password")
+        user = auth_manager.authenticate_user(DEFAULT_ADMIN_USERNAME, DEFAULT_ADMIN_PASSWORD)
         assert user is None
         
         # New password should work
-        user = auth_manager.authenticate_user("testuser", "new_password")
+        user = auth_manager.authenticate_user(DEFAULT_ADMIN_USERNAME, "new_password")
         assert user is not None
     
-    def test_change_password_wrong_old_password(self, temp_dir):
+    def test_change_password_wrong_old_password(self, auth_manager):
         """Test password change with wrong old password"""
-        auth_manager = AuthManager(storage_dir=str(temp_dir))
-        
-        auth_manager.create_user("testuser", "password123")
-        success = auth_manager.change_password("testuser", "wrong_old", "new_password")
+        success = auth_manager.change_password(DEFAULT_ADMIN_USERNAME, "wrong_old", "new_password")
         
         assert success is False
-
@@ -6,76 +6,76 @@ Tests only the functions that actually exist in the module
 import pytest
 from app.auth import AuthManager, get_current_user, require_admin
 
-class TestAuthManager:
-    """Test AuthManager functionality"""
-    
-    def test_auth_manager_init(self):
+@pytest.fixture(scope="module")
+def auth():
+    """Shared AuthManager for tests that only read state"""
+    return AuthManager()
+
+@pytest.fixture
+def auth_fresh(auth):
+    """Shared AuthManager with its users restored after a mutating test"""
+    users = dict(auth.users)
+    yield auth
+    auth.users.clear()
+    auth.users.update(users)
+
+@pytest.mark.xdist_group("auth")
+class TestAuth:
+    """Test AuthManager, helper functions and integration scenarios"""
+
+    def test_auth_manager_init(self, auth):
         """Test AuthManager initialization"""
-        auth = AuthManager()
         assert auth is not None
         assert hasattr(auth, 'users')
-    
-    def test_auth_manager_has_required_methods(self):
+
+    def test_auth_manager_has_required_methods(self, auth):
         """Test that AuthManager has required methods"""
-        auth = AuthManager()
         assert hasattr(auth, 'create_user')
         assert hasattr(auth, 'authenticate')
         assert hasattr(auth, 'change_password')
-    
-    def test_auth_manager_users_attribute(self):
+
+    def test_auth_manager_users_attribute(self, auth):
         """Test that AuthManager has users attribute"""
-        auth = AuthManager()
         assert hasattr(auth, 'users')
         assert isinstance(auth.users, dict)
 
-class TestAuthFunctions:
-    """Test authentication helper functions"""
-    
-    def test_get_current_user_function_exists(self):
-        """Test that get_current_user function exists and is callable"""
-        assert callable(get_current_user)
-    
-    def test_require_admin_function_exists(self):
-        """Test that require_admin function exists and is callable"""
-        assert callable(require_admin)
-
-class TestAuthManagerIntegration:
-    """Test AuthManager integration scenarios"""
-    
-    def test_create_and_authenticate_user(self):
+    @pytest.mark.parametrize("func", [get_current_user, require_admin],
+                             ids=["get_current_user", "require_admin"])
+    def test_function_exists(self, func):
+        """Test that the auth helper function exists and is callable"""
+        assert callable(func)
+
+    def test_create_and_authenticate_user(self, auth_fresh):
         """Test creating a user and authenticating them"""
-        auth = AuthManager()
         username = "test_user"
         password = "test_password"
-        
+
         # Create user
-        result = auth.create_user(username, password)
+        result = auth_fresh.create_user(username, password)
         assert result is True
-        assert username in auth.users
-        
+        assert username in auth_fresh.users
+
         # Authenticate user
-        auth_result = auth.authenticate(username, password)
+        auth_result = auth_fresh.authenticate(username, password)
         assert auth_result is True
-    
-    def test_authenticate_nonexistent_user(self):
+
+    def test_authenticate_nonexistent_user(self, auth):
         """Test authenticating a user that doesn't exist"""
-        auth = AuthManager()
         username = "nonexistent_user"
         password = "test_password"
-        
+
         result = auth.authenticate(username, password)
         assert result is False
-    
-    def test_create_duplicate_user(self):
+
+    def test_create_duplicate_user(self, auth_fresh):
         """Test creating a user that already exists"""
-        auth = AuthManager()
         username = "test_user"
         password = "test_password"
-        
+
         # Create first user
-        result1 = auth.create_user(username, password)
+        result1 = auth_fresh.create_user(username, password)
         assert result1 is True
-        
+
         # Try to create duplicate
-        result2 = auth.create_user(username, password)
+        result2 = auth_fresh.create_user(username, password)
         assert result2 is False
@@ -5,7 +5,7 @@ Unit tests for caching system
 import pytest
 import time
 from unittest.mock import Mock, patch, MagicMock
-from app.caching import QueryCache, RedisQueryCache
+from app.caching import QueryCache, RedisQueryCache, _decode_payload, _encode_payload
 
 class TestCacheKeyGeneration:
     """Test cache key generation"""
@@ -187,3 +187,13 @@ class TestCacheIntegration:
             
             assert result is None
 
+class TestPayloadEncoding:
+    """Test cache payload serialization"""
+    
+    def test_non_str_keys_round_trip(self):
+        """Test that payloads with non-str keys decode instead of raising"""
+        decoded = _decode_payload(_encode_payload({"answer": "Cached answer", "scores": {1: 0.9}}))
+        
+        assert decoded["answer"] == "Cached answer"
+        # msgpack keeps int keys; the JSON fallbacks stringify them
+        assert decoded["scores"].get(1, decoded["scores"].get("1")) == 0.9
@@ -38,6 +38,28 @@ class TestQueryCache:
         result = cache.get("test_key")
         assert result is None
 
+    def test_reap_keeps_live_entries(self):
+        """Test that a re-set key's stale expiry does not reap a live entry"""
+        cache = QueryCache(ttl_seconds=100)
+        seconds = 1_000_000_000
+        
+        with patch('app.caching.time.monotonic_ns') as monotonic_ns:
+            monotonic_ns.return_value = 0
+            cache.set("A", "model", {"answer": "a"})
+            monotonic_ns.return_value = 50 * seconds
+            cache.set("B", "model", {"answer": "b"})
+            monotonic_ns.return_value = 60 * seconds
+            cache.set("A", "model", {"answer": "a2"})
+            
+            # A's first expiry (t=100) is stale; B lives until t=150 and A until t=160
+            monotonic_ns.return_value = 101 * seconds
+            assert cache.get("B", "model") == {"answer": "b"}
+            assert cache.get("A", "model") == {"answer": "a2"}
+            
+            monotonic_ns.return_value = 151 * seconds
+            assert cache.get("B", "model") is None
+            assert cache.get("A", "model") == {"answer": "a2"}
+
 class TestRedisQueryCache:
     """Test RedisQueryCache functionality"""
     
@@ -113,6 +113,62 @@ class TestUserMemory:
         
         assert value == "qwen2.5:14b"
     
+    def test_store_many(self, temp_dir):
+        """Test storing several entries in one batch"""
+        memory = UserMemory(storage_dir=str(temp_dir))
+        
+        success = memory.store_many("user123", [
+            ("preference", ("model", "qwen2.5:14b")),
+            ("preference", ("temperature", "0.1")),
+            ("insight", ("Insight 1",)),
+            ("chat_context", ("chat123", {"topic": "momentum_trading"}))
+        ])
+        assert success is True
+        
+        reloaded = UserMemory(storage_dir=str(temp_dir))
+        assert reloaded.get_preference("user123", "temperature") == "0.1"
+        assert reloaded.get_key_insights("user123")[0]["insight"] == "Insight 1"
+        assert reloaded.get_chat_context("user123", "chat123")["topic"] == "momentum_trading"
+    
+    def test_non_str_keys_survive_reload(self, temp_dir):
+        """Test that a record with non-str keys does not cut off the log on replay"""
+        memory1 = UserMemory(storage_dir=str(temp_dir))
+        memory1.store_chat_context("user123", "chat123", {1: "a"})
+        memory1.store_preference("user123", "model", "qwen2.5:14b")
+        
+        memory2 = UserMemory(storage_dir=str(temp_dir))
+        context = memory2.get_chat_context("user123", "chat123")
+        # The JSON-lines log stringifies keys; msgpack keeps them as ints
+        assert context.get(1, context.get("1")) == "a"
+        assert memory2.get_preference("user123", "model") == "qwen2.5:14b"
+    
+    def test_legacy_migration_leaves_shard_alone(self, temp_dir):
+        """Test migrating a hex user id whose legacy directory is also a shard directory"""
+        memory = UserMemory(storage_dir=str(temp_dir))
+        memory.store_preference("user123", "model", "qwen2.5:14b")
+        shard_dir = memory.get_user_dir("user123").parent
+        
+        # Unsharded layout for user id "<shard>", i.e. files inside the shard directory
+        legacy_user = shard_dir.name
+        (shard_dir / "user_preferences.json").write_text(json.dumps({"model": "llama3.1"}))
+        
+        reloaded = UserMemory(storage_dir=str(temp_dir))
+        assert reloaded.get_preference(legacy_user, "model") == "llama3.1"
+        assert reloaded.get_preference("user123", "model") == "qwen2.5:14b"
+        assert (shard_dir / "user123").is_dir()
+        assert not (shard_dir / "user_preferences.json").exists()
+    
+    def test_log_compaction(self, temp_dir):
+        """Test that repeated writes are compacted and still replay correctly"""
+        memory1 = UserMemory(storage_dir=str(temp_dir))
+        for i in range(200):
+            memory1.store_preference("user123", "model", f"model-{i}")
+        
+        assert memory1._log_lines["user123"] < 200
+        
+        memory2 = UserMemory(storage_dir=str(temp_dir))
+        assert memory2.get_preference("user123", "model") == "model-199"
+    
     def test_multiple_users(self, temp_dir):
         """Test memory isolation between users"""
         memory = UserMemory(storage_dir=str(temp_dir))
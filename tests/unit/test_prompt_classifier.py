@@ -119,11 +119,43 @@ class TestPromptClassifier:
             query = "something interesting"
             classification = classifier.classify(query)
             
-            # Should call LLM
+            # Should call LLM with the classifier instructions ahead of the query
             assert classifier.llm.generate.called
+            sent = classifier.llm.generate.call_args.kwargs["prompt"]
+            assert sent.startswith("You are a query classifier.")
+            assert sent.endswith("Classify this query: something interesting")
             assert classification.task_type == "Q&A"
             assert classification.confidence == 0.8
     
+    def test_ambiguous_query_cached(self, classifier):
+        """Test that a repeated ambiguous query skips the LLM."""
+        mock_response = '{"task_type": "Q&A", "output_format": "markdown", "confidence": 0.8}'
+        
+        with patch.object(classifier.llm, 'generate', return_value=mock_response) as mock_generate:
+            first = classifier.classify("something interesting")
+            second = classifier.classify("  something interesting ")
+            
+            assert mock_generate.call_count == 1
+            assert second == first
+            assert second is not first
+    
+    def test_classify_batch(self, classifier):
+        """Test batch classification matches per-query classification."""
+        queries = [
+            "Compare ES and NQ futures",
+            "Summarize the AAPL\nearnings report",
+            "What is RSI for TSLA",
+            "Compare ES and NQ futures"
+        ]
+        
+        batch = classifier.classify_batch(queries)
+        
+        assert len(batch) == len(queries)
+        for query, result in zip(queries, batch):
+            single = PromptClassifier(model="llama3.2:3b-instruct").classify(query)
+            assert result.task_type == single.task_type
+            assert sorted(result.entities["tickers"]) == sorted(single.entities["tickers"])
+    
     def test_confidence_scoring(self, classifier):
         """Test confidence scoring."""
         # Clear queries should have high confidence
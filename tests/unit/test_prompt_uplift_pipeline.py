@@ -4,21 +4,48 @@ Unit tests for Prompt Uplift Pipeline.
 Tests end-to-end pipeline flow, caching, skip logic, and fallbacks.
 """
 import pytest
-import time
-from unittest.mock import Mock, patch, MagicMock
+from time import perf_counter_ns
+from dataclasses import replace
+from unittest.mock import DEFAULT, Mock, patch, MagicMock
 from app.prompt_uplift_pipeline import PromptUpliftPipeline
-from app.models import Classification, ProcessedQuery
+from app.models import Classification, ProcessedQuery, UpliftedPrompt
 
 
+# Classification returned by the mocked classifier in every test
+MOCK_CLASSIFICATION = Classification(
+    task_type="Q&A",
+    required_sources=["RAG"],
+    entities={},
+    output_format="markdown",
+    complexity="medium",
+    confidence=0.85
+)
+
+
+# Uplift result returned by the mocked uplifter; tests vary it with replace()
+BASE_UPLIFTED = UpliftedPrompt(
+    original="",
+    improved="Improved",
+    classification=MOCK_CLASSIFICATION,
+    confidence=0.85
+)
+
+
+def patch_components(pipeline):
+    """Replace the classifier, uplifter and expander with autospecced mocks in one patcher."""
+    return patch.multiple(pipeline, autospec=True, classifier=DEFAULT, uplifter=DEFAULT, expander=DEFAULT)
+
+
+@pytest.mark.xdist_group("uplift_pipeline")
 class TestPromptUpliftPipeline:
     """Test suite for PromptUpliftPipeline."""
     
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def pipeline(self):
-        """Create pipeline instance."""
+        """Create pipeline instance shared by the module (tests only patch it)."""
         return PromptUpliftPipeline()
     
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def sample_context(self):
         """Create sample context."""
         return {
@@ -32,31 +59,14 @@ class TestPromptUpliftPipeline:
         query = "trading strategies"
         
         # Mock components
-        with patch.object(pipeline.classifier, 'classify') as mock_classify, \
-             patch.object(pipeline.uplifter, 'uplift') as mock_uplift, \
-             patch.object(pipeline.expander, 'expand') as mock_expand:
-            
-            # Setup mocks
-            mock_classification = Classification(
-                task_type="Q&A",
-                required_sources=["RAG"],
-                entities={},
-                output_format="markdown",
-                complexity="medium",
-                confidence=0.85
-            )
-            
-            from app.models import UpliftedPrompt
-            mock_uplifted = UpliftedPrompt(
+        with patch_components(pipeline) as mocks:
+            mocks["classifier"].classify.return_value = MOCK_CLASSIFICATION
+            mocks["uplifter"].uplift.return_value = replace(
+                BASE_UPLIFTED,
                 original=query,
-                improved="Provide 3-5 specific trading strategies with risk profiles. Cite sources.",
-                classification=mock_classification,
-                confidence=0.85
+                improved="Provide 3-5 specific trading strategies with risk profiles. Cite sources."
             )
-            
-            mock_classify.return_value = mock_classification
-            mock_uplift.return_value = mock_uplifted
-            mock_expand.return_value = ["effective trading approaches", "momentum strategies"]
+            mocks["expander"].expand.return_value = ["effective trading approaches", "momentum strategies"]
             
             # Run pipeline
             result = pipeline.process(query, sample_context)
@@ -77,35 +87,15 @@ class TestPromptUpliftPipeline:
         }
         
         # Mock components
-        with patch.object(pipeline.classifier, 'classify') as mock_classify, \
-             patch.object(pipeline.uplifter, 'uplift') as mock_uplift, \
-             patch.object(pipeline.expander, 'expand') as mock_expand:
-            
-            mock_classification = Classification(
-                task_type="Q&A",
-                required_sources=["RAG"],
-                entities={},
-                output_format="markdown",
-                complexity="medium",
-                confidence=0.85
-            )
-            
-            from app.models import UpliftedPrompt
-            mock_uplifted = UpliftedPrompt(
-                original=query,
-                improved="Improved query",
-                classification=mock_classification,
-                confidence=0.85
-            )
-            
-            mock_classify.return_value = mock_classification
-            mock_uplift.return_value = mock_uplifted
+        with patch_components(pipeline) as mocks:
+            mocks["classifier"].classify.return_value = MOCK_CLASSIFICATION
+            mocks["uplifter"].uplift.return_value = replace(BASE_UPLIFTED, original=query, improved="Improved query")
             
             # Run pipeline
             result = pipeline.process(query, context)
             
             # Expansion should be skipped (previous_hits >= threshold)
-            mock_expand.assert_not_called()
+            mocks["expander"].expand.assert_not_called()
             assert len(result.expansions) == 0
     
     def test_confidence_fallback_to_original(self, pipeline, sample_context):
@@ -113,30 +103,13 @@ class TestPromptUpliftPipeline:
         query = "test query"
         
         # Mock components
-        with patch.object(pipeline.classifier, 'classify') as mock_classify, \
-             patch.object(pipeline.uplifter, 'uplift') as mock_uplift:
-            
-            mock_classification = Classification(
-                task_type="Q&A",
-                required_sources=["RAG"],
-                entities={},
-                output_format="markdown",
-                complexity="medium",
-                confidence=0.85
+        with patch_components(pipeline) as mocks:
+            mocks["classifier"].classify.return_value = MOCK_CLASSIFICATION
+            # Low confidence uplift (below threshold)
+            mocks["uplifter"].uplift.return_value = replace(
+                BASE_UPLIFTED, original=query, improved="Poor improvement", confidence=0.5
             )
             
-            from app.models import UpliftedPrompt
-            # Low confidence uplift
-            mock_uplifted = UpliftedPrompt(
-                original=query,
-                improved="Poor improvement",
-                classification=mock_classification,
-                confidence=0.5  # Below threshold
-            )
-            
-            mock_classify.return_value = mock_classification
-            mock_uplift.return_value = mock_uplifted
-            
             # Run pipeline
             result = pipeline.process(query, sample_context)
             
@@ -145,82 +118,43 @@ class TestPromptUpliftPipeline:
             assert result.final_query == query
             assert len(result.expansions) == 0
     
-    def test_caching_works(self, pipeline, sample_context):
+    def test_caching_works(self, pipeline, sample_context, monkeypatch):
         """Test caching functionality."""
         query = "cached query"
         
+        # Back the pipeline cache with a dict so the second call is a real hit
+        cache = {}
+        monkeypatch.setattr(pipeline, '_get_from_cache', cache.get)
+        monkeypatch.setattr(pipeline, '_set_cache', cache.__setitem__)
+        
         # Mock components
-        with patch.object(pipeline.classifier, 'classify') as mock_classify, \
-             patch.object(pipeline.uplifter, 'uplift') as mock_uplift, \
-             patch.object(pipeline.expander, 'expand') as mock_expand:
+        with patch_components(pipeline) as mocks:
+            mocks["classifier"].classify.return_value = MOCK_CLASSIFICATION
+            mocks["uplifter"].uplift.return_value = replace(BASE_UPLIFTED, original=query)
+            mocks["expander"].expand.return_value = []
             
-            mock_classification = Classification(
-                task_type="Q&A",
-                required_sources=["RAG"],
-                entities={},
-                output_format="markdown",
-                complexity="medium",
-                confidence=0.85
-            )
-            
-            from app.models import UpliftedPrompt
-            mock_uplifted = UpliftedPrompt(
-                original=query,
-                improved="Improved",
-                classification=mock_classification,
-                confidence=0.85
-            )
-            
-            mock_classify.return_value = mock_classification
-            mock_uplift.return_value = mock_uplifted
-            mock_expand.return_value = []
-            
-            # First call
+            # First call misses, second call should use cache
             result1 = pipeline.process(query, sample_context)
+            result2 = pipeline.process(query, sample_context)
             
-            # Mock cache hit
-            with patch.object(pipeline, '_get_from_cache', return_value=result1):
-                # Second call should use cache
-                result2 = pipeline.process(query, sample_context)
-                
-                # Should not call components again (cache hit)
-                # Note: This is a simplified test - actual cache integration would need Redis mock
-                assert result2.final_query == result1.final_query
+            # Should not call components again (cache hit)
+            assert result2 is result1
+            assert mocks["classifier"].classify.call_count == 1
     
     def test_latency_within_budget(self, pipeline, sample_context):
         """Test that pipeline completes within latency budget."""
         query = "test query"
         
         # Mock fast components
-        with patch.object(pipeline.classifier, 'classify') as mock_classify, \
-             patch.object(pipeline.uplifter, 'uplift') as mock_uplift, \
-             patch.object(pipeline.expander, 'expand') as mock_expand:
-            
-            mock_classification = Classification(
-                task_type="Q&A",
-                required_sources=["RAG"],
-                entities={},
-                output_format="markdown",
-                complexity="medium",
-                confidence=0.85
-            )
-            
-            from app.models import UpliftedPrompt
-            mock_uplifted = UpliftedPrompt(
-                original=query,
-                improved="Improved",
-                classification=mock_classification,
-                confidence=0.85
-            )
-            
-            mock_classify.return_value = mock_classification
-            mock_uplift.return_value = mock_uplifted
-            mock_expand.return_value = []
+        with patch_components(pipeline) as mocks:
+            mocks["classifier"].classify.return_value = MOCK_CLASSIFICATION
+            mocks["uplifter"].uplift.return_value = replace(BASE_UPLIFTED, original=query)
+            mocks["expander"].expand.return_value = []
             
             # Run pipeline
-            start_time = time.time()
+            start = perf_counter_ns()
             result = pipeline.process(query, sample_context)
-            elapsed_ms = (time.time() - start_time) * 1000
+            elapsed_ms = (perf_counter_ns() - start) / 1_000_000
             
             # Should complete within budget (600ms)
             # Note: With mocks, this should be very fast, but test validates structure
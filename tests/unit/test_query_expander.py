@@ -3,76 +3,86 @@ Unit tests for Query Expander.
 
 Tests query expansion strategies: paraphrase, aspect query, and HyDE.
 """
+import threading
+import numpy as np
 import pytest
 from unittest.mock import Mock, patch, MagicMock
 from app.query_expander import QueryExpander
 from app.models import Classification
 
 
+@pytest.mark.xdist_group("query_expander")
 class TestQueryExpander:
     """Test suite for QueryExpander."""
     
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def expander(self):
-        """Create expander instance."""
-        return QueryExpander(model="llama3.2:3b-instruct")
-    
-    @pytest.fixture
-    def sample_classification(self):
-        """Create sample classification."""
-        return Classification(
-            task_type="Q&A",
-            required_sources=["RAG"],
-            entities={"tickers": [], "indicators": ["RSI"], "dates": []},
-            output_format="markdown",
-            complexity="medium",
-            confidence=0.85
-        )
-    
-    def test_generate_paraphrase(self, expander):
+        """Create expander instance shared by the module (tests only patch it)."""
+        return QueryExpander(model="llama3.2:3b-instruct", embedding_model=None)
+    
+    @pytest.fixture(scope="module")
+    def sample_classification(self, classification_template):
+        """Sample classification (shared, so tests must not mutate it)."""
+        return classification_template
+    
+    @pytest.fixture(scope="module")
+    def mock_generate(self, expander):
+        """Swap the expander's LLM call for one Mock for the whole module."""
+        original = expander.llm.generate
+        expander.llm.generate = Mock()
+        yield expander.llm.generate
+        expander.llm.generate = original
+    
+    @pytest.fixture(autouse=True)
+    def clear_expansion_cache(self, expander, mock_generate):
+        """Start every test with an empty expansion cache and an unconfigured LLM mock."""
+        expander.clear_cache()
+        mock_generate.reset_mock(return_value=True, side_effect=True)
+    
+    def test_generate_paraphrase(self, expander, mock_generate):
         """Test paraphrase generation."""
         query = "What are trading strategies?"
         
         # Mock LLM response
         mock_response = "What are effective trading approaches?"
         
-        with patch.object(expander.llm, 'generate', return_value=mock_response):
-            paraphrase = expander._generate_paraphrase(query)
-            
-            assert paraphrase != query
-            assert len(paraphrase) > 0
-            # Should preserve meaning (basic check)
-            assert "trading" in paraphrase.lower() or "strategies" in paraphrase.lower() or "approaches" in paraphrase.lower()
+        mock_generate.return_value = mock_response
+        paraphrase = expander._generate_paraphrase(query)
+        
+        assert paraphrase != query
+        assert len(paraphrase) > 0
+        # Should preserve meaning (basic check)
+        assert "trading" in paraphrase.lower() or "strategies" in paraphrase.lower() or "approaches" in paraphrase.lower()
     
-    def test_generate_aspect_query(self, expander, sample_classification):
+    def test_generate_aspect_query(self, expander, sample_classification, mock_generate):
         """Test aspect query generation."""
         query = "explain momentum trading strategies"
         
         # Mock LLM response
         mock_response = "Which technical indicators are used in momentum trading?"
         
-        with patch.object(expander.llm, 'generate', return_value=mock_response):
-            aspect_query = expander._generate_aspect_query(query, sample_classification)
-            
-            assert aspect_query != query
-            assert len(aspect_query) > 0
+        mock_generate.return_value = mock_response
+        aspect_query = expander._generate_aspect_query(query, sample_classification)
+        
+        assert aspect_query != query
+        assert len(aspect_query) > 0
     
-    def test_generate_hyde(self, expander, sample_classification):
+    def test_generate_hyde(self, expander, sample_classification, mock_generate):
         """Test HyDE generation."""
         query = "momentum trading strategies"
         
         # Mock LLM response
         mock_response = "Momentum trading strategies typically use indicators like RSI and MACD to identify trend strength. Entry occurs when momentum confirms direction, with stop-losses at key support/resistance levels."
         
-        with patch.object(expander.llm, 'generate', return_value=mock_response):
-            hyde = expander._generate_hyde(query, sample_classification)
-            
-            assert hyde != query
-            assert len(hyde) > 0
-            # HyDE should be longer (hypothetical answer)
-            assert len(hyde.split()) > len(query.split())
+        mock_generate.return_value = mock_response
+        hyde = expander._generate_hyde(query, sample_classification)
+        
+        assert hyde != query
+        assert len(hyde) > 0
+        # HyDE should be longer (hypothetical answer)
+        assert len(hyde.split()) > len(query.split())
     
-    def test_expansion_diversity(self, expander, sample_classification):
+    def test_expansion_diversity(self, expander, sample_classification, mock_generate):
         """Test that expansions are diverse."""
         query = "trading strategies"
         
@@ -83,30 +93,19 @@ class TestQueryExpander:
             "Trading strategies involve specific entry and exit rules based on market analysis."  # HyDE
         ]
         
-        call_count = [0]
+        mock_generate.side_effect = iter(mock_responses)
+        expansions = expander.expand(query, sample_classification, max_expansions=3)
         
-        def mock_generate(*args, **kwargs):
-            response = mock_responses[call_count[0] % len(mock_responses)]
-            call_count[0] += 1
-            return response
+        # Should have diverse expansions
+        assert len(expansions) > 0
+        assert len(expansions) <= 3
         
-        with patch.object(expander.llm, 'generate', side_effect=mock_generate):
-            expansions = expander.expand(query, sample_classification, max_expansions=3)
-            
-            # Should have diverse expansions
-            assert len(expansions) > 0
-            assert len(expansions) <= 3
-            
-            # Check diversity (expansions should differ from each other)
-            if len(expansions) > 1:
-                for i, exp1 in enumerate(expansions):
-                    for j, exp2 in enumerate(expansions):
-                        if i != j:
-                            similarity = expander._similarity(exp1, exp2)
-                            # Should have some difference (similarity < 1.0)
-                            assert similarity < 1.0
-    
-    def test_max_expansions_limit(self, expander, sample_classification):
+        # Check diversity (expansions should differ from each other, so
+        # every off-diagonal similarity is < 1.0)
+        similarity = expander._similarity_matrix(expansions)
+        assert (similarity - np.eye(len(expansions)) < 1.0).all()
+    
+    def test_max_expansions_limit(self, expander, sample_classification, mock_generate):
         """Test that max expansions limit is enforced."""
         query = "test query"
         
@@ -118,20 +117,13 @@ class TestQueryExpander:
             "extra expansion"
         ]
         
-        call_count = [0]
+        mock_generate.side_effect = iter(mock_responses)
+        expansions = expander.expand(query, sample_classification, max_expansions=3)
         
-        def mock_generate(*args, **kwargs):
-            response = mock_responses[call_count[0] % len(mock_responses)]
-            call_count[0] += 1
-            return response
-        
-        with patch.object(expander.llm, 'generate', side_effect=mock_generate):
-            expansions = expander.expand(query, sample_classification, max_expansions=3)
-            
-            # Should not exceed max_expansions
-            assert len(expansions) <= 3
+        # Should not exceed max_expansions
+        assert len(expansions) <= 3
     
-    def test_parallel_generation(self, expander, sample_classification):
+    def test_parallel_generation(self, expander, sample_classification, mock_generate):
         """Test expansion generation (simulated parallel)."""
         query = "trading strategies"
         
@@ -142,20 +134,37 @@ class TestQueryExpander:
             "Trading strategies involve specific rules."
         ]
         
-        call_count = [0]
+        mock_generate.side_effect = iter(mock_responses)
+        expansions = expander.expand(query, sample_classification, max_expansions=3)
+        
+        # Should generate multiple expansions
+        assert len(expansions) > 0
+    
+    @pytest.mark.asyncio
+    async def test_expand_async_runs_concurrently(self, expander, sample_classification):
+        """Test that async expansion issues the LLM calls concurrently."""
+        query = "trading strategies"
+        # Each generator only gets past the barrier if all three run at once
+        barrier = threading.Barrier(3, timeout=2)
+        
+        def generated(text):
+            def generate(*args):
+                barrier.wait()
+                return text
+            return generate
         
-        def mock_generate(*args, **kwargs):
-            response = mock_responses[call_count[0] % len(mock_responses)]
-            call_count[0] += 1
-            return response
+        with patch.object(expander, '_generate_paraphrase', side_effect=generated("What are effective trading approaches?")), \
+             patch.object(expander, '_generate_aspect_query', side_effect=generated("Which indicators are used?")), \
+             patch.object(expander, '_generate_hyde', side_effect=generated("Trading strategies involve specific rules.")):
+            expansions = await expander.expand_async(query, sample_classification, max_expansions=3)
         
-        with patch.object(expander.llm, 'generate', side_effect=mock_generate):
-            expansions = expander.expand(query, sample_classification, max_expansions=3)
-            
-            # Should generate multiple expansions
-            assert len(expansions) > 0
+        assert expansions == [
+            "What are effective trading approaches?",
+            "Which indicators are used?",
+            "Trading strategies involve specific rules."
+        ]
     
-    def test_expansion_quality(self, expander, sample_classification):
+    def test_expansion_quality(self, expander, sample_classification, mock_generate):
         """Test expansion quality."""
         query = "explain RSI indicator"
         
@@ -166,23 +175,53 @@ class TestQueryExpander:
             "RSI is a momentum oscillator that measures the speed and magnitude of price changes."  # HyDE
         ]
         
-        call_count = [0]
+        mock_generate.side_effect = iter(mock_responses)
+        expansions = expander.expand(query, sample_classification, max_expansions=3)
         
-        def mock_generate(*args, **kwargs):
-            response = mock_responses[call_count[0] % len(mock_responses)]
-            call_count[0] += 1
-            return response
+        # All expansions should be non-empty
+        assert all(len(exp) > 0 for exp in expansions)
         
-        with patch.object(expander.llm, 'generate', side_effect=mock_generate):
-            expansions = expander.expand(query, sample_classification, max_expansions=3)
-            
-            # All expansions should be non-empty
-            assert all(len(exp) > 0 for exp in expansions)
+        # Expansions should relate to original query
+        for exp in expansions:
+            # Should have some relation to RSI or indicator
+            assert "rsi" in exp.lower() or "indicator" in exp.lower() or "momentum" in exp.lower()
+    
+    def test_expansion_cached(self, expander, sample_classification, mock_generate):
+        """Test that repeating a query reuses its expansions without LLM calls."""
+        query = "explain RSI indicator"
+        mock_responses = [
+            "What is the Relative Strength Index?",
+            "How is RSI calculated and interpreted?",
+            "RSI is a momentum oscillator that measures the speed and magnitude of price changes."
+        ]
+        
+        mock_generate.side_effect = iter(mock_responses)
+        first = expander.expand(query, sample_classification, max_expansions=3)
+        
+        mock_generate.reset_mock(side_effect=True)
+        second = expander.expand("  Explain RSI   indicator ", sample_classification, max_expansions=3)
+        
+        mock_generate.assert_not_called()
+        assert second == first
+    
+    def test_semantic_cache_keeps_entities_apart(self, expander, sample_classification, mock_generate):
+        """Test that a semantic cache hit is never served across different tickers."""
+        import dataclasses
+        aapl = dataclasses.replace(sample_classification, entities={"tickers": ["AAPL"], "indicators": ["RSI"]})
+        msft = dataclasses.replace(sample_classification, entities={"tickers": ["MSFT"], "indicators": ["RSI"]})
+        
+        # Every query embeds identically, so only the entity grouping can prevent a hit
+        with patch.object(expander, "_embed", return_value=np.ones(4, dtype=np.float32) / 2):
+            mock_generate.return_value = "RSI reading for AAPL today"
+            first = expander.expand("RSI for AAPL", aapl, max_expansions=3)
             
-            # Expansions should relate to original query
-            for exp in expansions:
-                # Should have some relation to RSI or indicator
-                assert "rsi" in exp.lower() or "indicator" in exp.lower() or "momentum" in exp.lower()
+            mock_generate.return_value = "RSI reading for MSFT today"
+            second = expander.expand("RSI for MSFT", msft, max_expansions=3)
+            third = expander.expand("current RSI of AAPL", aapl, max_expansions=3)
+        
+        assert first and all("MSFT" not in exp for exp in first)
+        assert second and all("AAPL" not in exp for exp in second)
+        assert third == first
     
     def test_similarity_calculation(self, expander):
         """Test similarity calculation."""
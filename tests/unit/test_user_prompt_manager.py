@@ -4,9 +4,22 @@ Unit tests for user prompt manager
 
 import pytest
 import json
+import uuid
 from pathlib import Path
+from unittest.mock import patch
 from app.user_prompt_manager import UserPromptManager
 
+@pytest.fixture(scope="module")
+def manager(tmp_path_factory):
+    """UserPromptManager shared by the module (tests isolate by user id)"""
+    return UserPromptManager(storage_dir=str(tmp_path_factory.mktemp("prompts")))
+
+@pytest.fixture
+def user_id():
+    """User id unique to the test"""
+    return f"user_{uuid.uuid4().hex[:8]}"
+
+@pytest.mark.xdist_group("user_prompts")
 class TestUserPromptManager:
     """Test UserPromptManager class"""
     
@@ -17,103 +30,89 @@ class TestUserPromptManager:
         assert manager.storage_dir == temp_dir
         assert temp_dir.exists()
     
-    def test_get_user_file_creates_directory(self, temp_dir):
+    def test_get_user_file_creates_directory(self, manager, user_id):
         """Test that user directory is created"""
-        manager = UserPromptManager(storage_dir=str(temp_dir))
-        
-        user_file = manager._get_user_file("testuser")
+        user_file = manager._get_user_file(user_id)
         assert user_file.parent.exists()
-        assert user_file.parent.name == "testuser"
+        assert user_file.parent.name == user_id
     
-    def test_set_user_prompt(self, temp_dir):
+    def test_set_user_prompt(self, manager, user_id):
         """Test setting a user prompt"""
-        manager = UserPromptManager(storage_dir=str(temp_dir))
-        
         prompt = "You are a helpful assistant. Your role is to help users. Guidelines: Be clear and concise. Response format: Markdown."
-        success = manager.set_user_prompt("user123", "rag_only", prompt)
+        success = manager.set_user_prompt(user_id, "rag_only", prompt)
         
         assert success is True
         
         # Verify file was created
-        user_file = manager._get_user_file("user123")
+        user_file = manager._get_user_file(user_id)
         assert user_file.exists()
     
-    def test_get_user_prompt_returns_string(self, temp_dir):
+    def test_get_user_prompt_returns_string(self, manager, user_id):
         """Test that get_user_prompt returns just the prompt string"""
-        manager = UserPromptManager(storage_dir=str(temp_dir))
-        
         prompt = "You are a helpful assistant. Your role is to help users. Guidelines: Be clear. Response format: Markdown."
-        manager.set_user_prompt("user123", "rag_only", prompt)
+        manager.set_user_prompt(user_id, "rag_only", prompt)
         
-        retrieved = manager.get_user_prompt("user123", "rag_only")
+        retrieved = manager.get_user_prompt(user_id, "rag_only")
         
         assert isinstance(retrieved, str)
         assert retrieved == prompt
         assert "updated_at" not in retrieved  # Should not return metadata
         assert "hash" not in retrieved
     
-    def test_get_nonexistent_prompt(self, temp_dir):
+    def test_get_nonexistent_prompt(self, manager, user_id):
         """Test getting prompt that doesn't exist"""
-        manager = UserPromptManager(storage_dir=str(temp_dir))
-        
-        prompt = manager.get_user_prompt("user123", "rag_only")
+        prompt = manager.get_user_prompt(user_id, "rag_only")
         assert prompt is None
     
-    def test_reset_user_prompt(self, temp_dir):
+    def test_reset_user_prompt(self, manager, user_id):
         """Test resetting a user prompt"""
-        manager = UserPromptManager(storage_dir=str(temp_dir))
-        
         prompt = "Custom prompt with role and guidelines and response format"
-        manager.set_user_prompt("user123", "rag_only", prompt)
+        manager.set_user_prompt(user_id, "rag_only", prompt)
         
         # Verify it's set
-        assert manager.get_user_prompt("user123", "rag_only") == prompt
+        assert manager.get_user_prompt(user_id, "rag_only") == prompt
         
         # Reset
-        success = manager.reset_user_prompt("user123", "rag_only")
+        success = manager.reset_user_prompt(user_id, "rag_only")
         assert success is True
         
         # Should return None now
-        assert manager.get_user_prompt("user123", "rag_only") is None
+        assert manager.get_user_prompt(user_id, "rag_only") is None
     
-    def test_get_user_prompts_all(self, temp_dir):
+    def test_get_user_prompts_all(self, manager, user_id):
         """Test getting all user prompts"""
-        manager = UserPromptManager(storage_dir=str(temp_dir))
-        
         prompt1 = "Prompt 1 with role and guidelines and format"
         prompt2 = "Prompt 2 with role and guidelines and format"
         
-        manager.set_user_prompt("user123", "rag_only", prompt1)
-        manager.set_user_prompt("user123", "web_search_only", prompt2)
+        success = manager.set_user_prompts(user_id, {"rag_only": prompt1, "web_search_only": prompt2})
+        assert success is True
         
-        all_prompts = manager.get_user_prompts("user123")
+        all_prompts = manager.get_user_prompts(user_id)
         
         assert len(all_prompts) == 2
-        assert "rag_only" in all_prompts
-        assert "web_search_only" in all_prompts
+        assert all_prompts["rag_only"]["prompt"] == prompt1
+        assert all_prompts["web_search_only"]["prompt"] == prompt2
     
-    def test_clear_all_user_prompts(self, temp_dir):
+    def test_clear_all_user_prompts(self, manager, user_id):
         """Test clearing all user prompts"""
-        manager = UserPromptManager(storage_dir=str(temp_dir))
-        
-        manager.set_user_prompt("user123", "rag_only", "Prompt with role guidelines format")
-        manager.set_user_prompt("user123", "web_search_only", "Another prompt with role guidelines format")
+        manager.set_user_prompts(user_id, {
+            "rag_only": "Prompt with role guidelines format",
+            "web_search_only": "Another prompt with role guidelines format"
+        })
         
-        success = manager.clear_user_prompts("user123")
+        success = manager.clear_user_prompts(user_id)
         assert success is True
         
-        all_prompts = manager.get_user_prompts("user123")
+        all_prompts = manager.get_user_prompts(user_id)
         assert len(all_prompts) == 0
     
-    def test_prompt_metadata_stored(self, temp_dir):
+    def test_prompt_metadata_stored(self, manager, user_id):
         """Test that prompt metadata is stored correctly"""
-        manager = UserPromptManager(storage_dir=str(temp_dir))
-        
         prompt = "Test prompt with role and guidelines and format"
-        manager.set_user_prompt("user123", "rag_only", prompt)
+        manager.set_user_prompt(user_id, "rag_only", prompt)
         
         # Read file directly to verify structure
-        user_file = manager._get_user_file("user123")
+        user_file = manager._get_user_file(user_id)
         with open(user_file, 'r') as f:
             data = json.load(f)
         
@@ -123,30 +122,38 @@ class TestUserPromptManager:
         assert "hash" in data["rag_only"]
         assert data["rag_only"]["prompt"] == prompt
     
-    def test_file_sync_on_save(self, temp_dir):
+    def test_file_sync_on_save(self, manager, user_id):
         """Test that file is synced to disk immediately"""
-        manager = UserPromptManager(storage_dir=str(temp_dir))
-        
         prompt = "Test prompt with role and guidelines and format for sync test"
-        manager.set_user_prompt("user123", "rag_only", prompt)
+        manager.set_user_prompt(user_id, "rag_only", prompt)
         
         # Immediately read file (no time for buffering)
-        user_file = manager._get_user_file("user123")
+        user_file = manager._get_user_file(user_id)
         with open(user_file, 'r') as f:
             data = json.load(f)
         
         # Data should be there immediately
         assert data["rag_only"]["prompt"] == prompt
     
-    def test_multiple_users_isolation(self, temp_dir):
-        """Test that different users have isolated prompts"""
-        manager = UserPromptManager(storage_dir=str(temp_dir))
+    def test_saved_prompts_read_from_memory(self, manager, user_id):
+        """Test that prompts just saved are read back without reopening the file"""
+        prompt = "Test prompt with role and guidelines and format for memory test"
+        manager.set_user_prompt(user_id, "rag_only", prompt)
         
-        manager.set_user_prompt("user1", "rag_only", "User 1 prompt with role guidelines format")
-        manager.set_user_prompt("user2", "rag_only", "User 2 prompt with role guidelines format")
+        with patch("builtins.open", side_effect=AssertionError("file reopened")):
+            assert manager.get_user_prompt(user_id, "rag_only") == prompt
+        
+        # No temp file is left next to the prompts file
+        user_file = manager._get_user_file(user_id)
+        assert list(user_file.parent.iterdir()) == [user_file]
+    
+    def test_multiple_users_isolation(self, manager, user_id):
+        """Test that different users have isolated prompts"""
+        manager.set_user_prompt(f"{user_id}_1", "rag_only", "User 1 prompt with role guidelines format")
+        manager.set_user_prompt(f"{user_id}_2", "rag_only", "User 2 prompt with role guidelines format")
         
-        user1_prompt = manager.get_user_prompt("user1", "rag_only")
-        user2_prompt = manager.get_user_prompt("user2", "rag_only")
+        user1_prompt = manager.get_user_prompt(f"{user_id}_1", "rag_only")
+        user2_prompt = manager.get_user_prompt(f"{user_id}_2", "rag_only")
         
         assert "User 1" in user1_prompt
         assert "User 2" in user2_prompt
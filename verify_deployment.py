@@ -1,124 +1,449 @@
 #!/usr/bin/env python3
 """Deployment Verification Script"""
 
-import requests
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
 import time
 import json
-from datetime import datetime
+from enum import IntEnum
+from functools import partial
+from pathlib import Path
+from urllib.parse import urlsplit
 
-def verify_deployment():
-    """Verify complete deployment functionality"""
-    print("🔍 DEPLOYMENT VERIFICATION")
-    print("=" * 50)
-    
-    # Test endpoints
-    endpoints = {
-        "Backend Health": "http://localhost:8002/health",
-        "Frontend": "http://localhost:3000",
-        "ChromaDB": "http://localhost:8003/api/v1/heartbeat",
-        "Redis": "redis://localhost:6379"
-    }
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# aiohttp and redis are imported inside the checks that use them, so --help and
+# argument errors do not pay for loading them
+
+# Services are addressed by loopback IP rather than localhost, so no probe waits on name resolution
+BACKEND_URL = "http://127.0.0.1:8002"
+
+# /ask request body, serialized once
+ASK_BODY = {
+    "query": "Test query",
+    "mode": "qa",
+    "model": "llama3.1:latest",
+    "disable_model_override": True
+}
+ASK_BODY_BYTES = orjson.dumps(ASK_BODY) if ORJSON_AVAILABLE else json.dumps(ASK_BODY).encode()
+
+# Overall bound on the auth -> ask test, on top of each request's own timeout
+API_TEST_TIMEOUT = 45
+
+class Status(IntEnum):
+    """Check outcome; only PASS is falsy, so any() over statuses finds a problem"""
+    PASS = 0
+    FAIL = 1
+    ERROR = 2
+    DOWN = 3
+    SKIPPED = 4
+    TIMEOUT = 5
+
+def _render(result, name=None):
+    """Format a (Status, detail) check result for the report, optionally naming the check"""
+    status, detail = result
+    icon = "✅" if status is Status.PASS else "⏭️" if status is Status.SKIPPED else "❌"
+    label = f"{icon} {name}: {status.name}" if name else f"{icon} {status.name}"
+    return f"{label} ({detail})" if detail else label
+
+class _Report:
+    """Collects report lines and writes them with one call (or as they come when verbose)"""
     
-    results = {}
+    def __init__(self):
+        self.lines = []
+        self.verbose = False
     
-    # Test backend health
-    try:
-        response = requests.get(endpoints["Backend Health"], timeout=5)
-        if response.status_code == 200:
-            results["Backend Health"] = "✅ PASS"
+    def __call__(self, line=""):
+        if self.verbose:
+            print(line, flush=True)
         else:
-            results["Backend Health"] = f"❌ FAIL (HTTP {response.status_code})"
-    except Exception as e:
-        results["Backend Health"] = f"❌ ERROR ({str(e)})"
+            self.lines.append(line)
     
-    # Test frontend
+    def flush(self):
+        if self.lines:
+            sys.stdout.write("\n".join(self.lines) + "\n")
+            sys.stdout.flush()
+            self.lines.clear()
+
+out = _Report()
+
+# How long a TCP connect may take before a service counts as down
+PORT_CHECK_TIMEOUT = 0.2
+DEFAULT_PORTS = {"http": 80, "https": 443, "redis": 6379}
+
+# Recent passing checks (url -> time passed), reused by re-runs within CACHE_TTL seconds
+CACHE_PATH = Path(tempfile.gettempdir()) / "verify_deploy_cache.json"
+CACHE_TTL = 15
+
+# Services reported by the backend's /health/all (service -> response key)
+HEALTH_ALL_KEYS = {"Backend Health": "backend", "ChromaDB": "chroma", "Redis": "redis"}
+
+# Login tokens (username -> token and expiry), so re-runs can skip straight to /ask
+TOKEN_CACHE_PATH = Path.home() / ".graphmind_verify_token.json"
+TOKEN_TTL = 300
+TEST_USER = {"username": "admin", "password": "admin123"}
+
+def _loads(data):
+    """Decode a JSON response body"""
+    return orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)
+
+def _load_cache():
+    """Load the recent-pass cache (empty if missing or unreadable)"""
     try:
-        response = requests.get(endpoints["Frontend"], timeout=5)
-        if response.status_code == 200 and "TradingAI Research Platform" in response.text:
-            results["Frontend"] = "✅ PASS"
-        else:
-            results["Frontend"] = f"❌ FAIL (HTTP {response.status_code})"
-    except Exception as e:
-        results["Frontend"] = f"❌ ERROR ({str(e)})"
+        with open(CACHE_PATH, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_cache(cache):
+    """Atomically rewrite the recent-pass cache"""
+    try:
+        tmp_path = CACHE_PATH.with_name(CACHE_PATH.name + ".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, CACHE_PATH)
+    except OSError:
+        pass  # The cache only speeds up re-runs
+
+def _load_token(username):
+    """Return an unexpired cached token for username, if any"""
+    try:
+        with open(TOKEN_CACHE_PATH, 'r') as f:
+            entry = json.load(f).get(username)
+    except (OSError, ValueError, AttributeError):
+        return None
+    if entry and entry.get("exp", 0) > time.time():
+        return entry.get("token")
+    return None
+
+def _save_token(username, token):
+    """Cache a token for username (None drops it), readable only by the owner"""
+    tokens = {}
+    if token is not None:
+        tokens[username] = {"token": token, "exp": time.time() + TOKEN_TTL}
+    try:
+        tmp_path = TOKEN_CACHE_PATH.with_name(TOKEN_CACHE_PATH.name + ".tmp")
+        with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as f:
+            json.dump(tokens, f)
+        os.replace(tmp_path, TOKEN_CACHE_PATH)
+    except OSError:
+        pass  # The token cache only speeds up re-runs
+
+def _is_fresh(cache, url):
+    """Whether url passed within the last CACHE_TTL seconds"""
+    return time.time() - cache.get(url, 0) < CACHE_TTL
+
+def _record(cache, url, result):
+    """Remember a pass for url (failures are never cached)"""
+    if result[0] is Status.PASS:
+        cache[url] = time.time()
+    else:
+        cache.pop(url, None)
+
+async def _cached(cache, url, probe):
+    """Reuse a recent pass for url, otherwise run probe and record the outcome"""
+    if _is_fresh(cache, url):
+        return (Status.PASS, "cached")
+    result = await probe()
+    _record(cache, url, result)
+    return result
+
+async def _status_ok(response):
+    """Endpoint answered HTTP 200"""
+    return response.status == 200
+
+PLATFORM_TITLE = b"TradingAI Research Platform"
+
+async def _has_platform_title(response):
+    """Endpoint answered HTTP 200 with the platform page (stops reading at the title)"""
+    if response.status != 200:
+        return False
+    # Scan raw chunks, keeping a title-sized tail so a match split across chunks is found
+    tail = b""
+    async for chunk in response.content.iter_chunked(8192):
+        window = tail + chunk
+        if PLATFORM_TITLE in window:
+            return True
+        tail = window[-(len(PLATFORM_TITLE) - 1):]
+    return False
+
+async def _port_open(url):
+    """Whether anything accepts TCP connections at url's host and port"""
+    parts = urlsplit(url)
+    try:
+        _, writer = await asyncio.wait_for(
+            asyncio.open_connection(parts.hostname, parts.port or DEFAULT_PORTS.get(parts.scheme, 80)),
+            timeout=PORT_CHECK_TIMEOUT
+        )
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    return True
+
+async def _probe(session, url, validator):
+    """Run one service check (a validator of None means a Redis ping)"""
+    if validator is None:
+        return await _check_redis(url)
+    return await _check(session, url, validator)
+
+def _down(url):
+    """Result for a service with no listener"""
+    return (Status.DOWN, f"nothing listening on {urlsplit(url).netloc}")
+
+async def _check(session, url, validator):
+    """Probe one HTTP endpoint and return its (Status, detail) result"""
+    import aiohttp
     
-    # Test ChromaDB
+    if not await _port_open(url):
+        return _down(url)
     try:
-        response = requests.get(endpoints["ChromaDB"], timeout=5)
-        if response.status_code == 200:
-            results["ChromaDB"] = "✅ PASS"
-        else:
-            results["ChromaDB"] = f"❌ FAIL (HTTP {response.status_code})"
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
+            if await validator(response):
+                return (Status.PASS, "")
+            return (Status.FAIL, f"HTTP {response.status}")
     except Exception as e:
-        results["ChromaDB"] = f"❌ ERROR ({str(e)})"
-    
-    # Test Redis (basic connection)
+        return (Status.ERROR, str(e))
+
+async def _check_redis(url):
+    """Ping Redis without blocking the other checks"""
+    try:
+        import redis.asyncio as aioredis
+    except ImportError:
+        return (Status.ERROR, "redis package not installed")
+    if not await _port_open(url):
+        return _down(url)
     try:
-        import redis
-        r = redis.Redis(host='localhost', port=6379, decode_responses=True)
-        r.ping()
-        results["Redis"] = "✅ PASS"
+        async with aioredis.from_url(url, max_connections=2, socket_connect_timeout=5) as r:
+            await r.ping()
+        return (Status.PASS, "")
     except Exception as e:
-        results["Redis"] = f"❌ ERROR ({str(e)})"
+        return (Status.ERROR, str(e))
+
+# Service checks as (name, url, validator) records; a validator of None means a Redis ping
+CHECKS = (
+    ("Backend Health", f"{BACKEND_URL}/health", _status_ok),
+    ("Frontend", "http://127.0.0.1:3000", _has_platform_title),
+    ("ChromaDB", "http://127.0.0.1:8003/api/v1/heartbeat", _status_ok),
+    ("Redis", "redis://127.0.0.1:6379", None),
+)
+
+async def _login(session):
+    """Log in as the test user, returning the token (None on failure) and HTTP status"""
+    import aiohttp
     
-    # Print results
-    print("\n📊 SERVICE STATUS:")
-    for service, status in results.items():
-        print(f"  {service}: {status}")
+    async with session.post(
+        f"{BACKEND_URL}/auth/login",
+        data=TEST_USER,
+        timeout=aiohttp.ClientTimeout(total=10)
+    ) as auth_response:
+        if auth_response.status != 200:
+            return None, auth_response.status
+        token = _loads(await auth_response.read())["access_token"]
+    _save_token(TEST_USER["username"], token)
+    return token, auth_response.status
+
+async def _ask(session, token):
+    """Run a basic ask, returning the HTTP status"""
+    import aiohttp
     
-    # Test API functionality
-    print("\n🔧 API FUNCTIONALITY TEST:")
+    async with session.post(
+        f"{BACKEND_URL}/ask",
+        headers={"Authorization": f"Bearer {token}", "Content-Type": "application/json"},
+        data=ASK_BODY_BYTES,
+        timeout=aiohttp.ClientTimeout(total=30)
+    ) as ask_response:
+        return ask_response.status
+
+async def _check_health_all(session, url):
+    """Backend, ChromaDB and Redis status from one /health/all call (None if unavailable)"""
+    import aiohttp
     
-    # Authenticate
+    if not await _port_open(url):
+        return None
     try:
-        auth_response = requests.post(
-            "http://localhost:8002/auth/login",
-            data={"username": "admin", "password": "admin123"},
-            timeout=10
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
+            if response.status != 200:
+                return None
+            health = _loads(await response.read())
+    except Exception:
+        return None
+    return {
+        service: (Status.PASS, "") if health.get(key) == "healthy" else (Status.FAIL, health.get(key, "not reported"))
+        for service, key in HEALTH_ALL_KEYS.items()
+    }
+
+async def _named(service, status):
+    """Wrap one service's status coroutine as {service: status}"""
+    return {service: await status}
+
+async def _gather_statuses(checks, fail_fast=False):
+    """Run checks (each returning {service: status}) concurrently and merge the results.
+    
+    With fail_fast, the remaining checks are cancelled as soon as one fails.
+    """
+    tasks = [asyncio.ensure_future(check) for check in checks]
+    statuses = {}
+    try:
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                statuses.update(task.result())
+            if fail_fast and pending and any(status for status, _ in statuses.values()):
+                for task in pending:
+                    task.cancel()
+                await asyncio.wait(pending)
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+    return statuses
+
+async def _check_services(session, cache, endpoints, probes, fail_fast=False):
+    """Check the backend and its dependencies, in bulk when the backend supports it"""
+    if not all(_is_fresh(cache, endpoints[service]) for service in HEALTH_ALL_KEYS):
+        statuses = await _check_health_all(session, endpoints["Backend Health"] + "/all")
+        if statuses is not None:
+            for service, status in statuses.items():
+                _record(cache, endpoints[service], status)
+            return statuses
+    
+    # Older backend (or everything cached): probe each service separately
+    return await _gather_statuses(
+        (_named(service, _cached(cache, endpoints[service], probes[service])) for service in HEALTH_ALL_KEYS),
+        fail_fast
+    )
+
+async def _test_api(session, use_cache=True):
+    """Authenticate (reusing a cached token when possible), then run a basic ask"""
+    try:
+        token = _load_token(TEST_USER["username"]) if use_cache else None
+        cached = token is not None
+        if not cached:
+            token, status = await _login(session)
+            if token is None:
+                return {"Authentication": (Status.FAIL, f"HTTP {status}")}
+        
+        # Test basic ask
+        status = await _ask(session, token)
+        if status == 401 and cached:
+            # Cached token was revoked or the backend restarted: log in once more
+            _save_token(TEST_USER["username"], None)
+            token, login_status = await _login(session)
+            if token is None:
+                return {"Authentication": (Status.FAIL, f"HTTP {login_status}")}
+            status = await _ask(session, token)
+        
+        if status == 200:
+            return {"Authentication": (Status.PASS, ""), "Basic Ask API": (Status.PASS, "")}
+        return {"Authentication": (Status.PASS, ""), "Basic Ask API": (Status.FAIL, f"HTTP {status}")}
+    except Exception as e:
+        return {"API Test": (Status.ERROR, str(e))}
+
+def _summary(results, api, all_passed):
+    """Machine-readable form of the report"""
+    def as_dict(checks):
+        return {name: {"status": status.name, "detail": detail} for name, (status, detail) in checks.items()}
+    return {"services": as_dict(results), "api": as_dict(api), "overall": all_passed}
+
+def verify_deployment(use_cache=True, verbose=False, fail_fast=False, as_json=False):
+    """Verify complete deployment functionality"""
+    out.verbose = verbose and not as_json
+    try:
+        all_passed, summary = asyncio.run(_verify_deployment(use_cache, fail_fast))
+    finally:
+        if as_json:
+            out.lines.clear()
+        else:
+            out.flush()
+    
+    if as_json:
+        sys.stdout.buffer.write(
+            (orjson.dumps(summary) if ORJSON_AVAILABLE else json.dumps(summary).encode()) + b"\n"
         )
-        if auth_response.status_code == 200:
-            token = auth_response.json()["access_token"]
-            headers = {"Authorization": f"Bearer {token}"}
-            
-            # Test basic ask
-            ask_response = requests.post(
-                "http://localhost:8002/ask",
-                headers=headers,
-                json={
-                    "query": "Test query",
-                    "mode": "qa",
-                    "model": "llama3.1:latest",
-                    "disable_model_override": True
-                },
-                timeout=30
-            )
-            
-            if ask_response.status_code == 200:
-                print("  ✅ Authentication: PASS")
-                print("  ✅ Basic Ask API: PASS")
-            else:
-                print(f"  ❌ Basic Ask API: FAIL (HTTP {ask_response.status_code})")
+        sys.stdout.flush()
+    return all_passed
+
+async def _verify_deployment(use_cache=True, fail_fast=False):
+    """Run the service checks concurrently, then the API test"""
+    import aiohttp
+    
+    out("🔍 DEPLOYMENT VERIFICATION")
+    out("=" * 50)
+    
+    # Test endpoints
+    endpoints = {name: url for name, url, _ in CHECKS}
+    
+    cache = _load_cache() if use_cache else {}
+    
+    # One pooled session for every probe, so the auth -> ask pair on the backend
+    # reuses the same keep-alive connection
+    connector = aiohttp.TCPConnector(limit=8, limit_per_host=4, keepalive_timeout=30)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        probes = {name: partial(_probe, session, url, validator) for name, url, validator in CHECKS}
+        
+        # The frontend is a separate origin; probe it while the backend reports the rest
+        statuses = await _gather_statuses((
+            _named("Frontend", _cached(cache, endpoints["Frontend"], probes["Frontend"])),
+            _check_services(session, cache, endpoints, probes, fail_fast)
+        ), fail_fast)
+        results = {service: statuses.get(service, (Status.SKIPPED, "fail-fast")) for service in probes}
+        _save_cache(cache)
+        
+        # Print results
+        out("\n📊 SERVICE STATUS:")
+        for service, result in results.items():
+            out(f"  {service}: {_render(result)}")
+        
+        # Test API functionality
+        out("\n🔧 API FUNCTIONALITY TEST:")
+        if fail_fast and any(status for status, _ in results.values()):
+            api = {"API Test": (Status.SKIPPED, "service checks failed")}
         else:
-            print(f"  ❌ Authentication: FAIL (HTTP {auth_response.status_code})")
-    except Exception as e:
-        print(f"  ❌ API Test: ERROR ({str(e)})")
+            try:
+                api = await asyncio.wait_for(_test_api(session, use_cache), timeout=API_TEST_TIMEOUT)
+            except asyncio.TimeoutError:
+                api = {"API Test": (Status.TIMEOUT, f">{API_TEST_TIMEOUT}s")}
+        for check, result in api.items():
+            out(f"  {_render(result, check)}")
     
     # Overall status
-    all_passed = all("✅" in status for status in results.values())
+    all_passed = not any(status for status, _ in (*results.values(), *api.values()))
     
-    print(f"\n🎯 OVERALL STATUS: {'✅ READY FOR COMMIT' if all_passed else '❌ ISSUES FOUND'}")
+    out(f"\n🎯 OVERALL STATUS: {'✅ READY FOR COMMIT' if all_passed else '❌ ISSUES FOUND'}")
     
     if all_passed:
-        print("\n🚀 DEPLOYMENT VERIFICATION SUCCESSFUL!")
-        print("   - All services are running")
-        print("   - API endpoints are functional")
-        print("   - Frontend is accessible")
-        print("   - Ready for Git commit")
+        out("\n🚀 DEPLOYMENT VERIFICATION SUCCESSFUL!")
+        out("   - All services are running")
+        out("   - API endpoints are functional")
+        out("   - Frontend is accessible")
+        out("   - Ready for Git commit")
     else:
-        print("\n⚠️  DEPLOYMENT VERIFICATION FAILED!")
-        print("   - Some services have issues")
-        print("   - Please fix before committing")
+        out("\n⚠️  DEPLOYMENT VERIFICATION FAILED!")
+        out("   - Some services have issues")
+        out("   - Please fix before committing")
     
-    return all_passed
+    return all_passed, _summary(results, api, all_passed)
 
 if __name__ == "__main__":
-    verify_deployment()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Verify the GraphMind deployment")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"re-run every check even if it passed in the last {CACHE_TTL}s")
+    parser.add_argument("--verbose", action="store_true",
+                        help="print each line as it is produced instead of one report at the end")
+    parser.add_argument("--fail-fast", action="store_true",
+                        help="stop at the first failing check and skip the API test")
+    parser.add_argument("--json", action="store_true",
+                        help="write a JSON summary to stdout instead of the report")
+    args = parser.parse_args()
+    
+    passed = verify_deployment(use_cache=not args.no_cache, verbose=args.verbose,
+                               fail_fast=args.fail_fast, as_json=args.json)
+    sys.exit(0 if passed else 1)
\ No newline at end of file